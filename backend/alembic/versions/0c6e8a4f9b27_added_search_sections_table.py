@@ -0,0 +1,53 @@
+"""Added search sections table
+
+Revision ID: 0c6e8a4f9b27
+Revises: f3b7c91d05a8
+Create Date: 2025-10-28 09:12:37.480263
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c6e8a4f9b27'
+down_revision: Union[str, Sequence[str], None] = 'f3b7c91d05a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'search_sections',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('page_id', sa.Integer(), nullable=True),
+        sa.Column('skill_id', sa.Integer(), nullable=True),
+        sa.Column('position', sa.Integer(), nullable=False),
+        sa.Column('heading', sa.String(), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(['page_id'], ['wiki_pages.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['skill_id'], ['skills.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_search_sections_page_id', 'search_sections', ['page_id'], unique=False)
+    op.create_index('ix_search_sections_skill_id', 'search_sections', ['skill_id'], unique=False)
+
+    # Same DDL models.py runs after create_all; SQLite searches in-process instead.
+    # The table starts empty: run `python search.py --rebuild` once after upgrading.
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "ALTER TABLE search_sections ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+            "(setweight(to_tsvector('english', heading), 'A') || setweight(to_tsvector('english', body), 'B')) STORED"
+        )
+        op.execute("CREATE INDEX ix_search_sections_search_vector ON search_sections USING GIN (search_vector)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_search_sections_skill_id', table_name='search_sections')
+    op.drop_index('ix_search_sections_page_id', table_name='search_sections')
+    op.drop_table('search_sections')
@@ -0,0 +1,43 @@
+"""Added summary html and response artifacts
+
+Revision ID: 2e9c4b7f13a6
+Revises: b5e17c3a90d2
+Create Date: 2025-10-28 17:26:40.912384
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2e9c4b7f13a6'
+down_revision: Union[str, Sequence[str], None] = 'b5e17c3a90d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('skills') as batch_op:
+        batch_op.add_column(sa.Column('summary_html', sa.Text(), nullable=True))
+    op.create_table(
+        'response_artifacts',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('encoding', sa.String(), nullable=False),
+        sa.Column('version', sa.String(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint('key', 'encoding'),
+    )
+    # Payloads gain summary_html: clear them so they are rebuilt (and the summaries
+    # rendered) on first read, or all at once with `python artifacts.py --rebuild`.
+    op.execute("UPDATE skills SET payload = NULL")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('response_artifacts')
+    with op.batch_alter_table('skills') as batch_op:
+        batch_op.drop_column('summary_html')
+    op.execute("UPDATE skills SET payload = NULL")
@@ -0,0 +1,48 @@
+"""Added payload column
+
+Revision ID: 3f1c9a7d2e40
+Revises: b8802759aff1
+Create Date: 2025-10-20 10:12:44.918203
+
+"""
+import json
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c9a7d2e40'
+down_revision: Union[str, Sequence[str], None] = 'b8802759aff1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('skills', sa.Column('payload', sa.Text(), nullable=True))
+
+    # Backfill the pre-serialized /skills payload for existing rows.
+    skills = sa.table(
+        'skills',
+        sa.column('id', sa.Integer),
+        sa.column('name', sa.String),
+        sa.column('category', sa.String),
+        sa.column('summary', sa.Text),
+        sa.column('payload', sa.Text),
+    )
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(skills.c.id, skills.c.name, skills.c.category, skills.c.summary)).all()
+    for row in rows:
+        payload = json.dumps(
+            {"id": row.id, "name": row.name, "category": row.category, "summary": row.summary},
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+        conn.execute(skills.update().where(skills.c.id == row.id).values(payload=payload))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('skills', 'payload')
@@ -0,0 +1,49 @@
+"""Added wiki_pages table
+
+Revision ID: 5b6d0e3a8f21
+Revises: c27d5e8f1a93
+Create Date: 2025-10-23 16:48:02.551930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b6d0e3a8f21'
+down_revision: Union[str, Sequence[str], None] = 'c27d5e8f1a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'wiki_pages',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('hash', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('title'),
+    )
+    op.create_index(op.f('ix_wiki_pages_id'), 'wiki_pages', ['id'], unique=False)
+
+    # Existing rows keep their inline content until the next store_skills run
+    # moves it onto a shared page and clears it.
+    with op.batch_alter_table('skills') as batch_op:
+        batch_op.add_column(sa.Column('page_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_skills_page_id_wiki_pages', 'wiki_pages', ['page_id'], ['id'])
+        batch_op.alter_column('content', existing_type=sa.Text(), nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('skills') as batch_op:
+        batch_op.alter_column('content', existing_type=sa.Text(), nullable=False)
+        batch_op.drop_constraint('fk_skills_page_id_wiki_pages', type_='foreignkey')
+        batch_op.drop_column('page_id')
+    op.drop_index(op.f('ix_wiki_pages_id'), table_name='wiki_pages')
+    op.drop_table('wiki_pages')
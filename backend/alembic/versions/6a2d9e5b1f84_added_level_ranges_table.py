@@ -0,0 +1,46 @@
+"""Added level ranges table
+
+Revision ID: 6a2d9e5b1f84
+Revises: 0c6e8a4f9b27
+Create Date: 2025-10-28 11:40:15.926114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6a2d9e5b1f84'
+down_revision: Union[str, Sequence[str], None] = '0c6e8a4f9b27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The table starts empty: run `python levels.py --rebuild` once after upgrading.
+    op.create_table(
+        'level_ranges',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('page_id', sa.Integer(), nullable=True),
+        sa.Column('skill_id', sa.Integer(), nullable=True),
+        sa.Column('min_level', sa.Integer(), nullable=False),
+        sa.Column('max_level', sa.Integer(), nullable=False),
+        sa.Column('method', sa.String(), nullable=True),
+        sa.Column('text', sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(['page_id'], ['wiki_pages.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['skill_id'], ['skills.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_level_ranges_page_levels', 'level_ranges', ['page_id', 'min_level', 'max_level'], unique=False)
+    op.create_index('ix_level_ranges_skill_levels', 'level_ranges', ['skill_id', 'min_level', 'max_level'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_level_ranges_skill_levels', table_name='level_ranges')
+    op.drop_index('ix_level_ranges_page_levels', table_name='level_ranges')
+    op.drop_table('level_ranges')
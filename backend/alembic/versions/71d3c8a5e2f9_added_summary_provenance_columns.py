@@ -0,0 +1,33 @@
+"""Added summary provenance columns
+
+Revision ID: 71d3c8a5e2f9
+Revises: e4a1f6b93c72
+Create Date: 2025-10-25 13:42:10.337519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '71d3c8a5e2f9'
+down_revision: Union[str, Sequence[str], None] = 'e4a1f6b93c72'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('skills', sa.Column('summary_hash', sa.String(), nullable=True))
+    op.add_column('skills', sa.Column('summary_prompt', sa.String(), nullable=True))
+    op.add_column('skills', sa.Column('summary_model', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('skills') as batch_op:
+        batch_op.drop_column('summary_model')
+        batch_op.drop_column('summary_prompt')
+        batch_op.drop_column('summary_hash')
@@ -0,0 +1,34 @@
+"""Added dataset_version table
+
+Revision ID: 9a4e2b71c0d5
+Revises: 3f1c9a7d2e40
+Create Date: 2025-10-21 09:03:17.442871
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a4e2b71c0d5'
+down_revision: Union[str, Sequence[str], None] = '3f1c9a7d2e40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'dataset_version',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.String(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('dataset_version')
@@ -0,0 +1,30 @@
+"""Added wiki page text column
+
+Revision ID: a83f20c6d4b1
+Revises: 71d3c8a5e2f9
+Create Date: 2025-10-27 10:21:56.604218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a83f20c6d4b1'
+down_revision: Union[str, Sequence[str], None] = '71d3c8a5e2f9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Filled in by the next store_skills run, which refetches pages lacking text
+    op.add_column('wiki_pages', sa.Column('text', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('wiki_pages') as batch_op:
+        batch_op.drop_column('text')
@@ -0,0 +1,43 @@
+"""Added entities table
+
+Revision ID: b5e17c3a90d2
+Revises: 6a2d9e5b1f84
+Create Date: 2025-10-28 14:03:51.338720
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e17c3a90d2'
+down_revision: Union[str, Sequence[str], None] = '6a2d9e5b1f84'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The table starts empty: run `python entities.py --rebuild` once after upgrading.
+    op.create_table(
+        'entities',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('label', sa.String(), nullable=False),
+        sa.Column('skill_id', sa.Integer(), nullable=False),
+        sa.Column('min_level', sa.Integer(), nullable=True),
+        sa.Column('max_level', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['skill_id'], ['skills.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_entities_name', 'entities', ['name'], unique=False)
+    op.create_index('ix_entities_skill_id', 'entities', ['skill_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_entities_skill_id', table_name='entities')
+    op.drop_index('ix_entities_name', table_name='entities')
+    op.drop_table('entities')
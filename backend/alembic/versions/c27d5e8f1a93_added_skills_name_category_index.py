@@ -0,0 +1,28 @@
+"""Added skills name/category index
+
+Revision ID: c27d5e8f1a93
+Revises: 9a4e2b71c0d5
+Create Date: 2025-10-22 14:27:51.106392
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c27d5e8f1a93'
+down_revision: Union[str, Sequence[str], None] = '9a4e2b71c0d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_skills_name_category', 'skills', ['name', 'category'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_skills_name_category', table_name='skills')
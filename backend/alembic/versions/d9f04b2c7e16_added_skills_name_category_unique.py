@@ -0,0 +1,37 @@
+"""Added skills name category unique constraint
+
+Revision ID: d9f04b2c7e16
+Revises: a83f20c6d4b1
+Create Date: 2025-10-27 15:08:42.377105
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd9f04b2c7e16'
+down_revision: Union[str, Sequence[str], None] = 'a83f20c6d4b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keep only the newest row of any duplicated (name, category) pair
+    op.execute(sa.text(
+        "DELETE FROM skills WHERE id NOT IN "
+        "(SELECT MAX(id) FROM skills GROUP BY name, category)"
+    ))
+    op.drop_index('ix_skills_name_category', table_name='skills')
+    with op.batch_alter_table('skills') as batch_op:
+        batch_op.create_unique_constraint('uq_skills_name_category', ['name', 'category'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('skills') as batch_op:
+        batch_op.drop_constraint('uq_skills_name_category', type_='unique')
+    op.create_index('ix_skills_name_category', 'skills', ['name', 'category'], unique=False)
@@ -0,0 +1,31 @@
+"""Added wiki page revision columns
+
+Revision ID: e4a1f6b93c72
+Revises: 5b6d0e3a8f21
+Create Date: 2025-10-24 11:05:39.870114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4a1f6b93c72'
+down_revision: Union[str, Sequence[str], None] = '5b6d0e3a8f21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('wiki_pages', sa.Column('source_title', sa.String(), nullable=True))
+    op.add_column('wiki_pages', sa.Column('revision_id', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('wiki_pages') as batch_op:
+        batch_op.drop_column('revision_id')
+        batch_op.drop_column('source_title')
@@ -0,0 +1,90 @@
+"""Added page blobs table
+
+Revision ID: f3b7c91d05a8
+Revises: d9f04b2c7e16
+Create Date: 2025-10-27 18:44:09.152870
+
+"""
+import hashlib
+import zlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b7c91d05a8'
+down_revision: Union[str, Sequence[str], None] = 'd9f04b2c7e16'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    page_blobs = op.create_table(
+        'page_blobs',
+        sa.Column('hash', sa.String(), nullable=False),
+        sa.Column('encoding', sa.String(), nullable=False),
+        sa.Column('size', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.PrimaryKeyConstraint('hash'),
+    )
+
+    # Move every stored body into the blob store, once per distinct body. Bodies are
+    # re-hashed so each is keyed by the SHA256 of exactly what is stored.
+    conn = op.get_bind()
+    bodies = conn.execute(sa.text("SELECT id, content FROM wiki_pages")).all()
+    legacy = conn.execute(sa.text(
+        "SELECT id, content FROM skills WHERE page_id IS NULL AND content IS NOT NULL"
+    )).all()
+
+    rows = {}
+    for table, items in (('wiki_pages', bodies), ('skills', legacy)):
+        for row_id, content in items:
+            raw = content.encode('utf-8')
+            key = hashlib.sha256(raw).hexdigest()
+            rows.setdefault(key, {'hash': key, 'encoding': 'zlib', 'size': len(raw), 'data': zlib.compress(raw, 9)})
+            conn.execute(sa.text(f"UPDATE {table} SET hash = :hash WHERE id = :id"), {'hash': key, 'id': row_id})
+    if rows:
+        op.bulk_insert(page_blobs, list(rows.values()))
+    # Rows linked to a page carry the page hash
+    conn.execute(sa.text(
+        "UPDATE skills SET hash = (SELECT hash FROM wiki_pages WHERE wiki_pages.id = skills.page_id) "
+        "WHERE page_id IS NOT NULL"
+    ))
+
+    with op.batch_alter_table('wiki_pages') as batch_op:
+        batch_op.drop_column('content')
+        batch_op.create_foreign_key('fk_wiki_pages_hash_page_blobs', 'page_blobs', ['hash'], ['hash'])
+    with op.batch_alter_table('skills') as batch_op:
+        batch_op.drop_column('content')
+
+
+def _read(encoding, data):
+    if encoding == 'zstd':
+        import zstandard
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    return zlib.decompress(data).decode('utf-8')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('skills') as batch_op:
+        batch_op.add_column(sa.Column('content', sa.Text(), nullable=True))
+    with op.batch_alter_table('wiki_pages') as batch_op:
+        batch_op.drop_constraint('fk_wiki_pages_hash_page_blobs', type_='foreignkey')
+        batch_op.add_column(sa.Column('content', sa.Text(), nullable=True))
+
+    conn = op.get_bind()
+    for key, encoding, data in conn.execute(sa.text("SELECT hash, encoding, data FROM page_blobs")).all():
+        content = _read(encoding, data)
+        conn.execute(sa.text("UPDATE wiki_pages SET content = :content WHERE hash = :hash"), {'content': content, 'hash': key})
+        conn.execute(
+            sa.text("UPDATE skills SET content = :content WHERE hash = :hash AND page_id IS NULL"),
+            {'content': content, 'hash': key},
+        )
+
+    with op.batch_alter_table('wiki_pages') as batch_op:
+        batch_op.alter_column('content', existing_type=sa.Text(), nullable=False)
+    op.drop_table('page_blobs')
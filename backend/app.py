@@ -1,29 +1,60 @@
-from fastapi import FastAPI, HTTPException, Depends
-from sqlalchemy.orm import Session
-from sqlalchemy import text
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 import subprocess
+import time
 
-from database import get_db, engine
-from models import Base, Skill
+from database import get_async_db, async_engine, engine
+from models import Base
+from artifacts import (
+    build_entity_body, build_index_body, build_recommend_body, build_skill_body, build_skills_body,
+    canonical_skill_name, format_key,
+)
+from cache import response_cache
+from health import health
+from search import MAX_RESULTS, search
+from levels import MAX_LEVEL, MIN_LEVEL
+from entities import normalize_entity
+from scheduler import scheduler
+from scripts import router as scripts_router
+from jobs import job_queue
+import metrics
+import snapshot
 
 #-------------------- APP LIFECYCLE / DB CONNECTION --------------------#
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    if snapshot.SERVE_SNAPSHOT:
+        # 📦 Read-only replica: every read route answers from the bundle, no DB is opened
+        served = snapshot.serve_snapshot(snapshot.SERVE_SNAPSHOT)
+        print(f"📦 Serving snapshot {served.version} from {served.path}")
+        yield
+        return
+
     try:
         # ✅ Create tables if they don’t exist
-        Base.metadata.create_all(bind=engine)
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
 
         # ✅ Test database connection
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
+        if not (await health.check())["ok"]:
+            raise RuntimeError(health.result["error"])
         print("✅ Database connected successfully and tables created.")
     except Exception as e:
         print("❌ Database connection failed:", e)
         raise e
+
+    # 🔄 Serve the current snapshot right away; refresh wiki data in the background
+    scheduler.start()
+    health.start()
     yield
+    await health.stop()
+    await scheduler.stop()
+    job_queue.shutdown()
+    await async_engine.dispose()
     engine.dispose()
     print("🔒 Database connection closed.")
 
@@ -43,35 +74,148 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.include_router(scripts_router)
+
+#-------------------- METRICS --------------------#
+
+# Added before time_requests so it runs inside it, in the task call_next starts
+app.add_middleware(metrics.ProfiledApp)
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """Latency, status and DB work of every request, labelled by route template."""
+    stats = metrics.RequestStats()
+    token = metrics.current_request.set(stats)
+    profiler = metrics.RequestProfiler()
+    profiler_token = metrics.current_profiler.set(profiler)
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        elapsed = time.perf_counter() - started
+        profile = profiler.finish()
+        metrics.current_request.reset(token)
+        metrics.current_profiler.reset(profiler_token)
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics.HTTP_REQUEST_SECONDS.observe(elapsed, method=request.method, route=route, status=str(status))
+        metrics.HTTP_REQUEST_DB_QUERIES.observe(stats.queries, route=route)
+        metrics.HTTP_REQUEST_DB_SECONDS.observe(stats.db_seconds, route=route)
+        metrics.record_slow_request(request.method, request.url.path, status, elapsed, stats, profile)
+
 #-------------------- ROUTES --------------------#
 
+# ?format=html on the skill payload routes: summaries rendered to HTML instead of Markdown
+SummaryFormat = Query("markdown", alias="format", pattern="^(markdown|html)$")
+
+async def respond(request: Request, db: AsyncSession, key: str, build, build_from_snapshot=None):
+    """Answer from the served snapshot when there is one, otherwise through the response cache."""
+    served = snapshot.serving()
+    if served is not None:
+        return served.respond(request, key, build_from_snapshot)
+    return await response_cache.respond(request, db, key, build)
+
+
 @app.get("/ping")
 async def ping():
-    """Health check route for testing DB connection"""
-    try:
-        with engine.connect() as conn:
-            conn.execute(text("SELECT 1"))
-        return {"status": "ok", "message": "Database connected"}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    """Health check route, answered from the latest background database probe"""
+    served = snapshot.serving()
+    if served is not None:
+        return {"status": "ok", "message": "Serving snapshot", "snapshot": served.version}
+    result = await health.current()
+    if not result["ok"]:
+        raise HTTPException(status_code=500, detail=f"Database error: {result['error']}")
+    return {"status": "ok", "message": "Database connected", "checked_at": result["checked_at"]}
 
 
 @app.get("/skills")
-def get_skills(db: Session = Depends(get_db)):
+async def get_skills(request: Request, summary_format: str = SummaryFormat, db: AsyncSession = Depends(get_async_db)):
     """Return all skills and summaries from the database"""
-    skills = db.query(Skill).all()
-    if not skills:
-        return {"message": "No skills found in the database."}
-
-    return [
-        {
-            "id": skill.id,
-            "name": skill.name,
-            "category": skill.category,
-            "summary": skill.summary,
-        }
-        for skill in skills
-    ]
+    key = format_key("skills", summary_format)
+    return await respond(request, db, key, lambda session: build_skills_body(session, summary_format))
+
+
+@app.get("/skills/index")
+async def get_skills_index(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Return skill names and categories without summaries"""
+    return await respond(request, db, "skills/index", build_index_body)
+
+
+@app.get("/skills/{name}")
+async def get_skill(name: str, request: Request, summary_format: str = SummaryFormat, db: AsyncSession = Depends(get_async_db)):
+    """Return the F2P/P2P summaries for a single skill"""
+    key = format_key(f"skills/{canonical_skill_name(name)}", summary_format)
+    return await respond(request, db, key, lambda session: build_skill_body(session, name, summary_format=summary_format))
+
+
+# Declared before /skills/{name}/{category}, which would otherwise capture "recommend"
+@app.get("/skills/{name}/recommend")
+async def recommend_training(
+    name: str,
+    request: Request,
+    level: int = Query(..., ge=MIN_LEVEL, le=MAX_LEVEL),
+    category: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Return the training sections that cover one level of a skill"""
+    category = category.lower() if category else None
+    key = f"recommend/{canonical_skill_name(name)}/{category or '*'}/{level}"
+    return await respond(
+        request, db, key,
+        lambda session: build_recommend_body(session, name, level, category),
+        lambda served: served.recommend_body(name, level, category),
+    )
+
+
+@app.get("/skills/{name}/{category}")
+async def get_skill_category(
+    name: str, category: str, request: Request, summary_format: str = SummaryFormat, db: AsyncSession = Depends(get_async_db),
+):
+    """Return the summary for one skill in one category (f2p or p2p)"""
+    key = format_key(f"skills/{canonical_skill_name(name)}/{category.lower()}", summary_format)
+    return await respond(request, db, key, lambda session: build_skill_body(session, name, category, summary_format))
+
+
+@app.get("/entities/{name}")
+async def get_entity(name: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    """Return every skill that trains with a method, location or item"""
+    key = f"entities/{normalize_entity(name)}"
+    return await respond(request, db, key, lambda session: build_entity_body(session, name))
+
+
+@app.get("/search")
+async def search_guides(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=MAX_RESULTS),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Ranked guide and summary sections matching a query, with snippets"""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="Empty query")
+    served = snapshot.serving()
+    if served is not None:
+        return {"query": q, "results": served.search(q, limit)}
+    return {"query": q, "results": await search(db, q, limit)}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    """Request, database, cache and pipeline metrics in the Prometheus text format"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/slow")
+async def get_slow_requests():
+    """The most recent requests slower than SLOW_REQUEST_MS, with profiles when PROFILE_REQUESTS is on"""
+    return {"threshold_ms": metrics.SLOW_REQUEST_MS, "requests": list(reversed(metrics.slow_requests))}
+
+
+@app.get("/refresh/status")
+async def refresh_status():
+    """Status of the background wiki refresh"""
+    return scheduler.status
 
 
 @app.get("/about")
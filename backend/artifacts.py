@@ -0,0 +1,211 @@
+import argparse
+import gzip
+import json
+import os
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import get_db
+from entities import entity_skills, normalize_entity
+from levels import recommend
+from models import ResponseArtifact, Skill, backfill_payloads, serialize_skill, write_missing_payloads
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+# Bodies smaller than this are served as-is; compressing them saves nothing.
+ARTIFACT_MIN_SIZE = int(os.getenv("ARTIFACT_MIN_SIZE", "512"))
+GZIP_LEVEL = 9
+# Only changed bodies are re-encoded on each bump, but a full rebuild (first bump, or a
+# payload change touching every key) pays this per key; lower it to trade size for speed
+BROTLI_QUALITY = int(os.getenv("ARTIFACT_BROTLI_QUALITY", "11"))
+
+# Encodings in the order we prefer them when a client accepts several
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+# Skill payload routes send the Markdown summary, or with ?format=html the same summary
+# rendered to HTML; never both, so neither variant pays for the other's bytes.
+SUMMARY_FORMATS = ("markdown", "html")
+
+
+#-------------------- BODY BUILDERS --------------------#
+
+def canonical_skill_name(name: str) -> str:
+    """Skill names are stored capitalized (e.g. Attack), which keeps lookups on the index."""
+    return name.strip().capitalize()
+
+
+def format_key(key: str, summary_format: str = "markdown") -> str:
+    """Response cache key of a skill payload route in ``summary_format``, e.g. skills/Attack.html."""
+    return key if summary_format == "markdown" else f"{key}.{summary_format}"
+
+
+def skill_payloads(db: Session, where=(), order_by=Skill.id, summary_format: str = "markdown") -> list[str]:
+    """Serialized skill objects of the matching rows, carrying their summary in ``summary_format``."""
+    if summary_format == "html":
+        query = select(Skill.payload, Skill.id, Skill.name, Skill.category, Skill.summary_html)
+    else:
+        # Only the payload column is read; the wiki HTML never leaves the DB.
+        query = select(Skill.payload)
+    query = query.where(*where).order_by(order_by)
+    rows = db.execute(query).all()
+    if any(row.payload is None for row in rows):
+        backfill_payloads(db)
+        rows = db.execute(query).all()
+    if summary_format == "html":
+        return [serialize_skill(row.id, row.name, row.category, row.summary_html, "summary_html") for row in rows]
+    return [row.payload for row in rows]
+
+
+def build_skills_body(db: Session, summary_format: str = "markdown") -> bytes:
+    """Join the pre-serialized payloads into the /skills response body."""
+    payloads = skill_payloads(db, summary_format=summary_format)
+    if not payloads:
+        return json.dumps({"message": "No skills found in the database."}).encode("utf-8")
+    return ("[" + ",".join(payloads) + "]").encode("utf-8")
+
+
+def json_body(value) -> bytes:
+    """Compact UTF-8 JSON, as every pre-built body is stored."""
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def build_index_body(db: Session) -> bytes:
+    """Names and categories only, for listing pages that never show summaries."""
+    rows = db.execute(select(Skill.id, Skill.name, Skill.category).order_by(Skill.id)).all()
+    return json_body([{"id": row.id, "name": row.name, "category": row.category} for row in rows])
+
+
+def build_skill_body(db: Session, name: str, category: str | None = None, summary_format: str = "markdown") -> bytes | None:
+    """Payloads for one skill, or for one (skill, category) row when category is given."""
+    where = [Skill.name == canonical_skill_name(name)]
+    if category is not None:
+        where.append(Skill.category == category.lower())
+    payloads = skill_payloads(db, where, Skill.category, summary_format)
+    if not payloads:
+        return None
+    if category is not None:
+        return payloads[0].encode("utf-8")
+    return ("[" + ",".join(payloads) + "]").encode("utf-8")
+
+
+def build_recommend_body(db: Session, name: str, level: int, category: str | None = None) -> bytes | None:
+    """Level-range sections covering ``level`` for one skill, or None if the skill is unknown."""
+    results = recommend(db, canonical_skill_name(name), level, category)
+    if results is None:
+        return None
+    return json_body({"name": canonical_skill_name(name), "level": level, "results": results})
+
+
+def build_entity_body(db: Session, name: str) -> bytes | None:
+    """Skills, categories and level ranges that mention one entity, or None if none do."""
+    results = entity_skills(db, name)
+    if not results:
+        return None
+    return json_body({"entity": normalize_entity(name), "results": results})
+
+
+#-------------------- ENCODINGS --------------------#
+
+def encode_body(body: bytes) -> dict[str, bytes]:
+    """The body plus its gzip and brotli encodings, keyed by Content-Encoding."""
+    bodies = {"identity": body}
+    if len(body) < ARTIFACT_MIN_SIZE:
+        return bodies
+    # mtime=0 keeps the gzip bytes identical for identical bodies
+    bodies["gzip"] = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    if brotli is not None:
+        bodies["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+    return bodies
+
+
+def negotiate(accept_encoding: str | None, available) -> str:
+    """Best of ``available`` for an Accept-Encoding header, falling back to identity."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if coding:
+            accepted[coding.lower()] = quality
+
+    choices = [
+        encoding for encoding in ENCODINGS
+        if encoding in available and accepted.get(encoding, accepted.get("*", 0.0)) > 0
+    ]
+    if not choices:
+        return "identity"
+    return max(choices, key=lambda encoding: accepted.get(encoding, accepted.get("*", 0.0)))
+
+
+#-------------------- STORED ARTIFACTS --------------------#
+
+def artifact_bodies(db: Session) -> dict[str, bytes]:
+    """Every skill response worth building ahead of time, keyed like the response cache."""
+    bodies = {"skills/index": build_index_body(db)}
+    rows = db.execute(select(Skill.name, Skill.category).order_by(Skill.name, Skill.category)).all()
+    for summary_format in SUMMARY_FORMATS:
+        bodies[format_key("skills", summary_format)] = build_skills_body(db, summary_format)
+        for name in {row.name for row in rows}:
+            key = format_key(f"skills/{canonical_skill_name(name)}", summary_format)
+            bodies[key] = build_skill_body(db, name, summary_format=summary_format)
+        for row in rows:
+            if row.category is not None:
+                key = format_key(f"skills/{canonical_skill_name(row.name)}/{row.category.lower()}", summary_format)
+                bodies[key] = build_skill_body(db, row.name, row.category, summary_format)
+    return bodies
+
+
+def write_artifacts(db: Session, version: str) -> int:
+    """
+    Bring the stored response bodies up to ``version``; the caller commits. Only bodies
+    that differ from the stored ones are encoded again; the rest are re-stamped with the
+    new version. Returns how many bodies were encoded.
+    """
+    write_missing_payloads(db)
+    bodies = {key: body for key, body in artifact_bodies(db).items() if body is not None}
+    table = ResponseArtifact.__table__
+    stored = dict(db.execute(select(table.c.key, table.c.data).where(table.c.encoding == "identity")).all())
+    changed = [key for key, body in bodies.items() if stored.get(key) != body]
+    stale = changed + [key for key in stored if key not in bodies]
+    if stale:
+        db.execute(table.delete().where(table.c.key.in_(stale)))
+    db.execute(table.update().values(version=version))
+    rows = [
+        {"key": key, "encoding": encoding, "version": version, "data": data}
+        for key in changed
+        for encoding, data in encode_body(bodies[key]).items()
+    ]
+    if rows:
+        db.execute(table.insert(), rows)
+    return len(changed)
+
+
+def read_artifacts(db: Session, key: str, version: str) -> dict[str, bytes] | None:
+    """Stored encodings of one response for ``version``, or None if it was not pre-built."""
+    rows = db.execute(
+        select(ResponseArtifact.encoding, ResponseArtifact.data)
+        .where(ResponseArtifact.key == key, ResponseArtifact.version == version)
+    ).all()
+    return {row.encoding: row.data for row in rows} or None
+
+
+if __name__ == "__main__":
+    from cache import bump_dataset_version
+
+    parser = argparse.ArgumentParser(description="Maintain the pre-built response bodies.")
+    parser.add_argument("--rebuild", action="store_true", help="Re-render every summary and rebuild the stored bodies")
+    args = parser.parse_args()
+    if args.rebuild:
+        db: Session = next(get_db())
+        db.execute(Skill.__table__.update().values(payload=None))
+        bump_dataset_version(db)
+        db.commit()
+        print(f"📦 Stored {db.query(ResponseArtifact).count()} response bodies.")
@@ -0,0 +1,419 @@
+"""
+Benchmarks for the API and the refresh pipeline, seeded from the skill_pages/ corpus.
+
+    python bench.py                 # run everything, print JSON results
+    python bench.py --only api      # one section: clean, fetch, summarize, api
+    python bench.py --save          # record the results as bench_baseline.json
+    python bench.py --check         # fail if a timing regressed past --threshold
+
+Everything runs against a scratch SQLite database (BENCH_DATABASE_URL to use another),
+a local stub wiki server and a fake LLM, so nothing touches production or the network.
+App modules are imported inside the benchmarks, after DATABASE_URL points at the scratch DB.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+BASELINE_PATH = Path(__file__).resolve().parent / "bench_baseline.json"
+REGRESSION_THRESHOLD = 0.25
+# Timing changes smaller than this (in ms) are noise, whatever the ratio
+MIN_DELTA_MS = 1.0
+
+SECTIONS = ("clean", "fetch", "summarize", "api")
+
+
+#-------------------- HELPERS --------------------#
+
+def percentile(values, pct: float) -> float:
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def median_ms(run, repeat: int) -> float:
+    """Median wall time of ``run()`` over ``repeat`` calls, in ms."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - started) * 1000)
+    return round(statistics.median(times), 3)
+
+
+def corpus_html(text: str) -> str:
+    """Wrap corpus text in the wiki markup clean_page has to work through."""
+    parts = ['<div class="mw-parser-output"><div id="toc" class="toc"><ul><li>Contents</li></ul></div>']
+    for line in text.splitlines():
+        line = line.strip()
+        if line.startswith("## "):
+            parts.append(f'<h2><span class="mw-headline">{line[3:]}</span>'
+                         '<span class="mw-editsection">[edit | edit source]</span></h2>')
+        elif line.startswith("- "):
+            parts.append(f"<ul><li>{line[2:]}<sup class=\"reference\">[1]</sup></li></ul>")
+        elif " | " in line:
+            cells = "".join(f"<td>{cell}</td>" for cell in line.split(" | "))
+            parts.append(f"<table class=\"wikitable\"><tr>{cells}</tr></table>")
+        elif line:
+            parts.append(f"<p>{line}</p>")
+    parts.append('<div class="navbox">Skills navigation</div></div>')
+    return "".join(parts)
+
+
+def largest_pages(count: int) -> list[tuple[str, str]]:
+    """(title, text) of the ``count`` largest corpus pages."""
+    import skill_fetcher
+
+    pages, files = skill_fetcher.corpus_pages()
+    texts = {title: skill_fetcher.read_corpus_page(paths).text for title, paths in files.items()}
+    return sorted(texts.items(), key=lambda item: -len(item[1]))[:count]
+
+
+def reset_database():
+    from database import Base, engine
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+
+class FakeCompletions:
+    """Chat completions stand-in: fixed latency, a Markdown summary of the prompt's guide."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def create(self, model, messages):
+        from unittest.mock import MagicMock
+
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        words = [word for word in messages[0]["content"].split() if word.istitle()][-6:]
+        summary = "### Level 1–99\n" + "\n".join(f"- Train with **{word}** at **Lumbridge**." for word in words)
+        return MagicMock(choices=[MagicMock(message=MagicMock(content=summary))])
+
+
+def fake_pool(latency: float):
+    from unittest.mock import MagicMock
+    from summarize_skills import SummaryPool
+
+    completions = FakeCompletions(latency)
+    pool = SummaryPool(client=MagicMock(chat=MagicMock(completions=completions)), requests_per_minute=0, tokens_per_minute=0)
+    return pool, completions
+
+
+class StubWiki:
+    """MediaWiki API stand-in on a local port, serving corpus pages as HTML after ``latency`` seconds."""
+
+    def __init__(self, pages: dict, latency: float):
+        self.pages = pages
+        self.latency = latency
+        self.requests = 0
+        self.url = None
+        self._server = None
+        self._thread = None
+
+    async def _app(self, scope, receive, send):
+        from starlette.requests import Request
+        from starlette.responses import JSONResponse
+
+        if scope["type"] != "http":
+            return
+        self.requests += 1
+        params = Request(scope).query_params
+        await asyncio.sleep(self.latency)
+        if params.get("action") == "query":
+            titles = params["titles"].split("|")
+            body = {"query": {"pages": [
+                {"title": title, "revisions": [{"revid": 1, "timestamp": "2025-01-01T00:00:00Z"}]}
+                if title in self.pages else {"title": title, "missing": True}
+                for title in titles
+            ]}}
+        elif params.get("page") in self.pages:
+            body = {"parse": {"text": {"*": self.pages[params["page"]]}}}
+        else:
+            body = {"error": {"code": "missingtitle", "info": "The page you specified doesn't exist."}}
+        await JSONResponse(body)(scope, receive, send)
+
+    def __enter__(self):
+        import uvicorn
+
+        self._server = uvicorn.Server(uvicorn.Config(
+            self._app, host="127.0.0.1", port=0, log_level="warning", lifespan="off", interface="asgi3",
+        ))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            time.sleep(0.01)
+        port = self._server.servers[0].sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/api.php"
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.should_exit = True
+        self._thread.join()
+
+
+def stub_pages() -> dict:
+    """Every corpus page as wiki HTML, under the title the fetcher asks for."""
+    import skill_fetcher
+
+    pages, files = skill_fetcher.corpus_pages()
+    return {title: corpus_html(skill_fetcher.read_corpus_page(paths).text) for title, paths in files.items()}
+
+
+#-------------------- SECTIONS --------------------#
+
+def bench_clean(repeat: int = 5, count: int = 3) -> dict:
+    """HTML cleaning and text export on the largest corpus pages."""
+    import httpx
+    import skill_fetcher
+    from export_skills import export_skill_text
+    from guide_text import clean_page, html_to_text
+
+    pages = [(title, corpus_html(text)) for title, text in largest_pages(count)]
+
+    async def fetch_one(html):
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, json={"parse": {"text": {"*": html}}}))
+        async with skill_fetcher.WikiClient(transport=transport, requests_per_second=0) as client:
+            return await skill_fetcher.fetch_html_content(client, "Bench_page")
+
+    output_dir = tempfile.mkdtemp(prefix="osrs-bench-export-")
+    results = {"pages": [title for title, _ in pages], "html_bytes": sum(len(html) for _, html in pages)}
+    results["clean_page_ms"] = round(sum(median_ms(lambda: clean_page(html), repeat) for _, html in pages), 3)
+    results["html_to_text_ms"] = round(sum(median_ms(lambda: html_to_text(html), repeat) for _, html in pages), 3)
+    results["fetch_html_content_ms"] = round(sum(
+        median_ms(lambda: asyncio.run(fetch_one(html)), repeat) for _, html in pages
+    ), 3)
+    texts = [(title, clean_page(html).text) for title, html in pages]
+    results["export_skill_text_ms"] = round(sum(
+        median_ms(lambda: export_skill_text(title, "p2p", text, output_dir), repeat) for title, text in texts
+    ), 3)
+    return results
+
+
+def bench_fetch(latency: float = 0.05, llm_latency: float = 0.2) -> dict:
+    """Batch fetch + summarize versus the streaming refresh, against the stub wiki and fake LLM."""
+    import pipeline
+    import skill_fetcher
+    import summarize_skills
+    from database import SessionLocal
+    from models import WikiPage
+
+    def stored_pages() -> int:
+        db = SessionLocal()
+        try:
+            return db.query(WikiPage).count()
+        finally:
+            db.close()
+
+    results = {"wiki_latency_ms": latency * 1000, "llm_latency_ms": llm_latency * 1000}
+    with StubWiki(stub_pages(), latency) as wiki:
+        def client():
+            return skill_fetcher.WikiClient(api_url=wiki.url, requests_per_second=0, backoff_base=0)
+
+        reset_database()
+        pool, completions = fake_pool(llm_latency)
+        started = time.perf_counter()
+        skill_fetcher.store_skills(client=client())
+        results["store_skills_seconds"] = round(time.perf_counter() - started, 3)
+        summarize_skills.main(pool=pool)
+        results["batch_refresh_seconds"] = round(time.perf_counter() - started, 3)
+        results["wiki_requests"] = wiki.requests
+        results["batch_pages_stored"] = stored_pages()
+
+        reset_database()
+        pool, completions = fake_pool(llm_latency)
+        started = time.perf_counter()
+        stages = asyncio.run(pipeline.stream_refresh(client=client(), pool=pool, export=False))
+        results["stream_refresh_seconds"] = round(time.perf_counter() - started, 3)
+        results["stream_pages_stored"] = stored_pages()
+        results["stream_stages"] = stages
+        results["llm_calls"] = completions.calls
+    return results
+
+
+def bench_summarize(llm_latency: float = 0.2) -> dict:
+    """Re-summarize the whole corpus (forced) against the fake LLM."""
+    import skill_fetcher
+    import summarize_skills
+
+    reset_database()
+    skill_fetcher.ingest_corpus()
+    pool, completions = fake_pool(llm_latency)
+    started = time.perf_counter()
+    summarize_skills.main(force=True, pool=pool)
+    return {
+        "llm_latency_ms": llm_latency * 1000,
+        "summarize_all_seconds": round(time.perf_counter() - started, 3),
+        "llm_calls": completions.calls,
+    }
+
+
+def bench_api(concurrency: int = 16, requests: int = 400) -> dict:
+    """Latency percentiles and throughput of the read routes under concurrent load."""
+    import httpx
+    import skill_fetcher
+    import summarize_skills
+    from app import app
+    from cache import response_cache
+    from database import SessionLocal
+    from models import Skill
+
+    reset_database()
+    skill_fetcher.ingest_corpus()
+    summarize_skills.main(pool=fake_pool(0)[0])
+    db = SessionLocal()
+    names = sorted({name for (name,) in db.query(Skill.name)})
+    db.close()
+
+    async def load(path_for, headers=None) -> dict:
+        latencies = []
+        counter = iter(range(requests))
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            async def worker():
+                for i in counter:
+                    started = time.perf_counter()
+                    # Raw bytes: the client decompressing would be timed as server latency
+                    async with client.stream("GET", path_for(i), headers=headers or {}) as response:
+                        async for _ in response.aiter_raw():
+                            pass
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    assert response.status_code in (200, 304), response.status_code
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+        return {
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "rps": round(len(latencies) / elapsed, 1),
+        }
+
+    async def run() -> dict:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            response_cache.invalidate()
+            started = time.perf_counter()
+            etag = (await client.get("/skills", headers={"Accept-Encoding": "identity"})).headers["etag"]
+            cold_ms = round((time.perf_counter() - started) * 1000, 3)
+
+        return {
+            "concurrency": concurrency,
+            "requests": requests,
+            "skills_cold_ms": cold_ms,
+            "skills": await load(lambda i: "/skills", {"Accept-Encoding": "identity"}),
+            "skills_br": await load(lambda i: "/skills", {"Accept-Encoding": "br, gzip"}),
+            "skills_not_modified": await load(lambda i: "/skills", {"If-None-Match": etag}),
+            "skill_detail": await load(lambda i: f"/skills/{names[i % len(names)]}", {"Accept-Encoding": "gzip"}),
+            "search": await load(lambda i: "/search?q=crabs"),
+        }
+
+    return asyncio.run(run())
+
+
+#-------------------- BASELINES --------------------#
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    """{"api.skills.p95_ms": 1.2, ...} for every number in ``results``."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare_results(baseline: dict, current: dict, threshold: float = REGRESSION_THRESHOLD) -> list[str]:
+    """
+    Regressions of ``current`` against ``baseline``: timings (``*_ms``, ``*_seconds``)
+    that grew, or throughputs (``rps``) that fell, by more than ``threshold``.
+    """
+    base, now = flatten(baseline), flatten(current)
+    regressions = []
+    for name, before in base.items():
+        after = now.get(name)
+        if after is None or before <= 0:
+            continue
+        leaf = name.rsplit(".", 1)[-1]
+        if leaf.endswith("_ms") or leaf.endswith("_seconds"):
+            scale = 1 if leaf.endswith("_ms") else 1000
+            if after > before * (1 + threshold) and (after - before) * scale >= MIN_DELTA_MS:
+                regressions.append(f"{name}: {before} → {after} (+{(after / before - 1):.0%})")
+        elif leaf == "rps" and after < before * (1 - threshold):
+            regressions.append(f"{name}: {before} → {after} ({(after / before - 1):.0%})")
+    return regressions
+
+
+def run(sections) -> dict:
+    runners = {"clean": bench_clean, "fetch": bench_fetch, "summarize": bench_summarize, "api": bench_api}
+    results = {}
+    for section in sections:
+        print(f"⏱️ Benchmarking {section}...", file=sys.stderr)
+        # Pipeline progress output would mix with the JSON on stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            results[section] = runners[section]()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the API and the refresh pipeline.")
+    parser.add_argument("--only", default=",".join(SECTIONS), help=f"comma-separated sections ({', '.join(SECTIONS)})")
+    parser.add_argument("--save", action="store_true", help=f"write the results to {BASELINE_PATH.name}")
+    parser.add_argument("--check", action="store_true", help="compare with the baseline and fail on regressions")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="allowed slowdown, e.g. 0.25 for 25%%")
+    parser.add_argument("--out", help="also write the results to this file")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="osrs-bench-")
+    # Set before any app module creates its engines
+    os.environ["DATABASE_URL"] = os.getenv("BENCH_DATABASE_URL", f"sqlite:///{scratch}/bench.db")
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+    os.environ["REFRESH_INTERVAL_SECONDS"] = "0"
+
+    sections = [section.strip() for section in args.only.split(",") if section.strip()]
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "results": run(sections),
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    if args.save:
+        previous = json.loads(BASELINE_PATH.read_text(encoding="utf-8"))["results"] if BASELINE_PATH.exists() else {}
+        baseline = {"meta": report["meta"], "results": {**previous, **report["results"]}}
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        print(f"💾 Saved baseline to {BASELINE_PATH}", file=sys.stderr)
+
+    if args.check:
+        if not BASELINE_PATH.exists():
+            sys.exit(f"❌ No baseline at {BASELINE_PATH}; run with --save first")
+        baseline = json.loads(BASELINE_PATH.read_text(encoding="utf-8"))["results"]
+        regressions = compare_results({key: baseline[key] for key in sections if key in baseline}, report["results"], args.threshold)
+        if regressions:
+            print("❌ Regressions past the threshold:", file=sys.stderr)
+            for line in regressions:
+                print(f"   {line}", file=sys.stderr)
+            sys.exit(1)
+        print("✅ No regressions.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
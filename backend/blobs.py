@@ -0,0 +1,37 @@
+import hashlib
+import os
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # optional; zlib is always available
+    zstandard = None
+
+# Codec for new blobs; each blob records its own, so the setting can change at any time.
+BLOB_COMPRESSION = os.getenv("BLOB_COMPRESSION", "zstd" if zstandard else "zlib")
+ZLIB_LEVEL = 9
+ZSTD_LEVEL = 19
+
+
+def content_hash(text: str) -> str:
+    """SHA-256 of a page body; the key it is stored under."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def compress(text: str, encoding: str = None) -> tuple[str, bytes]:
+    """Compress a page body. Returns (encoding, data)."""
+    encoding = encoding or BLOB_COMPRESSION
+    raw = text.encode("utf-8")
+    if encoding == "zstd" and zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return "zlib", zlib.compress(raw, ZLIB_LEVEL)
+
+
+def decompress(encoding: str, data: bytes) -> str:
+    if encoding == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd blobs")
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    if encoding == "zlib":
+        return zlib.decompress(data).decode("utf-8")
+    raise ValueError(f"Unknown blob encoding: {encoding}")
@@ -0,0 +1,160 @@
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from artifacts import encode_body, negotiate, read_artifacts, write_artifacts
+from metrics import counter, gauge
+from models import DatasetVersion, Skill, write_missing_payloads
+
+# How long a worker trusts its cached dataset version before re-reading it from the DB.
+CACHE_REVALIDATE_SECONDS = float(os.getenv("CACHE_REVALIDATE_SECONDS", "2"))
+
+
+def compute_dataset_version(db: Session) -> str:
+    """Digest every skill's content hash and served payload into one version string."""
+    digest = hashlib.sha256()
+    rows = db.execute(select(Skill.id, Skill.hash, Skill.payload).order_by(Skill.id))
+    for skill_id, content_hash, payload in rows:
+        digest.update(f"{skill_id}:{content_hash}:{payload or ''}\n".encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def read_version(db: Session) -> str:
+    """The published dataset version, or the one the data would get if none was published yet."""
+    stored = db.execute(
+        select(DatasetVersion.version).where(DatasetVersion.id == 1)
+    ).scalar()
+    return stored or compute_dataset_version(db)
+
+
+def bump_dataset_version(db: Session) -> str:
+    """
+    Record the current dataset version and pre-build its response bodies; the caller
+    commits both with its own writes.
+    """
+    db.flush()
+    write_missing_payloads(db)
+    version = compute_dataset_version(db)
+    write_artifacts(db, version)
+    now = datetime.now(timezone.utc)
+
+    row = db.get(DatasetVersion, 1)
+    if row is None:
+        db.add(DatasetVersion(id=1, version=version, updated_at=now))
+    else:
+        row.version = version
+        row.updated_at = now
+
+    response_cache.invalidate()
+    return version
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against our strong ETag."""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def cache_headers(version: str) -> dict:
+    return {"ETag": f'"{version}"', "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+
+
+def encoded_response(request: Request, version: str, bodies: dict[str, bytes]) -> Response:
+    """The encoding of a JSON body the client accepts best, validated by the dataset version."""
+    headers = cache_headers(version)
+    encoding = negotiate(request.headers.get("accept-encoding"), bodies)
+    if encoding != "identity":
+        # Same JSON in another encoding: a weak validator, as nginx does
+        headers["ETag"] = f"W/{headers['ETag']}"
+        headers["Content-Encoding"] = encoding
+    return Response(content=bodies[encoding], media_type="application/json", headers=headers)
+
+
+class ResponseCache:
+    """Serialized response bodies and their encodings, valid for one dataset version."""
+
+    def __init__(self, revalidate_seconds: float = CACHE_REVALIDATE_SECONDS):
+        self.revalidate_seconds = revalidate_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._version = None
+        self._checked_at = 0.0
+        self._bodies = {}
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+            self._bodies.clear()
+
+    async def version(self, db: AsyncSession) -> str:
+        """Current dataset version, re-read from the DB at most once per interval."""
+        now = time.monotonic()
+        if self._version is not None and now - self._checked_at < self.revalidate_seconds:
+            return self._version
+
+        version = await db.run_sync(read_version)
+
+        with self._lock:
+            if version != self._version:
+                self._bodies.clear()
+                self._version = version
+            self._checked_at = now
+        return version
+
+    async def respond(self, request: Request, db: AsyncSession, key, build) -> Response:
+        """Answer with a 304, a cached body, or a stored or freshly built one.
+
+        Bodies come pre-compressed: from ``response_artifacts`` when the pipeline built
+        them, otherwise ``build(session)`` runs through ``AsyncSession.run_sync`` and its
+        body (None when the resource does not exist) is encoded once per version. The
+        body is resolved before the ETag is checked, so a missing key is a 404, never a 304.
+        """
+        version = await self.version(db)
+        bodies = self._bodies.get(key)
+        if bodies is None:
+            self.misses += 1
+
+            def load(session: Session):
+                stored = read_artifacts(session, key, version)
+                if stored is not None:
+                    return stored
+                body = build(session)
+                return encode_body(body) if body is not None else None
+
+            bodies = await db.run_sync(load)
+            if bodies is None:
+                raise HTTPException(status_code=404, detail=f"Not found: {key}")
+            with self._lock:
+                if self._version == version:
+                    self._bodies[key] = bodies
+        else:
+            self.hits += 1
+
+        if etag_matches(request.headers.get("if-none-match"), f'"{version}"'):
+            return Response(status_code=304, headers=cache_headers(version))
+        return encoded_response(request, version, bodies)
+
+
+response_cache = ResponseCache()
+
+counter(
+    "osrs_response_cache_requests_total", "Cached responses served (hit) or built (miss)", ("result",),
+    collect=lambda: {("hit",): response_cache.hits, ("miss",): response_cache.misses},
+)
+gauge(
+    "osrs_response_cache_hit_ratio", "Share of cached responses served without building them",
+    collect=lambda: {(): response_cache.hits / max(1, response_cache.hits + response_cache.misses)},
+)
@@ -1,15 +1,71 @@
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 import os
 from dotenv import load_dotenv
 
+from metrics import instrument_engine
+
 load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+# Replicas serving a snapshot bundle (SERVE_SNAPSHOT) have no database. Engines only
+# connect when first used, so the in-memory placeholder is never actually opened.
+DATABASE_URL = os.getenv("DATABASE_URL") or ("sqlite://" if os.getenv("SERVE_SNAPSHOT") else None)
+
+# Connection pool settings (ignored for SQLite, which uses its own pool classes)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+
+# Async drivers used by the API for each sync URL scheme
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "postgres": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def pool_options(url) -> dict:
+    """Explicit pool sizing and pre-ping for server databases."""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
 
-engine = create_engine(DATABASE_URL)
+
+def async_database_url(url):
+    """
+    Same database through its async driver, e.g. postgresql:// -> postgresql+asyncpg://
+    and sqlite:// -> sqlite+aiosqlite://. asyncpg takes ``ssl`` instead of ``sslmode``.
+    """
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        return url
+    url = url.set(drivername=f"{'postgresql' if backend == 'postgres' else backend}+{ASYNC_DRIVERS[backend]}")
+    if "sslmode" in url.query and url.get_backend_name() == "postgresql":
+        query = dict(url.query)
+        query["ssl"] = query.pop("sslmode")
+        url = url.set(query=query)
+    return url
+
+
+# Sync engine for the pipeline, scripts and migrations
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for API request handlers, so queries never block the event loop
+async_engine = create_async_engine(async_database_url(DATABASE_URL), **pool_options(DATABASE_URL))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Query timings and pool usage for /metrics
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+
 # Base for all models to inherit
 Base = declarative_base()
 
@@ -20,3 +76,34 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Async dependency for FastAPI routes
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Dialects with INSERT ... ON CONFLICT support
+UPSERT_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def upsert_statement(db, table, conflict_columns, update_columns, where=None):
+    """
+    Dialect-aware ``INSERT ... ON CONFLICT (conflict_columns) DO UPDATE`` for ``table``.
+    ``where(table, excluded)`` limits which conflicting rows are actually rewritten; with
+    no ``update_columns`` conflicting rows are left alone (``DO NOTHING``).
+    Execute it with a list of row dicts to insert them in one statement.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect not in UPSERT_INSERTS:
+        raise NotImplementedError(f"No upsert support for {dialect}")
+    stmt = UPSERT_INSERTS[dialect](table)
+    if not update_columns:
+        return stmt.on_conflict_do_nothing(index_elements=list(conflict_columns))
+    excluded = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=list(conflict_columns),
+        set_={column: excluded[column] for column in update_columns},
+        where=where(table, excluded) if where is not None else None,
+    )
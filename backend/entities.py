@@ -0,0 +1,86 @@
+import argparse
+import re
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import get_db
+from guide_text import BOLD, LEVEL_RANGE, split_sections
+from models import Entity, Skill
+
+WORD = re.compile(r"[a-z0-9]+")
+# Bold level numbers ("**20**", "**Level 40**") are emphasis, not entities
+LEVEL_ONLY = re.compile(r"(?:level )?[\d ]+")
+
+
+def normalize_entity(label: str) -> str:
+    """
+    Lookup key for a bolded name: lowercase words without punctuation, plurals folded,
+    so "Sand Crabs", "sand crab" and "Sand-crabs" share one key.
+    """
+    words = WORD.findall(label.lower().replace("'", ""))
+    return " ".join(word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word for word in words)
+
+
+def summary_entities(summary: str | None) -> list[dict]:
+    """Bolded methods, locations and items of a summary with the level range they appear under."""
+    entities, seen = [], set()
+    for section in split_sections(summary or ""):
+        levels = section.levels or (None, None)
+        for match in BOLD.finditer(section.text):
+            label = " ".join(match.group(1).split()).strip(" .,:;")
+            key = normalize_entity(label)
+            if not key or LEVEL_ONLY.fullmatch(key) or LEVEL_RANGE.search(label) or (key, levels) in seen:
+                continue
+            seen.add((key, levels))
+            entities.append({"name": key, "label": label, "min_level": levels[0], "max_level": levels[1]})
+    return entities
+
+
+def extract_entities(db: Session, skills) -> int:
+    """Replace the entities of the given rows, whose summaries changed; the caller commits."""
+    skills = list(skills)
+    if not skills:
+        return 0
+    db.execute(Entity.__table__.delete().where(Entity.skill_id.in_([skill.id for skill in skills])))
+    rows = [{"skill_id": skill.id, **entity} for skill in skills for entity in summary_entities(skill.summary)]
+    if rows:
+        db.execute(Entity.__table__.insert(), rows)
+    return len(rows)
+
+
+def rebuild_entities(db: Session) -> int:
+    """Extract entities from every summary from scratch (after a migration or restore)."""
+    db.execute(Entity.__table__.delete())
+    count = extract_entities(db, db.query(Skill).filter(Skill.summary.is_not(None)).all())
+    db.commit()
+    return count
+
+
+def entity_skills(db: Session, name: str) -> list[dict]:
+    """Every (skill, category, level range) that mentions an entity, by its normalized name."""
+    rows = db.execute(
+        select(Skill.name, Skill.category, Entity.label, Entity.min_level, Entity.max_level)
+        .join(Skill, Skill.id == Entity.skill_id)
+        .where(Entity.name == normalize_entity(name))
+        .order_by(Skill.name, Skill.category, Entity.min_level, Entity.max_level)
+    )
+    return [
+        {
+            "name": row.name,
+            "category": row.category,
+            "label": row.label,
+            "min_level": row.min_level,
+            "max_level": row.max_level,
+        }
+        for row in rows
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the entity index.")
+    parser.add_argument("--rebuild", action="store_true", help="Re-extract entities from every summary")
+    args = parser.parse_args()
+    if args.rebuild:
+        db: Session = next(get_db())
+        print(f"🏷️ Extracted {rebuild_entities(db)} entity mentions.")
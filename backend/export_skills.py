@@ -2,32 +2,41 @@ import os
 from sqlalchemy.orm import Session
 from database import get_db
 from models import Skill
-from bs4 import BeautifulSoup
+from guide_text import html_to_text
 
 OUTPUT_DIR = "output"
 
+
+def export_skill_text(name: str, category: str | None, text_content: str, output_dir: str = OUTPUT_DIR) -> str:
+    """Write one skill's guide text to ``<output_dir>/<name>_<category>.txt``. Returns the path."""
+    os.makedirs(output_dir, exist_ok=True)
+    # Use category instead of mode (f2p / p2p)
+    category = category if category else "general"
+
+    # File name pattern: attack_f2p.txt, defence_p2p.txt, etc.
+    filename = f"{name.lower()}_{category}.txt"
+    filepath = os.path.join(output_dir, filename)
+
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write(f"--- Skill: {name} ({category.upper()}) ---\n\n")
+        f.write(text_content)
+    return filepath
+
+
 def export_skills():
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
     db: Session = next(get_db())
 
     skills = db.query(Skill).all()
+    texts = {}  # shared pages are only converted once
     for skill in skills:
         # Convert HTML back to readable text
-        soup = BeautifulSoup(skill.content, "html.parser")
-        text_content = soup.get_text(separator="\n", strip=True)
-
-        # Use category instead of mode (f2p / p2p)
-        category = skill.category if skill.category else "general"
-
-        # File name pattern: attack_f2p.txt, defence_p2p.txt, etc.
-        filename = f"{skill.name.lower()}_{category}.txt"
-        filepath = os.path.join(OUTPUT_DIR, filename)
-
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(f"--- Skill: {skill.name} ({category.upper()}) ---\n\n")
-            f.write(text_content)
+        key = skill.page_id or ("skill", skill.id)
+        if key not in texts:
+            # Text is stored at fetch time; only legacy rows need an HTML pass
+            texts[key] = skill.page_text or html_to_text(skill.page_content)
 
-        print(f"📄 Exported {skill.name} ({category}) → {filepath}")
+        filepath = export_skill_text(skill.name, skill.category, texts[key])
+        print(f"📄 Exported {skill.name} ({skill.category or 'general'}) → {filepath}")
 
 if __name__ == "__main__":
     export_skills()
@@ -5,28 +5,34 @@ from models import Skill
 
 OUTPUT_DIR = "ai_summary"
 
-def export_summaries():
-    # Ensure output directory exists
-    os.makedirs(OUTPUT_DIR, exist_ok=True)
 
+def export_summary(name: str, category: str | None, summary: str, output_dir: str = OUTPUT_DIR) -> str:
+    """Write one skill's summary to ``<output_dir>/<Name>_<category>.txt``. Returns the path."""
+    os.makedirs(output_dir, exist_ok=True)
+    # Use category instead of mode
+    category = category if category else "general"
+
+    filename = f"{name}_{category}.txt".replace(" ", "_")
+    filepath = os.path.join(output_dir, filename)
+
+    with open(filepath, "w", encoding="utf-8") as f:
+        f.write(summary)
+    return filepath
+
+
+def export_summaries():
     db: Session = SessionLocal()
 
     try:
         skills = db.query(Skill).all()
         for skill in skills:
-            # Use category instead of mode
             category = skill.category if skill.category else "general"
 
             if not skill.summary:
                 print(f"⚠️ Skipping {skill.name} ({category}) - no summary yet")
                 continue
 
-            filename = f"{skill.name}_{category}.txt".replace(" ", "_")
-            filepath = os.path.join(OUTPUT_DIR, filename)
-
-            with open(filepath, "w", encoding="utf-8") as f:
-                f.write(skill.summary)
-
+            filepath = export_summary(skill.name, skill.category, skill.summary)
             print(f"✅ Saved summary for {skill.name} ({category}) → {filepath}")
 
     finally:
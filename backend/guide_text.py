@@ -0,0 +1,251 @@
+import re
+import time
+from dataclasses import dataclass
+from typing import NamedTuple
+
+import lxml.html
+
+from metrics import histogram
+
+HEADING_TAGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+TEXT_BLOCK_TAGS = {"p", "li", "dt", "dd", "caption", "pre", "blockquote"}
+SKIPPED_TAGS = {"script", "style"}
+
+# Wiki chrome that carries no training information: edit links, navigation boxes,
+# footnotes and the table of contents (which otherwise shows up twice in the text).
+STRIP_CLASSES = (
+    "mw-editsection", "navbox", "reference", "references", "reflist",
+    "mw-references-wrap", "toc", "noprint", "mw-empty-elt",
+)
+STRIP_IDS = ("toc",)
+
+
+def _has_class(name: str) -> str:
+    return f".//*[contains(concat(' ', normalize-space(@class), ' '), ' {name} ')]"
+
+
+STRIP_XPATH = " | ".join(
+    [_has_class(name) for name in STRIP_CLASSES]
+    + [f".//*[@id='{name}']" for name in STRIP_IDS]
+    + [f".//{tag}" for tag in sorted(SKIPPED_TAGS)]
+)
+REDIRECT_XPATH = _has_class("redirectMsg") + "//a"
+
+# "Levels 20–47: Brimhaven Agility Arena", "Level 1–10", "Levels 1/10–15", "Levels 30 to 50+",
+# "Levels 1–32/36" (alternative levels after a slash are not part of the range)
+LEVEL_RANGE = re.compile(r"\bLevels?\s+(\d+)(?:/\d+)?\s*(?:[–—-]|to)\s*(\d+)(?:/\d+)*\+?", re.IGNORECASE)
+
+# Leftover "[edit|edit source]" links in pre-scraped text, and **bold** spans in summaries
+EDIT_LINK = re.compile(r"\[edit[^\]]*\]")
+BOLD = re.compile(r"\*\*(.+?)\*\*")
+
+# Target size of one summarization request; sections are packed up to this size.
+CHUNK_CHARS = 12000
+
+PARSE_SECONDS = histogram("osrs_page_parse_seconds", "Time to parse and clean one wiki page")
+
+
+def _squash(text: str) -> str:
+    return " ".join(text.split())
+
+
+class CleanPage(NamedTuple):
+    html: str             # Wiki HTML without edit links, navboxes, references or TOC
+    text: str             # Compact Markdown-ish text of the same content
+    redirect: str | None  # Target title if the page is only a redirect notice
+
+
+def _parse(html: str):
+    return lxml.html.fragment_fromstring(html, create_parent="div")
+
+
+def clean_page(html: str) -> CleanPage:
+    """Parse wiki HTML once and derive everything later stages need from that one tree."""
+    started = time.perf_counter()
+    try:
+        return _clean_page(html)
+    finally:
+        PARSE_SECONDS.observe(time.perf_counter() - started)
+
+
+def _clean_page(html: str) -> CleanPage:
+    if not html or not html.strip():
+        return CleanPage("", "", None)
+    root = _parse(html)
+
+    redirect = root.xpath(REDIRECT_XPATH)
+    if redirect:
+        return CleanPage(html, "", _squash(redirect[0].text_content()))
+
+    for el in root.xpath(STRIP_XPATH):
+        el.drop_tree()
+
+    cleaned = (root.text or "") + "".join(
+        lxml.html.tostring(child, encoding="unicode") for child in root
+    )
+    return CleanPage(cleaned, _tree_to_text(root), None)
+
+
+def html_to_text(html: str) -> str:
+    """Reduce wiki HTML to compact Markdown-ish text: headings, paragraphs, list items and table rows."""
+    return clean_page(html).text
+
+
+def _tree_to_text(root) -> str:
+    lines = []
+
+    def walk(el):
+        if not isinstance(el.tag, str) or el.tag in SKIPPED_TAGS:
+            return
+        if el.tag in HEADING_TAGS:
+            text = _squash(el.text_content())
+            if text:
+                lines.append(f"{'#' * HEADING_TAGS[el.tag]} {text}")
+            return
+        if el.tag == "tr":
+            cells = [_squash(cell.text_content()) for cell in el if cell.tag in ("td", "th")]
+            if any(cells):
+                lines.append(" | ".join(cells))
+            return
+        if el.tag in TEXT_BLOCK_TAGS:
+            text = _squash(el.text_content())
+            if text:
+                lines.append(f"- {text}" if el.tag == "li" else text)
+            return
+
+        if el.text and el.text.strip():
+            lines.append(_squash(el.text))
+        for child in el:
+            walk(child)
+            if child.tail and child.tail.strip():
+                lines.append(_squash(child.tail))
+
+    walk(root)
+    return "\n".join(lines)
+
+
+def level_range(heading: str):
+    """(min_level, max_level) named in a heading, or None."""
+    match = LEVEL_RANGE.search(heading)
+    if not match:
+        return None
+    low, high = int(match.group(1)), int(match.group(2))
+    return (low, high) if low <= high else (high, low)
+
+
+def level_method(heading: str, text: str = "") -> str | None:
+    """
+    The training method a "Levels X–Y" section is about: the heading without its range
+    ("Levels 20–47: Brimhaven Agility Arena" -> "Brimhaven Agility Arena"), or else the
+    first **bold** phrase of the section text, as summaries name methods that way.
+    """
+    heading = EDIT_LINK.sub("", heading)
+    match = LEVEL_RANGE.search(heading)
+    if match:
+        heading = heading[:match.start()] + heading[match.end():]
+    # Numbered wiki headings keep their outline number ("1.2 Levels ...")
+    method = re.sub(r"^\d+(\.\d+)*\s+", "", _squash(heading)).strip(" :–—-()")
+    if method:
+        return method
+    bold = BOLD.search(text)
+    return _squash(bold.group(1)) if bold else None
+
+
+@dataclass
+class Section:
+    heading: str
+    text: str
+    levels: tuple | None  # (min_level, max_level) for "Levels X–Y" sections
+
+    @property
+    def scope(self) -> str:
+        """Short description of what the section covers, for prompts."""
+        if self.levels:
+            return f"levels {self.levels[0]}–{self.levels[1]}"
+        return self.heading
+
+
+def split_sections(text: str) -> list[Section]:
+    """
+    Split compact guide text at "Levels X–Y" headings. Other top-level (##) headings
+    also start a section so unrelated material is not glued onto the previous range.
+    """
+    sections = [Section("Introduction", "", None)]
+    body = []
+
+    def close():
+        sections[-1].text = "\n".join(body).strip()
+        body.clear()
+
+    for line in text.splitlines():
+        if line.startswith("#"):
+            heading = line.lstrip("#").strip()
+            levels = level_range(heading)
+            if levels is not None or line.startswith("## "):
+                close()
+                sections.append(Section(heading, "", levels))
+        body.append(line)
+    close()
+    return [section for section in sections if section.text]
+
+
+def chunk_guide(text: str, max_chars: int = CHUNK_CHARS) -> list[Section]:
+    """
+    Order sections by level (general material first) and pack neighbours into chunks
+    of at most ``max_chars``; a single oversized section is split at line boundaries.
+    """
+    sections = split_sections(text)
+    ordered = sorted(
+        enumerate(sections),
+        key=lambda item: (item[1].levels is not None, item[1].levels or (0, 0), item[0]),
+    )
+
+    chunks = []
+    for _, section in ordered:
+        for piece in _split_long(section.text, max_chars):
+            last = chunks[-1] if chunks else None
+            if last is not None and len(last.text) + len(piece) + 2 <= max_chars:
+                last.text += "\n\n" + piece
+                if section.levels:
+                    low, high = last.levels or section.levels
+                    last.levels = (min(low, section.levels[0]), max(high, section.levels[1]))
+            else:
+                chunks.append(Section(section.heading, piece, section.levels))
+    return chunks
+
+
+def _split_line(line: str, max_chars: int) -> list[str]:
+    """Cut one over-long line into pieces of at most ``max_chars``, at whitespace where possible."""
+    pieces = []
+    while len(line) > max_chars:
+        cut = line.rfind(" ", 0, max_chars + 1)
+        if cut <= 0:
+            cut = max_chars
+        pieces.append(line[:cut].rstrip())
+        line = line[cut:].lstrip()
+    if line:
+        pieces.append(line)
+    return pieces
+
+
+def _split_long(text: str, max_chars: int) -> list[str]:
+    if len(text) <= max_chars:
+        return [text]
+    pieces, current = [], []
+    size = 0
+    for line in text.splitlines():
+        if len(line) > max_chars:
+            # A long table row or paragraph: each cut of it is a chunk of its own
+            if current:
+                pieces.append("\n".join(current))
+                current, size = [], 0
+            pieces.extend(_split_line(line, max_chars))
+            continue
+        if current and size + len(line) + 1 > max_chars:
+            pieces.append("\n".join(current))
+            current, size = [], 0
+        current.append(line)
+        size += len(line) + 1
+    if current:
+        pieces.append("\n".join(current))
+    return pieces
@@ -0,0 +1,67 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+
+from database import async_engine
+
+# Seconds between background database probes behind /ping.
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "15"))
+HEALTH_CHECK_TIMEOUT = float(os.getenv("HEALTH_CHECK_TIMEOUT", "5"))
+
+
+class HealthMonitor:
+    """Probes the database in the background so /ping never opens a connection itself."""
+
+    def __init__(self, engine=async_engine, interval: float = HEALTH_CHECK_INTERVAL, timeout: float = HEALTH_CHECK_TIMEOUT):
+        self.engine = engine
+        self.interval = interval
+        self.timeout = timeout
+        self.result = None  # {"ok", "error", "latency_ms", "checked_at"}
+        self._task = None
+
+    async def _probe(self):
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def check(self) -> dict:
+        """Run one SELECT 1 and store the outcome."""
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._probe(), self.timeout)
+            ok, error = True, None
+        except Exception as e:
+            ok, error = False, str(e) or type(e).__name__
+        self.result = {
+            "ok": ok,
+            "error": error,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "checked_at": datetime.now(timezone.utc).isoformat(),
+        }
+        return self.result
+
+    async def current(self) -> dict:
+        """Last probe result; probes once if none has run yet."""
+        return self.result or await self.check()
+
+    def start(self):
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.interval)
+
+
+health = HealthMonitor()
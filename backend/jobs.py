@@ -0,0 +1,128 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+
+class JobSkipped(Exception):
+    """Raised by a job that decided not to run, e.g. because another replica holds the lock."""
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class Job:
+    """One background run and its per-item progress."""
+
+    def __init__(self, kind: str, options: dict = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.options = dict(options or {})
+        self.status = "queued"  # queued, running, succeeded, failed, skipped
+        self.created_at = _now()
+        self.started_at = None
+        self.finished_at = None
+        self.duration_seconds = None
+        self.error = None
+        self.progress = {}  # {item: {stage: {"status", "seconds", "error"}}}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    @property
+    def active(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def covers(self, kind: str, options: dict) -> bool:
+        """True if this job does everything a ``kind`` job with ``options`` would, e.g. force."""
+        return self.kind == kind and all(self.options.get(name) == value for name, value in options.items() if value)
+
+    def record(self, stage: str, item: str, status: str, seconds: float = None, error: str = None):
+        """Progress callback handed to the pipeline; safe to call from any thread."""
+        with self._lock:
+            self.progress.setdefault(item, {})[stage] = {"status": status, "seconds": seconds, "error": error}
+
+    def wait(self, timeout: float = None) -> bool:
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            progress = {item: dict(stages) for item, stages in self.progress.items()}
+        failed = sorted(
+            item for item, stages in progress.items()
+            if any(stage["status"] == "failed" for stage in stages.values())
+        )
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "options": self.options,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "duration_seconds": self.duration_seconds,
+            "error": self.error,
+            "failed_items": failed,
+            "progress": progress,
+        }
+
+
+class JobQueue:
+    """
+    Runs jobs on a small thread pool inside the API process. A submission while a job
+    of the same kind is queued or running returns that job instead of starting another,
+    unless it asks for an option (e.g. force) that the active job was not given.
+    """
+
+    def __init__(self, max_workers: int = 1, history: int = 50):
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, run, options: dict = None) -> tuple[Job, bool]:
+        """Queue ``run(record)``. Returns (job, created); created is False when coalesced."""
+        options = options or {}
+        with self._lock:
+            for job in self._jobs.values():
+                if job.active and job.covers(kind, options):
+                    return job, False
+            job = Job(kind, options)
+            self._jobs[job.id] = job
+            # Keep the most recent finished jobs around for /jobs/{id}
+            while len(self._jobs) > self.history:
+                oldest = next((j for j in self._jobs.values() if not j.active), None)
+                if oldest is None:
+                    break
+                del self._jobs[oldest.id]
+        self._executor.submit(self._run, job, run)
+        return job, True
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, run):
+        started = time.perf_counter()
+        job.status, job.started_at = "running", _now()
+        try:
+            run(job.record)
+            job.status = "succeeded"
+        except JobSkipped as e:
+            job.status, job.error = "skipped", str(e)
+            print(f"⏭️ {job.kind} job {job.id} skipped: {e}")
+        except Exception as e:
+            job.status, job.error = "failed", str(e)
+            print(f"❌ {job.kind} job {job.id} failed: {e}")
+        finally:
+            job.finished_at = _now()
+            job.duration_seconds = round(time.perf_counter() - started, 3)
+            job._done.set()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+job_queue = JobQueue()
@@ -0,0 +1,138 @@
+import argparse
+
+from sqlalchemy import and_, case, or_, select
+from sqlalchemy.orm import Session
+
+from database import get_db
+from guide_text import level_method, split_sections
+from models import LevelRange, Skill, WikiPage
+
+MIN_LEVEL = 1
+MAX_LEVEL = 99
+
+
+def level_sections(document: str | None) -> list[dict]:
+    """(min_level, max_level, method, text) of every "Levels X–Y" section of a guide or summary."""
+    return [
+        {
+            "min_level": section.levels[0],
+            "max_level": section.levels[1],
+            "method": level_method(section.heading, section.text),
+            "text": section.text,
+        }
+        for section in split_sections(document or "")
+        if section.levels is not None
+    ]
+
+
+def extract_pages(db: Session, page_ids) -> int:
+    """Replace the level ranges parsed from the given pages; the caller commits."""
+    page_ids = list(page_ids)
+    if not page_ids:
+        return 0
+    db.execute(LevelRange.__table__.delete().where(LevelRange.page_id.in_(page_ids)))
+    rows = [
+        {"kind": "guide", "page_id": page_id, **section}
+        for page_id, page_text in db.execute(select(WikiPage.id, WikiPage.text).where(WikiPage.id.in_(page_ids)))
+        for section in level_sections(page_text)
+    ]
+    if rows:
+        db.execute(LevelRange.__table__.insert(), rows)
+    return len(rows)
+
+
+def extract_summaries(db: Session, skills) -> int:
+    """Replace the level ranges parsed from the given rows' summaries; the caller commits."""
+    skills = list(skills)
+    if not skills:
+        return 0
+    db.execute(LevelRange.__table__.delete().where(LevelRange.skill_id.in_([skill.id for skill in skills])))
+    rows = [
+        {"kind": "summary", "skill_id": skill.id, **section}
+        for skill in skills
+        for section in level_sections(skill.summary)
+    ]
+    if rows:
+        db.execute(LevelRange.__table__.insert(), rows)
+    return len(rows)
+
+
+def rebuild_level_ranges(db: Session) -> int:
+    """Parse every page and summary from scratch (after a migration or restore)."""
+    db.execute(LevelRange.__table__.delete())
+    count = extract_pages(db, db.scalars(select(WikiPage.id)).all())
+    count += extract_summaries(db, db.query(Skill).filter(Skill.summary.is_not(None)).all())
+    db.commit()
+    return count
+
+
+def recommend(db: Session, name: str, level: int, category: str | None = None) -> list[dict] | None:
+    """
+    Sections covering ``level`` for one skill, summaries first and narrowest ranges first.
+    Returns None when the skill (or skill and category) does not exist.
+    """
+    return skill_ranges(db, name, category, level)
+
+
+def ranges_covering(ranges: list[dict], level: int, category: str | None = None) -> list[dict]:
+    """The entries of ``skill_ranges(db, name)`` that ``recommend`` returns for one level."""
+    return [
+        entry for entry in ranges
+        if entry["min_level"] <= level <= entry["max_level"] and category in (None, entry["category"])
+    ]
+
+
+def skill_ranges(db: Session, name: str, category: str | None = None, level: int | None = None) -> list[dict] | None:
+    """Level ranges of one skill in recommend order, all of them unless ``level`` is given."""
+    query = select(Skill.id, Skill.category, Skill.page_id).where(Skill.name == name)
+    if category is not None:
+        query = query.where(Skill.category == category)
+    skills = db.execute(query).all()
+    if not skills:
+        return None
+
+    owners = []
+    for skill in skills:
+        owners.append(and_(LevelRange.kind == "summary", LevelRange.skill_id == skill.id))
+        if skill.page_id is not None:
+            owners.append(and_(LevelRange.kind == "guide", LevelRange.page_id == skill.page_id))
+    categories_by_page = {}
+    for skill in skills:
+        categories_by_page.setdefault(skill.page_id, []).append(skill.category)
+    category_by_skill = {skill.id: skill.category for skill in skills}
+
+    query = select(LevelRange).where(or_(*owners))
+    if level is not None:
+        query = query.where(LevelRange.min_level <= level, LevelRange.max_level >= level)
+    rows = db.execute(query.order_by(
+        case((LevelRange.kind == "summary", 0), else_=1),
+        LevelRange.max_level - LevelRange.min_level,
+        LevelRange.min_level,
+        LevelRange.id,
+    )).scalars()
+
+    results = []
+    for row in rows:
+        if row.kind == "summary":
+            categories = [category_by_skill[row.skill_id]]
+        else:
+            categories = categories_by_page[row.page_id]
+        for row_category in categories:
+            results.append({
+                "category": row_category,
+                "source": row.kind,
+                "min_level": row.min_level,
+                "max_level": row.max_level,
+                "method": row.method,
+                "text": row.text,
+            })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the level range table.")
+    parser.add_argument("--rebuild", action="store_true", help="Re-parse every page and summary")
+    args = parser.parse_args()
+    if args.rebuild:
+        db: Session = next(get_db())
+        print(f"📈 Extracted {rebuild_level_ranges(db)} level ranges.")
@@ -0,0 +1,147 @@
+import html
+import re
+
+# Renders the Markdown the summary prompt asks for (headings, lists, tables, emphasis,
+# code, links) to HTML. Every piece of source text is escaped before tags are added,
+# so raw HTML in a summary comes out as text, as it does in react-markdown.
+
+FENCE = re.compile(r"^\s*(```|~~~)")
+HEADING = re.compile(r"^\s{0,3}(#{1,6})\s+(.*?)\s*#*\s*$")
+RULE = re.compile(r"^\s{0,3}([-*_])(\s*\1){2,}\s*$")
+LIST_ITEM = re.compile(r"^(\s*)([-*+]|\d+[.)])\s+(.*)$")
+QUOTE = re.compile(r"^\s{0,3}>\s?(.*)$")
+TABLE_RULE = re.compile(r"^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)*\|?\s*$")
+
+CODE_SPAN = re.compile(r"`([^`]+)`")
+LINK = re.compile(r"\[([^\]]+)\]\(([^)\s]+)\)")
+STRONG = re.compile(r"\*\*(.+?)\*\*|__(.+?)__")
+EMPHASIS = re.compile(r"\*(?!\s)(.+?)(?<!\s)\*|\b_(?!\s)(.+?)(?<!\s)_\b")
+SAFE_URL = re.compile(r"^(https?://|/|#)", re.IGNORECASE)
+
+
+def render_inline(text: str) -> str:
+    """Escape one line of text, then add code, link and emphasis tags."""
+    codes = []
+
+    def keep_code(match):
+        codes.append(f"<code>{html.escape(match.group(1))}</code>")
+        return f"\x00{len(codes) - 1}\x00"
+
+    text = html.escape(CODE_SPAN.sub(keep_code, text))
+
+    def link(match):
+        label, url = match.group(1), html.unescape(match.group(2))
+        if not SAFE_URL.match(url):
+            return label
+        return f'<a href="{html.escape(url)}" rel="noopener noreferrer">{label}</a>'
+
+    text = LINK.sub(link, text)
+    text = STRONG.sub(lambda m: f"<strong>{m.group(1) or m.group(2)}</strong>", text)
+    text = EMPHASIS.sub(lambda m: f"<em>{m.group(1) or m.group(2)}</em>", text)
+    return re.sub(r"\x00(\d+)\x00", lambda m: codes[int(m.group(1))], text)
+
+
+def _table_cells(line: str) -> list[str]:
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+
+def _render_table(lines: list[str]) -> str:
+    header, rows = _table_cells(lines[0]), [_table_cells(line) for line in lines[2:]]
+    head = "".join(f"<th>{render_inline(cell)}</th>" for cell in header)
+    body = "".join(
+        "<tr>" + "".join(f"<td>{render_inline(cell)}</td>" for cell in row) + "</tr>"
+        for row in rows
+    )
+    return f"<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>"
+
+
+def _render_list(items: list[tuple[int, bool, str]]) -> str:
+    """Nested <ul>/<ol> from (indent, ordered, text) items."""
+    out, stack = [], []   # stack of (indent, tag)
+    for indent, ordered, text in items:
+        tag = "ol" if ordered else "ul"
+        while stack and indent < stack[-1][0]:
+            out.append(f"</li></{stack.pop()[1]}>")
+        if stack and indent == stack[-1][0]:
+            out.append("</li>")
+            if tag != stack[-1][1]:
+                out.append(f"</{stack.pop()[1]}><{tag}>")
+                stack.append((indent, tag))
+        else:
+            out.append(f"<{tag}>")
+            stack.append((indent, tag))
+        out.append(f"<li>{render_inline(text)}")
+    while stack:
+        out.append(f"</li></{stack.pop()[1]}>")
+    return "".join(out)
+
+
+def render_markdown(text: str | None) -> str | None:
+    """Sanitized HTML for a Markdown summary, or None for no summary."""
+    if text is None:
+        return None
+    lines = text.replace("\r\n", "\n").split("\n")
+    blocks, paragraph, i = [], [], 0
+
+    def flush():
+        if paragraph:
+            blocks.append(f"<p>{render_inline(' '.join(line.strip() for line in paragraph))}</p>")
+            paragraph.clear()
+
+    while i < len(lines):
+        line = lines[i]
+        if not line.strip():
+            flush()
+            i += 1
+        elif FENCE.match(line):
+            flush()
+            fence, code = FENCE.match(line).group(1), []
+            i += 1
+            while i < len(lines) and not lines[i].strip().startswith(fence):
+                code.append(lines[i])
+                i += 1
+            blocks.append(f"<pre><code>{html.escape(chr(10).join(code))}</code></pre>")
+            i += 1
+        elif HEADING.match(line):
+            flush()
+            marks, title = HEADING.match(line).groups()
+            blocks.append(f"<h{len(marks)}>{render_inline(title)}</h{len(marks)}>")
+            i += 1
+        elif RULE.match(line):
+            flush()
+            blocks.append("<hr>")
+            i += 1
+        elif "|" in line and i + 1 < len(lines) and TABLE_RULE.match(lines[i + 1]):
+            flush()
+            table = [line, lines[i + 1]]
+            i += 2
+            while i < len(lines) and "|" in lines[i] and lines[i].strip():
+                table.append(lines[i])
+                i += 1
+            blocks.append(_render_table(table))
+        elif LIST_ITEM.match(line):
+            flush()
+            items = []
+            while i < len(lines) and (LIST_ITEM.match(lines[i]) or (items and lines[i].startswith("  ") and lines[i].strip())):
+                match = LIST_ITEM.match(lines[i])
+                if match:
+                    indent, marker, item = match.groups()
+                    items.append((len(indent.expandtabs(4)), marker[0].isdigit(), item))
+                else:
+                    # Continuation line of the previous item
+                    indent, ordered, item = items[-1]
+                    items[-1] = (indent, ordered, f"{item} {lines[i].strip()}")
+                i += 1
+            blocks.append(_render_list(items))
+        elif QUOTE.match(line):
+            flush()
+            quoted = []
+            while i < len(lines) and QUOTE.match(lines[i]):
+                quoted.append(QUOTE.match(lines[i]).group(1))
+                i += 1
+            blocks.append(f"<blockquote>{render_markdown(chr(10).join(quoted))}</blockquote>")
+        else:
+            paragraph.append(line)
+            i += 1
+    flush()
+    return "".join(blocks)
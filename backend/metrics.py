@@ -0,0 +1,319 @@
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from sqlalchemy import event
+
+# Latency buckets in seconds, shared by the HTTP, DB, wiki and LLM histograms
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Requests slower than this are kept for /metrics/slow (0 disables it)
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "500"))
+# Run requests under cProfile and keep the profile of slow ones
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "false").lower() == "true"
+SLOW_REQUEST_HISTORY = 20
+PROFILE_LINES = 25
+
+
+#-------------------- METRIC TYPES --------------------#
+
+def _escape(value) -> str:
+    return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _labels(names, values, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """One named metric family with fixed label names; safe to update from any thread.
+
+    Values are either recorded as they happen or, with ``collect``, read at scrape time
+    from a callable returning {label values: value}.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels=(), collect=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self.collect = collect
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def samples(self):
+        """(suffix, label values, extra label, value) for every series."""
+        if self.collect is not None:
+            return [("", key, "", value) for key, value in self.collect().items()]
+        with self._lock:
+            return [("", key, "", value) for key, value in self._values.items()]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, key, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_labels(self.labelnames, key, extra)} {_number(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels), ([0] * len(self.buckets), 0.0))
+            return counts[-1]
+
+    def samples(self):
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        samples = []
+        for key, counts, total in series:
+            for bound, count in zip(self.buckets, counts):
+                samples.append(("_bucket", key, f'le="{_number(bound)}"', count))
+            samples.append(("_sum", key, "", total))
+            samples.append(("_count", key, "", counts[-1]))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            # Re-imports (e.g. under test runners) get the existing family back
+            return self._metrics.setdefault(metric.name, metric)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+registry = Registry()
+
+
+def counter(name: str, help: str, labels=(), collect=None) -> Counter:
+    return registry.register(Counter(name, help, labels, collect))
+
+
+def gauge(name: str, help: str, labels=(), collect=None) -> Gauge:
+    return registry.register(Gauge(name, help, labels, collect))
+
+
+def histogram(name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+    return registry.register(Histogram(name, help, labels, buckets))
+
+
+#-------------------- REQUESTS AND QUERIES --------------------#
+
+HTTP_REQUEST_SECONDS = histogram("osrs_http_request_seconds", "API request latency", ("method", "route", "status"))
+HTTP_REQUEST_DB_QUERIES = histogram(
+    "osrs_http_request_db_queries", "DB queries per API request", ("route",),
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+HTTP_REQUEST_DB_SECONDS = histogram("osrs_http_request_db_seconds", "DB time per API request", ("route",))
+DB_QUERY_SECONDS = histogram("osrs_db_query_seconds", "Time per DB query", ("engine",))
+
+
+@dataclass
+class RequestStats:
+    """DB work done while serving one request."""
+    queries: int = 0
+    db_seconds: float = 0.0
+
+
+# Set by the timing middleware; query listeners add to it (it follows run_sync greenlets)
+current_request: contextvars.ContextVar = contextvars.ContextVar("current_request", default=None)
+
+
+def instrument_engine(engine, name: str):
+    """Time every query on ``engine`` (a sync Engine, or an AsyncEngine's sync_engine)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        DB_QUERY_SECONDS.observe(elapsed, engine=name)
+        stats = current_request.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+
+    def pool_status():
+        pool = engine.pool
+        if not hasattr(pool, "checkedout"):
+            return {}  # SQLite's static/singleton pools have no size to report
+        return {
+            (name, "checked_out"): pool.checkedout(),
+            (name, "checked_in"): pool.checkedin(),
+            (name, "overflow"): pool.overflow(),
+            (name, "size"): pool.size(),
+        }
+
+    POOL_COLLECTORS.append(pool_status)
+
+
+POOL_COLLECTORS = []
+gauge(
+    "osrs_db_pool_connections", "Connections in each engine's pool by state", ("engine", "state"),
+    collect=lambda: {key: value for collect in POOL_COLLECTORS for key, value in collect().items()},
+)
+
+
+#-------------------- SLOW REQUESTS --------------------#
+
+slow_requests = deque(maxlen=SLOW_REQUEST_HISTORY)
+_profile_lock = threading.Lock()
+
+
+class RequestProfiler:
+    """cProfile over one request when PROFILE_REQUESTS is on; only one request is profiled at a time.
+
+    The profile only runs while the request's own task is stepping (see ``ProfiledApp``), so
+    other requests interleaved on the event loop are not counted. Work the request hands to
+    worker threads is not seen.
+    """
+
+    def __init__(self, enabled: bool = PROFILE_REQUESTS):
+        self.profile = None
+        if enabled and _profile_lock.acquire(blocking=False):
+            self.profile = cProfile.Profile()
+
+    def run(self, coro):
+        """Await ``coro`` with the profile enabled only while one of its steps runs."""
+        return _Steps(self, coro)
+
+    def finish(self) -> str | None:
+        """Stop profiling; the top functions by cumulative time, or None if nothing was profiled."""
+        profile, self.profile = self.profile, None
+        if profile is None:
+            return None
+        _profile_lock.release()
+        profile.create_stats()
+        if not profile.stats:
+            return None  # the request never got as far as ProfiledApp
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+        return out.getvalue()
+
+
+# Set by the timing middleware to the request's profiler, if it is being profiled
+current_profiler: contextvars.ContextVar = contextvars.ContextVar("current_profiler", default=None)
+
+
+class _Steps:
+    def __init__(self, profiler: RequestProfiler, coro):
+        self.profiler, self.coro = profiler, coro
+
+    def __await__(self):
+        coro = self.coro
+        value, error = None, None
+        while True:
+            profile = self.profiler.profile
+            if profile is not None:
+                profile.enable()
+            try:
+                yielded = coro.throw(error) if error is not None else coro.send(value)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                if profile is not None:
+                    profile.disable()
+            try:
+                value, error = (yield yielded), None
+            except GeneratorExit:
+                coro.close()
+                raise
+            except BaseException as exc:
+                value, error = None, exc
+
+
+class ProfiledApp:
+    """ASGI middleware running the app in steps under ``current_profiler``.
+
+    Add it inside the timing middleware: an ``@app.middleware`` function calls the rest
+    of the app in a task of its own, and this is where that task's steps can be seen.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        profiler = current_profiler.get()
+        if profiler is None or profiler.profile is None:
+            return await self.app(scope, receive, send)
+        return await profiler.run(self.app(scope, receive, send))
+
+
+def record_slow_request(method: str, path: str, status: int, seconds: float, stats: RequestStats, profile: str | None):
+    if not SLOW_REQUEST_MS or seconds * 1000 < SLOW_REQUEST_MS:
+        return
+    print(f"🐢 Slow request {method} {path}: {seconds * 1000:.0f} ms, {stats.queries} queries")
+    slow_requests.append({
+        "method": method,
+        "path": path,
+        "status": status,
+        "duration_ms": round(seconds * 1000, 1),
+        "db_queries": stats.queries,
+        "db_ms": round(stats.db_seconds * 1000, 1),
+        "at": time.time(),
+        "profile": profile,
+    })
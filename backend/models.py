@@ -1,12 +1,248 @@
-from sqlalchemy import Column, Integer, String, Text
-from database import Base
+import json
+
+from sqlalchemy import DDL, Column, DateTime, ForeignKey, Index, Integer, LargeBinary, String, Text, UniqueConstraint, event, inspect, select
+from sqlalchemy.orm import Session, deferred, relationship
+from sqlalchemy.orm.attributes import set_committed_value
+from database import Base, upsert_statement
+from blobs import compress, content_hash, decompress
+from markdown_html import render_markdown
+
+
+class PageBlob(Base):
+    __tablename__ = "page_blobs"
+
+    hash = Column(String, primary_key=True)           # SHA256 of the uncompressed body
+    encoding = Column(String, nullable=False)         # zstd or zlib
+    size = Column(Integer, nullable=False)            # Uncompressed size in bytes
+    data = deferred(Column(LargeBinary, nullable=False))
+
+    @staticmethod
+    def row(text: str) -> dict:
+        encoding, data = compress(text)
+        return {"hash": content_hash(text), "encoding": encoding, "size": len(text.encode("utf-8")), "data": data}
+
+    @classmethod
+    def from_text(cls, text: str) -> "PageBlob":
+        return cls(**cls.row(text))
+
+    def read(self) -> str:
+        return decompress(self.encoding, self.data)
+
+
+class WikiPage(Base):
+    __tablename__ = "wiki_pages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    title = Column(String, nullable=False, unique=True)  # Requested wiki title (shared pages appear once)
+    text = Column(Text, nullable=True)                    # Compact text of content, made at fetch time
+    hash = Column(String, ForeignKey("page_blobs.hash"), nullable=False)  # Cleaned wiki HTML, by SHA256
+    source_title = Column(String, nullable=True)          # Title actually fetched (after fallback)
+    revision_id = Column(Integer, nullable=True)          # Wiki revision the content came from
+
+    skills = relationship("Skill", back_populates="page")
+    blob = relationship("PageBlob")
+
+    @property
+    def content(self):
+        """Cleaned wiki HTML, decompressed from the blob store on access."""
+        return self.blob.read() if self.blob is not None else None
+
 
 class Skill(Base):
     __tablename__ = "skills"
+    __table_args__ = (
+        # One row per (skill, category); also the conflict target for bulk upserts
+        UniqueConstraint("name", "category", name="uq_skills_name_category"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)      # Skill name (e.g., Attack, Mining)
     category = Column(String, nullable=True)   # f2p or p2p
-    content = Column(Text, nullable=False)     # Full wiki text content
-    hash = Column(String, nullable=False)      # SHA256 hash for deduplication
+    page_id = Column(Integer, ForeignKey("wiki_pages.id"), nullable=True)
+    hash = Column(String, nullable=False)      # SHA256 hash of the page content (a page_blobs key)
     summary = Column(Text, nullable=True)
+    summary_hash = Column(String, nullable=True)    # Content hash the summary was made from
+    summary_prompt = Column(String, nullable=True)  # Prompt version used for the summary
+    summary_model = Column(String, nullable=True)   # Model used for the summary
+    summary_html = Column(Text, nullable=True)      # Summary rendered to sanitized HTML
+    payload = Column(Text, nullable=True)      # Pre-serialized /skills JSON object
+
+    page = relationship("WikiPage", back_populates="skills")
+    # Rows from before wiki_pages existed have no page, only the hash of their content
+    blob = relationship("PageBlob", primaryjoin="foreign(Skill.hash) == PageBlob.hash", viewonly=True)
+
+    @property
+    def page_content(self):
+        """Wiki HTML for this row, wherever it is stored."""
+        if self.page is not None:
+            return self.page.content
+        return self.blob.read() if self.blob is not None else None
+
+    @property
+    def page_text(self):
+        """Compact text made when the page was fetched, or None for legacy rows."""
+        return self.page.text if self.page is not None else None
+
+
+class DatasetVersion(Base):
+    __tablename__ = "dataset_version"
+
+    id = Column(Integer, primary_key=True)         # Single row, always 1
+    version = Column(String, nullable=False)       # Digest of every skill hash + payload
+    updated_at = Column(DateTime, nullable=False)
+
+
+class ResponseArtifact(Base):
+    __tablename__ = "response_artifacts"
+
+    key = Column(String, primary_key=True)        # Response cache key, e.g. skills or skills/Attack/f2p
+    encoding = Column(String, primary_key=True)   # identity, gzip or br
+    version = Column(String, nullable=False)      # Dataset version the body was built from
+    data = Column(LargeBinary, nullable=False)
+
+
+class SearchSection(Base):
+    __tablename__ = "search_sections"
+    __table_args__ = (
+        Index("ix_search_sections_page_id", "page_id"),
+        Index("ix_search_sections_skill_id", "skill_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)      # guide (wiki page text) or summary
+    page_id = Column(Integer, ForeignKey("wiki_pages.id", ondelete="CASCADE"), nullable=True)   # guide sections
+    skill_id = Column(Integer, ForeignKey("skills.id", ondelete="CASCADE"), nullable=True)      # summary sections
+    position = Column(Integer, nullable=False)  # Order within the document
+    heading = Column(String, nullable=False)
+    body = Column(Text, nullable=False)
+
+
+# PostgreSQL keeps a weighted tsvector of every section behind a GIN index; other
+# databases search through the in-process index in search.py instead.
+SEARCH_VECTOR_DDL = (
+    "ALTER TABLE search_sections ADD COLUMN search_vector tsvector GENERATED ALWAYS AS "
+    "(setweight(to_tsvector('english', heading), 'A') || setweight(to_tsvector('english', body), 'B')) STORED",
+    "CREATE INDEX ix_search_sections_search_vector ON search_sections USING GIN (search_vector)",
+)
+for statement in SEARCH_VECTOR_DDL:
+    event.listen(SearchSection.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+
+
+class LevelRange(Base):
+    __tablename__ = "level_ranges"
+    __table_args__ = (
+        # Interval lookups: rows of one page or skill whose [min_level, max_level] holds N
+        Index("ix_level_ranges_page_levels", "page_id", "min_level", "max_level"),
+        Index("ix_level_ranges_skill_levels", "skill_id", "min_level", "max_level"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)      # guide (wiki page text) or summary
+    page_id = Column(Integer, ForeignKey("wiki_pages.id", ondelete="CASCADE"), nullable=True)   # guide ranges
+    skill_id = Column(Integer, ForeignKey("skills.id", ondelete="CASCADE"), nullable=True)      # summary ranges
+    min_level = Column(Integer, nullable=False)
+    max_level = Column(Integer, nullable=False)
+    method = Column(String, nullable=True)     # e.g. "Brimhaven Agility Arena"
+    text = Column(Text, nullable=False)        # The section itself
+
+
+class Entity(Base):
+    __tablename__ = "entities"
+    __table_args__ = (
+        Index("ix_entities_name", "name"),
+        Index("ix_entities_skill_id", "skill_id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, nullable=False)      # Normalized lookup key, e.g. "sand crab"
+    label = Column(String, nullable=False)     # As bolded in the summary, e.g. "Sand Crabs"
+    skill_id = Column(Integer, ForeignKey("skills.id", ondelete="CASCADE"), nullable=False)
+    min_level = Column(Integer, nullable=True)  # Range of the summary section it appears in,
+    max_level = Column(Integer, nullable=True)  # or NULL outside "Levels X–Y" sections
+
+
+# Columns that make up the public payload; a change to any of them rebuilds it.
+PAYLOAD_FIELDS = ("name", "category", "summary")
+
+
+def serialize_skill(skill_id, name, category, summary, summary_field: str = "summary") -> str:
+    """
+    Serialize the public fields of one skill row to a compact JSON object. The summary is
+    stored under ``summary_field``: "summary" for Markdown, "summary_html" when rendered.
+    """
+    return json.dumps(
+        {"id": skill_id, "name": name, "category": category, summary_field: summary},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+@event.listens_for(Skill, "before_insert")
+def _html_before_insert(mapper, connection, target):
+    target.summary_html = render_markdown(target.summary)
+
+
+@event.listens_for(Skill, "after_insert")
+def _payload_after_insert(mapper, connection, target):
+    # The id only exists once the row is inserted, so write the payload here.
+    payload = serialize_skill(target.id, target.name, target.category, target.summary)
+    connection.execute(
+        Skill.__table__.update()
+        .where(Skill.__table__.c.id == target.id)
+        .values(payload=payload)
+    )
+    set_committed_value(target, "payload", payload)
+
+
+@event.listens_for(Skill, "before_update")
+def _payload_before_update(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs["summary"].history.has_changes():
+        # Rendered once here, never per request
+        target.summary_html = render_markdown(target.summary)
+    if any(state.attrs[field].history.has_changes() for field in PAYLOAD_FIELDS):
+        target.payload = serialize_skill(target.id, target.name, target.category, target.summary)
+
+
+def write_missing_payloads(db: Session) -> int:
+    """Build payloads (and rendered summaries) for rows without one (old rows, bulk inserts); the caller commits."""
+    rows = db.execute(
+        select(Skill.id, Skill.name, Skill.category, Skill.summary).where(Skill.payload.is_(None))
+    ).all()
+    for row in rows:
+        summary_html = render_markdown(row.summary)
+        db.execute(
+            Skill.__table__.update()
+            .where(Skill.__table__.c.id == row.id)
+            .values(
+                summary_html=summary_html,
+                payload=serialize_skill(row.id, row.name, row.category, row.summary),
+            )
+        )
+    return len(rows)
+
+
+def backfill_payloads(db: Session) -> int:
+    """Build payloads for rows written before the column existed."""
+    count = write_missing_payloads(db)
+    db.commit()
+    return count
+
+
+def put_blobs(db: Session, texts) -> set:
+    """Store page bodies that are not stored yet (identical bodies are kept once). Returns their hashes."""
+    rows = {}
+    for text in texts:
+        key = content_hash(text)
+        if key not in rows:
+            rows[key] = PageBlob.row(text)
+    if rows:
+        db.execute(upsert_statement(db, PageBlob.__table__, ["hash"], []), list(rows.values()))
+    return set(rows)
+
+
+def prune_blobs(db: Session) -> int:
+    """Delete bodies no page or legacy skill row refers to any more."""
+    referenced = select(WikiPage.hash).union(select(Skill.hash).where(Skill.page_id.is_(None)))
+    result = db.execute(PageBlob.__table__.delete().where(PageBlob.hash.not_in(referenced)))
+    return result.rowcount
@@ -0,0 +1,346 @@
+import argparse
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+import skill_fetcher
+import summarize_skills
+from database import SessionLocal, engine
+from export_skills import export_skill_text
+from export_summaries import export_summary
+from guide_text import clean_page, html_to_text
+from jobs import JobSkipped, job_queue
+from metrics import counter, histogram
+from models import Skill
+from snapshot import write_snapshot
+
+# Arbitrary key shared by every replica for pg_try_advisory_lock.
+REFRESH_LOCK_ID = 72043110
+
+_local_lock = threading.Lock()
+
+# Workers per streaming stage. Storing is always one worker: it is the single page writer.
+FETCH_WORKERS = int(os.getenv("PIPELINE_FETCH_WORKERS", "4"))
+CLEAN_WORKERS = int(os.getenv("PIPELINE_CLEAN_WORKERS", "2"))
+SUMMARIZE_WORKERS = int(os.getenv("PIPELINE_SUMMARIZE_WORKERS", "4"))
+EXPORT_WORKERS = int(os.getenv("PIPELINE_EXPORT_WORKERS", "1"))
+# Items waiting between two stages; a full queue makes the stage before it wait
+STAGE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "4"))
+# Seconds between dataset version bumps while a refresh is still running. Readers (the
+# response cache, its artifacts and the in-process search index) only see the refresh's
+# writes once they are published, so they lag by up to this long; every bump rebuilds
+# those bodies, so lower it where fresher reads are worth more rebuilds (0: every item).
+PUBLISH_INTERVAL = float(os.getenv("PIPELINE_PUBLISH_INTERVAL", "60"))
+# Write guide text and summaries to output/ and ai_summary/ as they are produced
+REFRESH_EXPORT = os.getenv("REFRESH_EXPORT", "false").lower() == "true"
+# Publish a snapshot bundle to SNAPSHOT_DIR after every refresh
+REFRESH_SNAPSHOT = os.getenv("REFRESH_SNAPSHOT", "false").lower() == "true"
+
+STAGE_ITEM_SECONDS = histogram("osrs_pipeline_stage_item_seconds", "Time one pipeline stage spends on one item", ("stage",))
+STAGE_ITEMS = counter("osrs_pipeline_stage_items_total", "Items handled by each pipeline stage", ("stage", "status"))
+
+
+@contextmanager
+def refresh_lock():
+    """
+    Yield True if this process may refresh. On PostgreSQL this is a session advisory
+    lock, so only one replica refreshes at a time; elsewhere a process-local lock.
+    """
+    if engine.dialect.name != "postgresql":
+        acquired = _local_lock.acquire(blocking=False)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                _local_lock.release()
+        return
+
+    with engine.connect() as conn:
+        acquired = conn.execute(text("SELECT pg_try_advisory_lock(:id)"), {"id": REFRESH_LOCK_ID}).scalar()
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": REFRESH_LOCK_ID})
+                conn.commit()
+
+
+#-------------------- STAGES --------------------#
+
+class Stage:
+    """One pipeline step: ``workers`` tasks take items from a bounded queue and hand results on.
+
+    ``handle(item)`` is a coroutine returning the items for the next stage (possibly none).
+    It reports its own per-item failures; an exception only drops that item.
+    """
+
+    def __init__(self, name: str, handle, workers: int = 1, queue_size: int = STAGE_QUEUE_SIZE):
+        self.name = name
+        self.handle = handle
+        self.workers = max(1, workers)
+        self.queue = asyncio.Queue(queue_size)
+        self.processed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.peak_queue = 0
+
+    async def put(self, item):
+        # Waits while the queue is full: backpressure on whoever feeds this stage
+        await self.queue.put(item)
+        self.peak_queue = max(self.peak_queue, self.queue.qsize())
+
+    async def work(self, downstream):
+        while True:
+            item = await self.queue.get()
+            started = time.perf_counter()
+            try:
+                results = await self.handle(item) or ()
+                self.processed += 1
+                status = "ok"
+            except Exception as e:
+                print(f"❌ {self.name} stage failed: {e}")
+                results = ()
+                self.failed += 1
+                status = "failed"
+            elapsed = time.perf_counter() - started
+            self.busy_seconds += elapsed
+            STAGE_ITEM_SECONDS.observe(elapsed, stage=self.name)
+            STAGE_ITEMS.inc(stage=self.name, status=status)
+            try:
+                for result in results:
+                    if downstream is not None:
+                        await downstream.put(result)
+            finally:
+                self.queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "processed": self.processed,
+            "failed": self.failed,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "peak_queue": self.peak_queue,
+        }
+
+
+async def run_stages(items, stages: list) -> dict:
+    """Stream ``items`` through ``stages``; every stage works while the others do. Returns stats by stage."""
+    tasks = [
+        asyncio.create_task(stage.work(stages[i + 1] if i + 1 < len(stages) else None))
+        for i, stage in enumerate(stages)
+        for _ in range(stage.workers)
+    ]
+    try:
+        for item in items:
+            await stages[0].put(item)
+        # A stage is drained once its queue is empty and its results are queued downstream
+        for stage in stages:
+            await stage.queue.join()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    return {stage.name: stage.stats() for stage in stages}
+
+
+#-------------------- STREAMING REFRESH --------------------#
+
+# Each helper runs in a worker thread with a short-lived session of its own
+
+def read_stored_pages() -> tuple[dict, set]:
+    """``skill_fetcher.stored_pages``; the rows keep their loaded bookkeeping columns after the session closes."""
+    with SessionLocal() as db:
+        return skill_fetcher.stored_pages(db)
+
+
+def unsummarized_groups(seen: set) -> list:
+    """Groups (as skill ids) of the rows no summarize worker has been handed yet."""
+    with SessionLocal() as db:
+        return summarize_skills.group_ids(skill for skill in db.query(Skill) if skill.id not in seen)
+
+
+def write_exports(skill_ids: list) -> list:
+    """Write one group's guide text and summaries to output/ and ai_summary/; returns its (skill, category) pairs."""
+    with SessionLocal() as db:
+        skills = db.query(Skill).filter(Skill.id.in_(skill_ids)).all()
+        if not skills:
+            return []
+        text = skills[0].page_text or html_to_text(skills[0].page_content)
+        for skill in skills:
+            export_skill_text(skill.name, skill.category, text)
+            if skill.summary:
+                export_summary(skill.name, skill.category, skill.summary)
+        return [(skill.name, skill.category) for skill in skills]
+
+
+def publish_snapshot() -> str:
+    """Write a bundle of the published dataset (see snapshot.write_snapshot); returns its path."""
+    with SessionLocal() as db:
+        bundle = write_snapshot(db)
+        db.commit()
+        return bundle
+
+
+async def stream_refresh(
+    force_summaries: bool = False,
+    progress=None,
+    export: bool = REFRESH_EXPORT,
+    client=None,
+    pool=None,
+    snapshot: bool = REFRESH_SNAPSHOT,
+) -> dict:
+    """
+    Fetch → clean → store → summarize → export, with each page moving to the next
+    stage as soon as it leaves the previous one. Only pages whose wiki revision moved
+    are fetched; summaries are made for rows whose inputs changed. Every DB read and write
+    runs in a thread with a session of its own, so one stage's failure rolls back only its
+    item and the event loop only waits on the network. The dataset version is bumped every
+    PUBLISH_INTERVAL seconds and once at the end; with ``snapshot`` the result is also
+    published as a bundle (see snapshot.py). Returns stage stats.
+    """
+    owns_client = client is None
+    client = client or skill_fetcher.WikiClient()
+    pool = pool or summarize_skills.SummaryPool()
+    pages = skill_fetcher.unique_pages(skill_fetcher.SKILLS)
+    stored, missing_text = await asyncio.to_thread(read_stored_pages)
+    state = {"dirty": False, "published_at": time.monotonic(), "seen": set()}
+
+    def report(stage, users, status, seconds=None, error=None):
+        if progress:
+            for skill, category in users:
+                progress(stage, f"{skill} ({category})", status, seconds=seconds, error=error)
+
+    async def fetch(item):
+        title, users = item
+        if not skill_fetcher.needs_fetch(title, stored, revisions, missing_text):
+            print(f"⏭️ {title} unchanged at revision {stored[title].revision_id}.")
+            return [(title, users, None)]
+        started = time.perf_counter()
+        try:
+            source_title, html = await skill_fetcher.fetch_with_fallback(
+                client, users[0][0], users[0][1], title, fetch=skill_fetcher.fetch_page_html,
+            )
+        except Exception as e:
+            print(f"❌ Failed for {title}: {e}")
+            report("fetch", users, "failed", round(time.perf_counter() - started, 3), str(e))
+            return []
+        report("fetch", users, "fetched", round(time.perf_counter() - started, 3))
+        return [(title, users, (source_title, html))]
+
+    async def clean(item):
+        title, users, fetched = item
+        if fetched is None:
+            return [(title, users, None)]
+        source_title, html = fetched
+        try:
+            # Parsing is CPU work; keep it off the event loop the fetchers share
+            page = await asyncio.to_thread(clean_page, html)
+            for _ in range(5):
+                if not page.redirect:
+                    break
+                print(f"🔀 Following redirect from {title} → {page.redirect}")
+                page = await asyncio.to_thread(clean_page, await skill_fetcher.fetch_page_html(client, page.redirect))
+            if page.redirect:
+                raise Exception(f"Too many redirects for {title}")
+        except Exception as e:
+            print(f"❌ Failed for {title}: {e}")
+            report("clean", users, "failed", error=str(e))
+            return []
+        return [(title, users, skill_fetcher.page_row(title, page, source_title, revisions.get(title)))]
+
+    def write_page(title, users, row):
+        # Its own session: a failed page rolls back nothing the summarizers wrote
+        with SessionLocal() as db:
+            changed = skill_fetcher.write_results(
+                db, {title: users}, [row] if row else [], stored, missing_text,
+                report=lambda t, u, status, error=None: report("store", u, status, error=error),
+                publish=False,
+            )
+            rows = db.query(Skill).filter(Skill.page.has(title=title)).all()
+            return changed, summarize_skills.group_ids(rows)
+
+    async def store(item):
+        changed, groups = await asyncio.to_thread(write_page, *item)
+        state["dirty"] |= changed
+        return groups
+
+    async def summarize(skill_ids):
+        state["seen"].update(skill_ids)
+        status = await summarize_skills.summarize_group(skill_ids, pool, force_summaries, progress, publish=False)
+        state["dirty"] |= status == "summarized"
+        return [skill_ids] if status != "failed" else []
+
+    async def publish_now():
+        # Cleared first: groups finishing while the bump runs are published next time
+        state["dirty"], state["published_at"] = False, time.monotonic()
+        await asyncio.to_thread(summarize_skills.publish_dataset)
+
+    async def export_group(skill_ids):
+        if export:
+            users = await asyncio.to_thread(write_exports, skill_ids)
+            report("export", users, "exported")
+        if state["dirty"] and time.monotonic() - state["published_at"] >= PUBLISH_INTERVAL:
+            await publish_now()
+        return []
+
+    try:
+        revisions = await skill_fetcher.lookup_revisions(client, pages, stored)
+        summarize_stage = lambda: Stage("summarize", summarize, SUMMARIZE_WORKERS)
+        export_stage = lambda: Stage("export", export_group, EXPORT_WORKERS)
+        stats = await run_stages(pages.items(), [
+            Stage("fetch", fetch, FETCH_WORKERS),
+            Stage("clean", clean, CLEAN_WORKERS),
+            Stage("store", store, 1),
+            summarize_stage(),
+            export_stage(),
+        ])
+
+        # Rows on no current page (legacy rows, pages dropped from SKILLS) still get summaries
+        leftover = await asyncio.to_thread(unsummarized_groups, set(state["seen"]))
+        if leftover:
+            await run_stages(leftover, [summarize_stage(), export_stage()])
+
+        if state["dirty"]:
+            await publish_now()
+        if snapshot:
+            print(f"📦 Snapshot written to {await asyncio.to_thread(publish_snapshot)}")
+    finally:
+        if owns_client:
+            await client.aclose()
+
+    for name, stage in stats.items():
+        print(f"⏱️ {name}: {stage['processed']} items, {stage['busy_seconds']}s busy, peak queue {stage['peak_queue']}")
+    return stats
+
+
+def run_refresh(force_summaries: bool = False, progress=None):
+    """Fetch changed wiki pages and summarize whatever changed, streaming, in this process."""
+    with refresh_lock() as acquired:
+        if not acquired:
+            raise JobSkipped("refresh already running elsewhere")
+        print("🏗️  Refreshing wiki pages and summaries...")
+        asyncio.run(stream_refresh(force_summaries, progress))
+
+
+def submit_refresh(force_summaries: bool = False):
+    """Queue a refresh job, or return the active one if it covers this request (a forced one always does)."""
+    return job_queue.submit(
+        "refresh", lambda record: run_refresh(force_summaries, record), {"force": force_summaries}
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refresh wiki pages and summaries in one streaming pass.")
+    parser.add_argument("--force", action="store_true", help="re-summarize rows even if their inputs are unchanged")
+    parser.add_argument("--export", action="store_true", help="also write output/ and ai_summary/ files")
+    parser.add_argument("--snapshot", action="store_true", help="also publish a snapshot bundle to SNAPSHOT_DIR")
+    args = parser.parse_args()
+    asyncio.run(stream_refresh(
+        force_summaries=args.force,
+        export=args.export or REFRESH_EXPORT,
+        snapshot=args.snapshot or REFRESH_SNAPSHOT,
+    ))
@@ -0,0 +1,79 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+
+from pipeline import submit_refresh
+
+# Seconds between background refreshes; 0 turns the periodic refresh off.
+REFRESH_INTERVAL_SECONDS = float(os.getenv("REFRESH_INTERVAL_SECONDS", "21600"))
+REFRESH_ON_STARTUP = os.getenv("REFRESH_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class RefreshScheduler:
+    """Queues the fetch + summarize pipeline periodically while the API keeps serving."""
+
+    def __init__(self, submit=submit_refresh, interval: float = REFRESH_INTERVAL_SECONDS, run_on_startup: bool = REFRESH_ON_STARTUP):
+        self.submit = submit
+        self.interval = interval
+        self.run_on_startup = run_on_startup
+        self.status = {
+            "state": "idle",
+            "interval_seconds": interval,
+            "last_started": None,
+            "last_finished": None,
+            "last_duration_seconds": None,
+            "last_result": None,
+            "last_error": None,
+            "next_run": None,
+            "last_job": None,
+        }
+        self._task = None
+
+    def start(self):
+        if self.run_on_startup or self.interval > 0:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _loop(self):
+        if self.run_on_startup:
+            await self.run_once()
+        while self.interval > 0:
+            self.status["next_run"] = datetime.fromtimestamp(time.time() + self.interval, timezone.utc).isoformat()
+            await asyncio.sleep(self.interval)
+            await self.run_once()
+
+    async def run_once(self):
+        """Queue one refresh job (or join the running one) and wait for it to finish."""
+        job, _ = self.submit()
+        self.status.update(state="running", last_started=_now(), last_error=None, last_job=job.id)
+        started = time.perf_counter()
+        await asyncio.to_thread(job.wait)
+
+        result = {"succeeded": "ok"}.get(job.status, job.status)
+        self.status.update(
+            state="idle",
+            last_result=result,
+            last_error=job.error if result == "failed" else None,
+            last_finished=_now(),
+            last_duration_seconds=round(time.perf_counter() - started, 3),
+        )
+        if result == "skipped":
+            print("⏭️ Refresh already running elsewhere, skipping.")
+        elif result == "failed":
+            print("❌ Background refresh failed:", job.error)
+
+
+scheduler = RefreshScheduler()
@@ -1,23 +1,32 @@
 # backend/scripts.py
 from fastapi import APIRouter, HTTPException
-import subprocess
+
+import snapshot
+from jobs import job_queue
+from pipeline import submit_refresh
 
 router = APIRouter()
 
-@router.post("/run-skill-scripts")
-def run_skill_scripts():
+@router.post("/run-skill-scripts", status_code=202)
+def run_skill_scripts(force: bool = False):
     """
-    Run skill_fetcher.py and summarize_skills.py after the database is ready.
+    Queue a wiki fetch + summarize run and return its job ID right away.
+    While a run is queued or in progress, the existing job is returned instead.
     """
-    try:
-        # Run skill_fetcher.py
-        subprocess.run(["python", "skill_fetcher.py"], check=True)
-
-        # Run summarize_skills.py
-        subprocess.run(["python", "summarize_skills.py"], check=True)
+    if snapshot.serving() is not None:
+        raise HTTPException(status_code=503, detail="This replica serves a read-only snapshot")
+    job, created = submit_refresh(force_summaries=force)
+    return {
+        "status": "queued" if created else "already_running",
+        "job_id": job.id,
+        "job": f"/jobs/{job.id}",
+    }
 
-        return {"status": "success", "message": "Scripts executed successfully."}
 
-    except subprocess.CalledProcessError as e:
-        # Capture any errors from the scripts
-        raise HTTPException(status_code=500, detail=f"Script failed: {e}")
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Status, per-skill progress, timings and failures of a background job."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
@@ -0,0 +1,288 @@
+import argparse
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from cache import response_cache
+from database import get_db
+from guide_text import split_sections
+from models import SearchSection, Skill, WikiPage
+
+SNIPPET_CHARS = 160
+MAX_RESULTS = 50
+
+WORD = re.compile(r"[A-Za-z0-9]+")
+STOP_WORDS = {"a", "an", "and", "at", "for", "in", "is", "of", "on", "or", "the", "to", "with"}
+
+# BM25 parameters; heading words count as HEADING_WEIGHT occurrences.
+BM25_K1 = 1.2
+BM25_B = 0.75
+HEADING_WEIGHT = 2
+
+
+#-------------------- INDEX MAINTENANCE --------------------#
+
+def document_sections(document: str | None) -> list[tuple[str, str]]:
+    """(heading, text) pairs of a guide or summary, split at level-range and ## headings."""
+    return [(section.heading, section.text) for section in split_sections(document or "")]
+
+
+def index_pages(db: Session, page_ids) -> int:
+    """Replace the guide sections of the given pages; the caller commits."""
+    page_ids = list(page_ids)
+    if not page_ids:
+        return 0
+    db.execute(SearchSection.__table__.delete().where(SearchSection.page_id.in_(page_ids)))
+    rows = [
+        {"kind": "guide", "page_id": page_id, "position": position, "heading": heading, "body": body}
+        for page_id, page_text in db.execute(select(WikiPage.id, WikiPage.text).where(WikiPage.id.in_(page_ids)))
+        for position, (heading, body) in enumerate(document_sections(page_text))
+    ]
+    if rows:
+        db.execute(SearchSection.__table__.insert(), rows)
+    return len(rows)
+
+
+def index_summaries(db: Session, skills) -> int:
+    """Replace the summary sections of the given skill rows; the caller commits."""
+    skills = list(skills)
+    if not skills:
+        return 0
+    db.execute(SearchSection.__table__.delete().where(SearchSection.skill_id.in_([skill.id for skill in skills])))
+    rows = [
+        {"kind": "summary", "skill_id": skill.id, "position": position, "heading": heading, "body": body}
+        for skill in skills
+        for position, (heading, body) in enumerate(document_sections(skill.summary))
+    ]
+    if rows:
+        db.execute(SearchSection.__table__.insert(), rows)
+    return len(rows)
+
+
+def rebuild_search_index(db: Session) -> int:
+    """Index every page and summary from scratch (after a migration or restore)."""
+    db.execute(SearchSection.__table__.delete())
+    count = index_pages(db, db.scalars(select(WikiPage.id)).all())
+    count += index_summaries(db, db.query(Skill).filter(Skill.summary.is_not(None)).all())
+    db.commit()
+    return count
+
+
+#-------------------- IN-PROCESS INDEX --------------------#
+
+def _stem(word: str) -> str:
+    """Lowercase and drop a plural "s", so "Crabs" finds "crab"."""
+    word = word.lower()
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def tokenize(value: str) -> list[str]:
+    return [_stem(word) for word in WORD.findall(value) if word.lower() not in STOP_WORDS]
+
+
+def snippet(body: str, terms, width: int = SNIPPET_CHARS) -> str:
+    """A window of ``body`` around the first matching word, with matches in **bold**."""
+    matches = [match for match in WORD.finditer(body) if _stem(match.group()) in terms]
+    if not matches:
+        return " ".join(body[:width].split())
+    start = max(0, matches[0].start() - width // 3)
+    end = min(len(body), start + width)
+    parts, cursor = [], start
+    for match in matches:
+        if match.start() < start or match.end() > end:
+            continue
+        parts.append(body[cursor:match.start()])
+        parts.append(f"**{match.group()}**")
+        cursor = match.end()
+    parts.append(body[cursor:end])
+    window = " ".join("".join(parts).split())
+    return ("…" if start > 0 else "") + window + ("…" if end < len(body) else "")
+
+
+def skill_rows(db: Session) -> list:
+    return db.execute(select(Skill.id, Skill.name, Skill.category, Skill.page_id).order_by(Skill.name, Skill.category)).all()
+
+
+class SkillLookup:
+    """The skill rows behind search hits: the row for summaries, every row on the page for guides."""
+
+    def __init__(self, skills=()):
+        self.by_id, self.by_page = {}, defaultdict(list)
+        for row in skills:
+            entry = {"name": row.name, "category": row.category}
+            self.by_id[row.id] = entry
+            if row.page_id is not None:
+                self.by_page[row.page_id].append(entry)
+
+    def attach(self, hits: list[dict]) -> list[dict]:
+        results = []
+        for hit in hits:
+            if hit["kind"] == "guide":
+                skills = self.by_page.get(hit["page_id"], [])
+            else:
+                skills = [self.by_id[hit["skill_id"]]] if hit["skill_id"] in self.by_id else []
+            results.append({
+                "kind": hit["kind"],
+                "heading": hit["heading"],
+                "snippet": hit["snippet"],
+                "score": hit["score"],
+                "skills": skills,
+            })
+        return results
+
+
+class SearchIndex:
+    """BM25 inverted index over search_sections, rebuilt when the dataset version moves."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._postings = {}   # term -> {section_id: term frequency}
+        self._lengths = {}    # section_id -> token count
+        self._sections = {}   # section_id -> row
+        self._average = 0.0
+        self._skills = (None, None)   # (version, SkillLookup), swapped as one
+
+    @staticmethod
+    def _load(db: Session) -> list:
+        return db.execute(select(
+            SearchSection.id, SearchSection.kind, SearchSection.page_id,
+            SearchSection.skill_id, SearchSection.heading, SearchSection.body,
+        )).all()
+
+    @classmethod
+    def from_rows(cls, rows, version: str) -> "SearchIndex":
+        """An index over ``rows``, anything with the search_sections columns as attributes."""
+        index = cls()
+        index._build(rows, version)
+        return index
+
+    def export(self) -> dict:
+        """
+        The built index as plain data: its sections in id order, and token counts and postings
+        ({term: {section id: frequency}}) by section id. These are the index's own structures,
+        not copies; they are replaced, never changed, on a rebuild.
+        """
+        with self._lock:
+            return {
+                "version": self._version,
+                "average_length": self._average,
+                "sections": [self._sections[section_id] for section_id in sorted(self._lengths)],
+                "lengths": self._lengths,
+                "postings": self._postings,
+            }
+
+    def _build(self, rows, version: str):
+        postings, lengths, sections = defaultdict(dict), {}, {}
+        for row in rows:
+            counts = Counter(tokenize(row.body))
+            for term in tokenize(row.heading):
+                counts[term] += HEADING_WEIGHT
+            for term, count in counts.items():
+                postings[term][row.id] = count
+            lengths[row.id] = sum(counts.values())
+            sections[row.id] = row
+        self._postings, self._lengths, self._sections = dict(postings), lengths, sections
+        self._average = sum(lengths.values()) / len(lengths) if lengths else 0.0
+        self._version = version
+
+    def search(self, db: Session, version: str, query: str, limit: int) -> list[dict]:
+        if version != self._version:
+            # Read outside the lock: under run_sync the query yields to the event loop,
+            # where another request on this same thread may be waiting for the lock.
+            rows = self._load(db)
+            with self._lock:
+                if version != self._version:
+                    self._build(rows, version)
+        return self.ranked(query, limit)
+
+    def skills(self, version: str) -> "SkillLookup | None":
+        """The skill lookup for ``version``, or None until ``load_skills`` has read it."""
+        built, skills = self._skills
+        return skills if built == version else None
+
+    def load_skills(self, db: Session, version: str) -> SkillLookup:
+        skills = SkillLookup(skill_rows(db))
+        self._skills = (version, skills)
+        return skills
+
+    def ranked(self, query: str, limit: int) -> list[dict]:
+        """Best ``limit`` sections of the index as it is built now."""
+        with self._lock:
+            terms = set(tokenize(query))
+            # Looked up once per term: a snapshot's postings are decoded on every lookup
+            by_term = {term: self._postings.get(term) for term in terms}
+            if not terms or None in by_term.values():
+                return []
+
+            # Every term must match, like websearch_to_tsquery on PostgreSQL
+            candidates = set.intersection(*(set(postings) for postings in by_term.values()))
+            total = len(self._lengths)
+            scores = {}
+            for postings in by_term.values():
+                idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+                for section_id in candidates:
+                    tf = postings[section_id]
+                    norm = 1 - BM25_B + BM25_B * self._lengths[section_id] / self._average
+                    scores[section_id] = scores.get(section_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + BM25_K1 * norm)
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            results = []
+            for section_id, score in ranked:
+                section = self._sections[section_id]
+                results.append({
+                    "kind": section.kind,
+                    "page_id": section.page_id,
+                    "skill_id": section.skill_id,
+                    "heading": section.heading,
+                    "snippet": snippet(section.body, terms),
+                    "score": round(score, 4),
+                })
+            return results
+
+
+search_index = SearchIndex()
+
+
+#-------------------- QUERIES --------------------#
+
+PG_SEARCH = text("""
+    SELECT s.kind, s.page_id, s.skill_id, s.heading,
+           ts_rank(s.search_vector, q) AS score,
+           ts_headline('english', s.body, q,
+                       'StartSel=**, StopSel=**, MaxFragments=1, MaxWords=30, MinWords=10') AS snippet
+    FROM search_sections s, websearch_to_tsquery('english', :q) q
+    WHERE s.search_vector @@ q
+    ORDER BY score DESC, s.id
+    LIMIT :limit
+""")
+
+
+async def search(db: AsyncSession, query: str, limit: int = 20, version: str = None) -> list[dict]:
+    """Ranked guide and summary sections for ``query``."""
+    limit = max(1, min(limit, MAX_RESULTS))
+    # Both the in-process index and the skill lookup follow the version every store and summary bumps
+    version = version or await response_cache.version(db)
+    if db.get_bind().dialect.name == "postgresql":
+        rows = (await db.execute(PG_SEARCH, {"q": query, "limit": limit})).mappings().all()
+        hits = [{**row, "score": round(float(row["score"]), 4)} for row in rows]
+    else:
+        hits = await db.run_sync(lambda session: search_index.search(session, version, query, limit))
+    skills = search_index.skills(version)
+    if skills is None:
+        skills = await db.run_sync(lambda session: search_index.load_skills(session, version))
+    return skills.attach(hits)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the guide search index.")
+    parser.add_argument("--rebuild", action="store_true", help="Re-index every page and summary")
+    args = parser.parse_args()
+    if args.rebuild:
+        db: Session = next(get_db())
+        print(f"🔎 Indexed {rebuild_search_index(db)} sections.")
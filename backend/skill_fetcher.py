@@ -1,11 +1,21 @@
-import requests
-from bs4 import BeautifulSoup
-from database import get_db
-from models import Skill
-from sqlalchemy.orm import Session
-import hashlib
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PureWindowsPath
+from database import get_db, upsert_statement
+from models import Skill, WikiPage, prune_blobs, put_blobs, write_missing_payloads
+from sqlalchemy import bindparam, select
+from sqlalchemy.orm import Session, load_only
+import time
 
-API_URL = "https://oldschool.runescape.wiki/api.php"
+from blobs import content_hash
+from cache import bump_dataset_version
+from levels import extract_pages
+from search import index_pages
+from wiki_client import WikiClient
+from guide_text import CleanPage, clean_page
 
 # Full OSRS skills with their free-to-play (f2p) and pay-to-play (p2p) training pages
 SKILLS = {
@@ -96,93 +106,450 @@ SKILLS = {
 }
 
 
-def fetch_html_content(page_title: str, _depth=0) -> str:
-    """Fetch rendered HTML from OSRS Wiki, follow redirects automatically."""
-    if _depth > 5:
-        raise Exception(f"Too many redirects for {page_title}")
-
+async def fetch_page_html(client: WikiClient, page_title: str) -> str:
+    """Rendered HTML of one OSRS Wiki page, uncleaned."""
     params = {
         "action": "parse",
         "page": page_title,
         "prop": "text",
         "format": "json",
     }
-    response = requests.get(API_URL, params=params)
-    data = response.json()
+    data = await client.get_json(params)
 
     if "error" in data:
         raise Exception(f"Error fetching {page_title}: {data['error']}")
+    return data["parse"]["text"]["*"]
 
-    html_content = data["parse"]["text"]["*"]
-    soup = BeautifulSoup(html_content, "html.parser")
 
-    # Check for redirect notice
-    redirect_div = soup.select_one(".redirectMsg a")
-    if redirect_div:
-        target_page = redirect_div.get_text(strip=True)
-        print(f"🔀 Following redirect from {page_title} → {target_page}")
-        return fetch_html_content(target_page, _depth=_depth + 1)
+async def fetch_html_content(client: WikiClient, page_title: str, _depth=0) -> CleanPage:
+    """
+    Fetch rendered HTML from OSRS Wiki, follow redirects automatically.
+    The HTML is parsed once here and returned cleaned, together with its compact text.
+    """
+    if _depth > 5:
+        raise Exception(f"Too many redirects for {page_title}")
+
+    page = clean_page(await fetch_page_html(client, page_title))
 
-    # Strip edit links
-    for el in soup.select(".mw-editsection"):
-        el.decompose()
+    # Check for redirect notice
+    if page.redirect:
+        print(f"🔀 Following redirect from {page_title} → {page.redirect}")
+        return await fetch_html_content(client, page.redirect, _depth=_depth + 1)
 
-    return str(soup)
+    return page
 
 
 
-def fetch_with_fallback(skill: str, mode: str, page: str) -> str:
+async def fetch_with_fallback(client: WikiClient, skill: str, mode: str, page: str, fetch=None):
     """
     Try fetching the given page.
     If it's missing, retry with a simplified '<Skill>_training'.
+    Returns (title actually fetched, cleaned page), or the raw HTML when ``fetch`` is
+    fetch_page_html.
     """
+    fetch = fetch or fetch_html_content
     try:
-        return fetch_html_content(page)
+        return page, await fetch(client, page)
     except Exception as e:
         if "missingtitle" in str(e):
             fallback = f"{skill}_training"
             print(f"⚠️ Falling back to {fallback} for {skill} ({mode}).")
-            return fetch_html_content(fallback)
+            return fallback, await fetch(client, fallback)
         else:
             raise
 
 
-def store_skills():
+async def fetch_revisions(client: WikiClient, titles) -> dict:
+    """
+    Look up the latest revision ID of many pages in one API call (50 titles per call).
+    Returns {title: revid, or None if the page is missing}.
+    """
+    titles = list(dict.fromkeys(titles))
+    revisions = {}
+    for start in range(0, len(titles), 50):
+        batch = titles[start:start + 50]
+        data = await client.get_json({
+            "action": "query",
+            "prop": "revisions",
+            "rvprop": "ids|timestamp",
+            "titles": "|".join(batch),
+            "redirects": 1,
+            "format": "json",
+            "formatversion": 2,
+        })
+        query = data.get("query", {})
+
+        # Follow the API's title normalisation and redirects back to what we asked for
+        resolved = {title: title for title in batch}
+        for step in ("normalized", "redirects"):
+            renames = {r["from"]: r["to"] for r in query.get(step, [])}
+            resolved = {title: renames.get(target, target) for title, target in resolved.items()}
+
+        latest = {
+            page["title"]: page["revisions"][0]["revid"]
+            for page in query.get("pages", [])
+            if not page.get("missing") and page.get("revisions")
+        }
+        for title, target in resolved.items():
+            revisions[title] = latest.get(target)
+    return revisions
+
+
+def unique_pages(skills: dict) -> dict:
+    """Map each distinct page title to the (skill, category) rows that use it."""
+    pages = {}
+    for skill, categories in skills.items():
+        for category, page in categories.items():
+            pages.setdefault(page, []).append((skill, category))
+    return pages
+
+
+async def fetch_pages(client: WikiClient, pages: dict, timings: dict = None) -> dict:
+    """
+    Fetch each title in ``pages`` ({title: [(skill, category), ...]}) concurrently.
+    Returns {page_title: (fetched title, CleanPage) or the Exception that fetch raised}.
+    Per-page fetch seconds are written into ``timings`` if given.
+    """
+    async def timed(title, users):
+        started = time.perf_counter()
+        try:
+            # Shared pages only fall back once, using the first skill that references them
+            return await fetch_with_fallback(client, users[0][0], users[0][1], title)
+        finally:
+            if timings is not None:
+                timings[title] = round(time.perf_counter() - started, 3)
+
+    results = await asyncio.gather(
+        *(timed(title, users) for title, users in pages.items()),
+        return_exceptions=True,
+    )
+    return dict(zip(pages, results))
+
+
+async def fetch_all(skills: dict = None, client: WikiClient = None) -> dict:
+    """Fetch every distinct page once, concurrently."""
+    pages = unique_pages(SKILLS if skills is None else skills)
+    owns_client = client is None
+    client = client or WikiClient()
+    try:
+        return await fetch_pages(client, pages)
+    finally:
+        if owns_client:
+            await client.aclose()
+
+
+async def lookup_revisions(client: WikiClient, pages, stored: dict) -> dict:
+    """Current revision ID of every title in ``pages``; None where it is unknown."""
+    # Query the title we actually fetched last time, so fallbacks stay one request
+    lookup = {
+        title: (stored[title].source_title or title) if title in stored else title
+        for title in pages
+    }
+    try:
+        by_source = await fetch_revisions(client, lookup.values())
+        return {title: by_source.get(source) for title, source in lookup.items()}
+    except Exception as e:
+        print(f"⚠️ Revision lookup failed, fetching every page: {e}")
+        return {title: None for title in pages}
+
+
+def needs_fetch(title: str, stored: dict, revisions: dict, refetch=frozenset()) -> bool:
+    """True unless the stored copy of ``title`` is at the wiki's current revision."""
+    return (
+        revisions[title] is None
+        or title in refetch
+        or title not in stored
+        or stored[title].revision_id != revisions[title]
+    )
+
+
+async def fetch_changed(pages: dict, stored: dict, client: WikiClient = None, refetch=frozenset(), timings: dict = None) -> tuple[dict, dict]:
+    """
+    Ask the wiki for current revision IDs in one batch, then fetch only pages whose
+    revision differs from the stored one (plus any titles in ``refetch``).
+    Returns (fetched pages, revisions by title).
+    """
+    owns_client = client is None
+    client = client or WikiClient()
+    try:
+        revisions = await lookup_revisions(client, pages, stored)
+        changed = {title for title in pages if needs_fetch(title, stored, revisions, refetch)}
+        fetched = await fetch_pages(client, {title: pages[title] for title in changed}, timings)
+    finally:
+        if owns_client:
+            await client.aclose()
+    return fetched, revisions
+
+
+def page_row(title: str, cleaned: CleanPage, source_title: str = None, revision_id: int = None) -> dict:
+    """Column values for the single stored copy of a fetched page; ``content`` goes to the blob store."""
+    return {
+        "title": title,
+        "content": cleaned.html,
+        "text": cleaned.text,
+        "hash": content_hash(cleaned.html),
+        "source_title": source_title,
+        "revision_id": revision_id,
+    }
+
+
+def write_pages(db: Session, rows: list, stored: dict, missing_text=frozenset()) -> set:
+    """
+    Upsert fetched pages in bulk. Pages whose content hash is unchanged only get their
+    revision bookkeeping updated, so their HTML is never rewritten. Returns changed titles.
+    """
+    changed = [
+        row for row in rows
+        if row["title"] not in stored or stored[row["title"]].hash != row["hash"] or row["title"] in missing_text
+    ]
+    changed_titles = {row["title"] for row in changed}
+    moved = [
+        {"b_id": stored[row["title"]].id, "source_title": row["source_title"], "revision_id": row["revision_id"]}
+        for row in rows
+        if row["title"] not in changed_titles and (
+            stored[row["title"]].revision_id != row["revision_id"]
+            or stored[row["title"]].source_title != row["source_title"]
+        )
+    ]
+
+    if changed:
+        # Bodies first: pages refer to them by hash, and a body shared by pages is stored once
+        put_blobs(db, [row["content"] for row in changed])
+        db.execute(
+            upsert_statement(
+                db, WikiPage.__table__, ["title"],
+                ["text", "hash", "source_title", "revision_id"],
+                where=lambda table, excluded: (table.c.hash != excluded.hash) | table.c.text.is_(None),
+            ),
+            [{key: value for key, value in row.items() if key != "content"} for row in changed],
+        )
+    if moved:
+        table = WikiPage.__table__
+        db.execute(
+            table.update().where(table.c.id == bindparam("b_id")).values(
+                source_title=bindparam("source_title"), revision_id=bindparam("revision_id"),
+            ),
+            moved,
+        )
+    return changed_titles
+
+
+def write_skills(db: Session, pages: dict, page_ids: dict) -> dict:
+    """
+    Point every (skill, category) at its page with one bulk upsert; rows that already
+    match are left out entirely. Returns {(skill, category): added/updated/unchanged}.
+    """
+    existing = {
+        (row.name, row.category): row
+        for row in db.execute(select(Skill.name, Skill.category, Skill.page_id, Skill.hash))
+    }
+
+    statuses, rows = {}, []
+    for title, users in pages.items():
+        page_id, page_hash = page_ids[title]
+        for skill, category in users:
+            current = existing.get((skill, category))
+            if current is not None and current.page_id == page_id and current.hash == page_hash:
+                statuses[(skill, category)] = "unchanged"
+                continue
+            statuses[(skill, category)] = "added" if current is None else "updated"
+            rows.append({"name": skill, "category": category, "page_id": page_id, "hash": page_hash})
+
+    if rows:
+        db.execute(
+            upsert_statement(
+                db, Skill.__table__, ["name", "category"], ["page_id", "hash"],
+                where=lambda table, excluded: (table.c.hash != excluded.hash)
+                | table.c.page_id.is_distinct_from(excluded.page_id),
+            ),
+            rows,
+        )
+        # Bulk inserts skip the ORM hook that writes the payload
+        write_missing_payloads(db)
+    return statuses
+
+
+def stored_pages(db: Session) -> tuple[dict, set]:
+    """Bookkeeping columns of every stored page by title, and titles still missing their text."""
+    # Only the bookkeeping columns; unchanged pages never load their HTML
+    stored = {
+        page.title: page
+        for page in db.query(WikiPage).options(
+            load_only(WikiPage.id, WikiPage.title, WikiPage.hash, WikiPage.source_title, WikiPage.revision_id)
+        )
+    }
+    # Pages stored before compact text existed are fetched again to fill it in
+    missing_text = set(db.scalars(select(WikiPage.title).where(WikiPage.text.is_(None))))
+    return stored, missing_text
+
+
+def store_skills(client: WikiClient = None, progress=None):
+    """
+    Refresh every page whose wiki revision moved and link skill rows to it, writing
+    all results in one transaction.
+    ``progress(stage, item, status, seconds=None, error=None)`` is called once per skill row.
+    """
+    pages = unique_pages(SKILLS)
+
+    db: Session = next(get_db())
+    stored, missing_text = stored_pages(db)
+    timings = {}
+    fetched, revisions = asyncio.run(
+        fetch_changed(pages, stored, client, refetch=missing_text, timings=timings)
+    )
+
+    def report(title, users, status, error=None):
+        if progress:
+            for skill, category in users:
+                progress("fetch", f"{skill} ({category})", status, seconds=timings.get(title), error=error)
+
+    rows, ok = [], {}
+    for title, users in pages.items():
+        result = fetched.get(title)
+        if isinstance(result, Exception):
+            print(f"❌ Failed for {title} ({', '.join(f'{s} {c}' for s, c in users)}): {result}")
+            report(title, users, "failed", str(result))
+            continue
+        if result is not None:
+            source_title, cleaned = result
+            rows.append(page_row(title, cleaned, source_title, revisions.get(title)))
+        else:
+            print(f"⏭️ {title} unchanged at revision {stored[title].revision_id}.")
+        ok[title] = users
+
+    write_results(db, ok, rows, stored, missing_text, report)
+
+
+def write_results(db: Session, pages: dict, rows: list, stored: dict, missing_text=frozenset(), report=None, publish=True) -> bool:
+    """
+    Apply page rows and skill links for ``pages`` ({title: users}) in one transaction.
+    Returns True if anything changed. With ``publish=False`` the dataset version is left
+    for the caller to bump, e.g. once at the end of a streaming refresh.
+    """
+    try:
+        changed_pages = write_pages(db, rows, stored, missing_text)
+        page_ids = {
+            row.title: (row.id, row.hash)
+            for row in db.execute(select(WikiPage.id, WikiPage.title, WikiPage.hash).where(WikiPage.title.in_(pages)))
+        }
+        statuses = write_skills(db, pages, page_ids)
+        changed_ids = [page_ids[title][0] for title in changed_pages]
+        index_pages(db, changed_ids)
+        extract_pages(db, changed_ids)
+        changed = bool(changed_pages) or any(status != "unchanged" for status in statuses.values())
+        if changed:
+            # Bodies of replaced pages are no longer referenced
+            prune_blobs(db)
+            if publish:
+                # Let API workers know their cached responses are stale
+                bump_dataset_version(db)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Failed to store skills: {e}")
+        if report:
+            for title, users in pages.items():
+                report(title, users, "failed", str(e))
+        raise
+
+    icons = {"added": "✅ Added", "updated": "🔄 Updated", "unchanged": "↔️ No change for"}
+    for title, users in pages.items():
+        for skill, category in users:
+            status = statuses[(skill, category)]
+            if status == "unchanged" and title in changed_pages:
+                status = "updated"
+            print(f"{icons[status]} {skill} ({category}).")
+            if report:
+                report(title, [(skill, category)], status)
+    return changed
+
+
+#-------------------- OFFLINE CORPUS --------------------#
+
+CORPUS_DIR = Path(__file__).resolve().parent / "skill_pages"
+CORPUS_MAP = CORPUS_DIR / "skill_file_map.json"
+CORPUS_WORKERS = int(os.getenv("CORPUS_WORKERS", "8"))
+
+# Skill names in skill_file_map.json that differ from SKILLS
+CORPUS_SKILL_NAMES = {"Runecrafting": "Runecraft"}
+
+
+def corpus_path(entry: str, base: Path) -> Path:
+    """Resolve a map entry such as ``skill_pages\\p2p\\Agility_training.txt`` on any OS."""
+    return base.joinpath(*PureWindowsPath(entry).parts)
+
+
+def corpus_pages(map_path: Path = CORPUS_MAP) -> tuple[dict, dict]:
+    """
+    Read the corpus map. Returns ({title: [(skill, category), ...]}, {title: [paths]}).
+    Titles follow SKILLS where it knows the page, so a later live refresh updates the
+    same rows; categories without files are skipped and repeated paths read once.
+    When skills sharing a SKILLS page have their own files (Hitpoints on the melee
+    pages), the files most of them use keep the title and the rest go by file name.
+    """
+    map_path = Path(map_path)
+    with open(map_path, encoding="utf-8") as f:
+        mapping = json.load(f)
+
+    # Skills reading the same files share one page
+    file_sets = {}
+    for name, categories in mapping.items():
+        skill = CORPUS_SKILL_NAMES.get(name, name)
+        for category, entries in categories.items():
+            # Entries are relative to the directory holding skill_pages/
+            paths = tuple(dict.fromkeys(corpus_path(entry, map_path.parent.parent) for entry in entries))
+            if paths:
+                file_sets.setdefault(paths, []).append((skill, category))
+
+    claims = {}
+    for paths, users in file_sets.items():
+        skill, category = users[0]
+        claims.setdefault(SKILLS.get(skill, {}).get(category) or paths[0].stem, []).append(paths)
+
+    pages, files = {}, {}
+    for title, claimants in claims.items():
+        owner = max(claimants, key=lambda paths: len(file_sets[paths]))
+        for paths in claimants:
+            page = title if paths == owner else paths[0].stem
+            if page in files:
+                print(f"⚠️ Skipping {file_sets[paths]}: {page} is already read from {files[page][0].name}")
+                continue
+            pages[page], files[page] = file_sets[paths], list(paths)
+    return pages, files
+
+
+def read_corpus_page(paths: list) -> CleanPage:
+    """The stored text of one page; pages split over several files are joined in order."""
+    text = "\n\n".join(path.read_text(encoding="utf-8").strip() for path in paths)
+    # The corpus is already plain text, so it serves as both content and text
+    return CleanPage(text, text, None)
+
+
+def ingest_corpus(map_path: Path = CORPUS_MAP, workers: int = CORPUS_WORKERS, progress=None):
+    """Load every page of the checked-in corpus into the DB without touching the network."""
+    pages, files = corpus_pages(map_path)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        cleaned = dict(zip(files, pool.map(read_corpus_page, files.values())))
+    rows = [page_row(title, cleaned[title], files[title][0].stem) for title in pages]
+
     db: Session = next(get_db())
-    for skill, pages in SKILLS.items():
-        for category, page in pages.items():
-            try:
-                # fetch with fallback support
-                content = fetch_with_fallback(skill, category, page)
-                content_hash = hashlib.sha256(content.encode("utf-8")).hexdigest()
-
-                existing = (
-                    db.query(Skill)
-                    .filter(Skill.name == skill, Skill.category == category)
-                    .first()
-                )
-
-                if existing:
-                    if existing.hash == content_hash:
-                        print(f"↔️ No change for {skill} ({category}).")
-                    else:
-                        existing.content = content
-                        existing.hash = content_hash
-                        db.commit()
-                        print(f"🔄 Updated {skill} ({category}).")
-                else:
-                    new_skill = Skill(
-                        name=skill,
-                        category=category,   # ✅ Correct column name
-                        content=content,
-                        hash=content_hash,
-                    )
-                    db.add(new_skill)
-                    db.commit()
-                    print(f"✅ Added {skill} ({category}).")
-
-            except Exception as e:
-                print(f"❌ Failed for {skill} ({category}): {e}")
+    stored, missing_text = stored_pages(db)
+
+    def report(title, users, status, error=None):
+        if progress:
+            for skill, category in users:
+                progress("ingest", f"{skill} ({category})", status, error=error)
+
+    write_results(db, pages, rows, stored, missing_text, report)
+    print(f"📦 Ingested {len(rows)} pages for {sum(map(len, pages.values()))} skills from {map_path}")
+
 
 if __name__ == "__main__":
-    store_skills()
+    parser = argparse.ArgumentParser(description="Fetch wiki pages into the database.")
+    parser.add_argument("--ingest", action="store_true", help="Load the checked-in skill_pages/ corpus instead of the live wiki")
+    parser.add_argument("--map", default=str(CORPUS_MAP), help="Corpus map used with --ingest")
+    args = parser.parse_args()
+    if args.ingest:
+        ingest_corpus(args.map)
+    else:
+        store_skills()
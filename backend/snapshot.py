@@ -0,0 +1,452 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+from array import array
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+
+from fastapi import HTTPException, Request, Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from artifacts import ENCODINGS, artifact_bodies, build_entity_body, canonical_skill_name, encode_body, json_body
+from cache import cache_headers, encoded_response, etag_matches, read_version
+from database import get_db
+from levels import ranges_covering, skill_ranges
+from models import Entity, SearchSection, Skill, write_missing_payloads
+from search import MAX_RESULTS, SearchIndex, SkillLookup, skill_rows
+
+# Where bundles are written: one directory per dataset version, plus a CURRENT pointer
+SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "snapshots")
+# A bundle root to serve from instead of the database (read-only replicas)
+SERVE_SNAPSHOT = os.getenv("SERVE_SNAPSHOT", "")
+# Bundles kept besides the current one, for replicas still serving an older version
+SNAPSHOT_KEEP = int(os.getenv("SNAPSHOT_KEEP", "3"))
+# How often a serving worker checks CURRENT for a newly published bundle
+SNAPSHOT_RELOAD_SECONDS = float(os.getenv("SNAPSHOT_RELOAD_SECONDS", "2"))
+
+SNAPSHOT_FORMAT = 2
+EXTENSIONS = {"identity": ".json", "gzip": ".json.gz", "br": ".json.br"}
+
+# Everything the API serves, packed into one file that every worker maps read-only
+PACK_FILE = "snapshot.pack"
+PACK_MAGIC = b"OSRSPACK"
+# Bodies built from the level index on request (recommend), kept per worker
+BUILT_CACHE_SIZE = 256
+
+SectionRow = namedtuple("SectionRow", "id kind page_id skill_id heading body")
+SkillRow = namedtuple("SkillRow", "id name category page_id")
+
+
+#-------------------- WRITING BUNDLES --------------------#
+
+def snapshot_indexes(db: Session) -> dict:
+    """Everything the routes that are not a stored body need: level ranges and the search index."""
+    names = sorted(set(db.scalars(select(Skill.name))))
+    levels = {}
+    for name in names:
+        categories = sorted(db.scalars(select(Skill.category).where(Skill.name == name)))
+        levels[canonical_skill_name(name)] = {"categories": categories, "ranges": skill_ranges(db, name)}
+
+    sections = db.execute(select(
+        SearchSection.id, SearchSection.kind, SearchSection.page_id,
+        SearchSection.skill_id, SearchSection.heading, SearchSection.body,
+    ).order_by(SearchSection.id)).all()
+    return {
+        "levels": levels,
+        "search": {
+            "sections": [list(row) for row in sections],
+            "skills": [list(row) for row in skill_rows(db)],
+        },
+    }
+
+
+def snapshot_bodies(db: Session) -> dict[str, bytes]:
+    """Every response served straight from a bundle, keyed like the response cache."""
+    bodies = artifact_bodies(db)
+    for name in sorted(set(db.scalars(select(Entity.name)))):
+        bodies[f"entities/{name}"] = build_entity_body(db, name)
+    return {key: body for key, body in bodies.items() if body is not None}
+
+
+def _write_file(bundle: str, data: bytes, extension: str) -> tuple[str, str]:
+    """Store ``data`` under its content hash; returns (relative path, sha256)."""
+    digest = hashlib.sha256(data).hexdigest()
+    path = f"files/{digest[:20]}{extension}"
+    full = os.path.join(bundle, path)
+    if not os.path.exists(full):
+        with open(full, "wb") as f:
+            f.write(data)
+    return path, digest
+
+
+def build_bundle(db: Session, bundle: str, version: str) -> dict:
+    """Write a bundle's files, pack and manifest into the empty directory ``bundle``; returns the manifest."""
+    os.makedirs(os.path.join(bundle, "files"), exist_ok=True)
+    created_at = datetime.now(timezone.utc).isoformat()
+    encoded, responses = {}, {}
+    for key, body in sorted(snapshot_bodies(db).items()):
+        encoded[key] = encode_body(body)
+        files = {
+            encoding: _write_file(bundle, data, EXTENSIONS[encoding])[0]
+            for encoding, data in encoded[key].items()
+        }
+        responses[key] = {"sha256": hashlib.sha256(body).hexdigest(), "size": len(body), "files": files}
+
+    index_data = snapshot_indexes(db)
+    indexes = {name: _write_file(bundle, json_body(index), ".json")[0] for name, index in index_data.items()}
+    pack_snapshot(os.path.join(bundle, PACK_FILE), version, created_at, encoded, index_data)
+    manifest = {
+        "format": SNAPSHOT_FORMAT,
+        "version": version,
+        "created_at": created_at,
+        "pack": PACK_FILE,
+        "responses": responses,
+        "indexes": indexes,
+    }
+    with open(os.path.join(bundle, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    return manifest
+
+
+def bundle_format(bundle: str) -> int | None:
+    try:
+        with open(os.path.join(bundle, "manifest.json"), encoding="utf-8") as f:
+            return json.load(f).get("format")
+    except (OSError, ValueError):
+        return None
+
+
+def current_version(root: str) -> str | None:
+    try:
+        with open(os.path.join(root, "CURRENT"), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _point_current(root: str, version: str):
+    # os.replace is atomic, so readers see the old version or the new one, never a partial file
+    fd, tmp = tempfile.mkstemp(prefix=".CURRENT-", dir=root)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    os.replace(tmp, os.path.join(root, "CURRENT"))
+
+
+def prune_snapshots(root: str, keep: int = SNAPSHOT_KEEP) -> list[str]:
+    """Delete all but the current bundle and the ``keep`` newest others; returns what was removed."""
+    current = current_version(root)
+    bundles = sorted(
+        (name for name in os.listdir(root)
+         if name != current and not name.startswith(".") and os.path.isfile(os.path.join(root, name, "manifest.json"))),
+        key=lambda name: os.path.getmtime(os.path.join(root, name)),
+        reverse=True,
+    )
+    removed = bundles[keep:]
+    for name in removed:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    return removed
+
+
+def write_snapshot(db: Session, root: str = SNAPSHOT_DIR) -> str:
+    """
+    Publish the current dataset as ``root/<version>/`` and point ``root/CURRENT`` at it.
+    Bundles are immutable: a version that was already written is only re-pointed.
+    """
+    write_missing_payloads(db)
+    version = read_version(db)
+    os.makedirs(root, exist_ok=True)
+    bundle = os.path.join(root, version)
+    if bundle_format(bundle) != SNAPSHOT_FORMAT:
+        # Build next to the target, then rename: a bundle directory is complete or absent
+        tmp = tempfile.mkdtemp(prefix=f".{version}-", dir=root)
+        os.chmod(tmp, 0o755)  # mkdtemp is private; API workers may run as another user
+        published = False
+        try:
+            build_bundle(db, tmp, version)
+            if os.path.isdir(bundle):
+                # Same version in an older layout; moved aside first since rename won't replace a directory
+                stale = tempfile.mkdtemp(prefix=f".{version}-stale-", dir=root)
+                os.rename(bundle, os.path.join(stale, "bundle"))
+                shutil.rmtree(stale, ignore_errors=True)
+            os.rename(tmp, bundle)
+            published = True
+        except OSError:
+            # Fine if another writer published the same version meanwhile
+            if bundle_format(bundle) != SNAPSHOT_FORMAT:
+                raise
+        finally:
+            if not published:
+                shutil.rmtree(tmp, ignore_errors=True)
+    _point_current(root, version)
+    prune_snapshots(root)
+    return bundle
+
+
+#-------------------- PACK FILE --------------------#
+
+# Layout (little-endian):
+#   "OSRSPACK", u64 header offset, u64 header length, then 8-byte aligned values.
+#   Tables are runs of (name offset, name length, value offset, value length) u64
+#   records sorted by name, searched in place. The JSON header at the end holds the
+#   version and where each table and array starts.
+
+def _blob_name(*parts: str) -> bytes:
+    return "\x00".join(parts).encode("utf-8")
+
+
+class _PackWriter:
+    def __init__(self, f):
+        self.f = f
+
+    def write(self, data: bytes) -> list[int]:
+        """Append one value; returns [offset, length]."""
+        offset = self.f.tell()
+        self.f.write(data)
+        # Keep every value 8-byte aligned so arrays can be read in place
+        self.f.write(b"\0" * (-len(data) % 8))
+        return [offset, len(data)]
+
+    def table(self, items: dict[bytes, bytes]) -> list[int]:
+        """Append a name -> value table; returns [records offset, count]."""
+        records = array("Q")
+        for name in sorted(items):
+            records.extend(self.write(name))
+            records.extend(self.write(items[name]))
+        return [self.write(records.tobytes())[0], len(items)]
+
+
+def pack_snapshot(path: str, version: str, created_at: str, responses: dict, indexes: dict):
+    """Write the encoded responses and the level and search indexes (see snapshot_indexes) as one pack file."""
+    blobs = {
+        _blob_name("response", key, encoding): data
+        for key, bodies in responses.items()
+        for encoding, data in bodies.items()
+    }
+    for name, entry in indexes["levels"].items():
+        blobs[_blob_name("levels", name)] = json_body(entry)
+    blobs[_blob_name("skills")] = json_body(indexes["search"]["skills"])
+
+    # Postings point at sections by position, in section id order, so the ranking ties match
+    index = SearchIndex.from_rows([SectionRow(*row) for row in indexes["search"]["sections"]], version).export()
+    ids = [section.id for section in index["sections"]]
+    position = {section_id: i for i, section_id in enumerate(ids)}
+    terms = {
+        term.encode("utf-8"): array("I", [
+            value for section_id, tf in sorted(postings.items()) for value in (position[section_id], tf)
+        ]).tobytes()
+        for term, postings in index["postings"].items()
+    }
+
+    with open(path, "wb") as f:
+        f.write(PACK_MAGIC + bytes(16))
+        pack = _PackWriter(f)
+        sections = array("Q")
+        for section in index["sections"]:
+            sections.extend(pack.write(json_body(list(section[1:]))))
+        header = {
+            "format": SNAPSHOT_FORMAT,
+            "version": version,
+            "created_at": created_at,
+            "average_length": index["average_length"],
+            "blobs": pack.table(blobs),
+            "terms": pack.table(terms),
+            "lengths": pack.write(array("I", [index["lengths"][section_id] for section_id in ids]).tobytes()),
+            "sections": pack.write(sections.tobytes()),
+        }
+        location = pack.write(json_body(header))
+        f.seek(len(PACK_MAGIC))
+        f.write(struct.pack("<QQ", *location))
+
+
+class PackedTable:
+    """A sorted name -> value table inside a mapped pack, found by binary search."""
+
+    def __init__(self, buf: memoryview, offset: int, count: int):
+        self._buf = buf
+        self._records = buf[offset:offset + count * 32].cast("Q")
+        self._count = count
+
+    def _slice(self, offset: int, length: int) -> memoryview:
+        return self._buf[offset:offset + length]
+
+    def get(self, name: bytes) -> memoryview | None:
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._slice(*self._records[4 * mid:4 * mid + 2]).tobytes() < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._count and self._slice(*self._records[4 * lo:4 * lo + 2]) == name:
+            return self._slice(*self._records[4 * lo + 2:4 * lo + 4])
+        return None
+
+
+class PackedPostings:
+    """term -> {section position: term frequency}, decoded from the pack on each lookup."""
+
+    def __init__(self, table: PackedTable):
+        self._table = table
+
+    def get(self, term: str) -> dict | None:
+        data = self._table.get(term.encode("utf-8"))
+        if data is None:
+            return None
+        pairs = data.cast("I")
+        return dict(zip(pairs[0::2], pairs[1::2]))
+
+
+class PackedSections:
+    def __init__(self, buf: memoryview, records: memoryview):
+        self._buf = buf
+        self._records = records
+
+    def __getitem__(self, position: int) -> SectionRow:
+        offset, length = self._records[2 * position], self._records[2 * position + 1]
+        return SectionRow(position, *json.loads(self._buf[offset:offset + length].tobytes()))
+
+
+class PackedSearchIndex(SearchIndex):
+    """The BM25 index of a pack, read in place instead of built in memory."""
+
+    def __init__(self, buf: memoryview, header: dict):
+        super().__init__()
+        offset, length = header["lengths"]
+        self._lengths = buf[offset:offset + length].cast("I")
+        offset, length = header["sections"]
+        self._sections = PackedSections(buf, buf[offset:offset + length].cast("Q"))
+        self._postings = PackedPostings(PackedTable(buf, *header["terms"]))
+        self._average = header["average_length"]
+        self._version = header["version"]
+
+
+#-------------------- SERVING BUNDLES --------------------#
+
+class Snapshot:
+    """
+    A bundle's pack file, memory-mapped read-only. Every worker on a host maps the
+    same file, so bodies and indexes live once in the page cache instead of in each
+    process, and responses are slices of the mapping.
+    """
+
+    def __init__(self, bundle: str):
+        with open(os.path.join(bundle, PACK_FILE), "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._map)
+        if buf[:len(PACK_MAGIC)] != PACK_MAGIC:
+            raise ValueError(f"{bundle} has no snapshot pack")
+        offset, length = struct.unpack_from("<QQ", buf, len(PACK_MAGIC))
+        header = json.loads(buf[offset:offset + length].tobytes())
+        if header["format"] != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported snapshot format {header['format']} in {bundle}")
+        self.path = bundle
+        self.version = header["version"]
+        self.created_at = header["created_at"]
+        self._blobs = PackedTable(buf, *header["blobs"])
+        self.search_index = PackedSearchIndex(buf, header)
+        self._built = OrderedDict()
+        self._skills = None
+
+    @classmethod
+    def current(cls, root: str) -> "Snapshot":
+        version = current_version(root)
+        if version is None:
+            raise FileNotFoundError(f"No snapshot published in {root}")
+        return cls(os.path.join(root, version))
+
+    def _json(self, *name: str):
+        data = self._blobs.get(_blob_name(*name))
+        return json.loads(data.tobytes()) if data is not None else None
+
+    def bodies(self, key: str) -> dict[str, memoryview] | None:
+        """Stored encodings of one response, or None if the bundle has no such body."""
+        bodies = {}
+        for encoding in ("identity",) + ENCODINGS:
+            data = self._blobs.get(_blob_name("response", key, encoding))
+            if data is not None:
+                bodies[encoding] = data
+        return bodies or None
+
+    def recommend_body(self, name: str, level: int, category: str | None = None) -> bytes | None:
+        """The /skills/{name}/recommend body, as ``build_recommend_body`` makes it from the DB."""
+        entry = self._json("levels", canonical_skill_name(name))
+        if entry is None or (category is not None and category not in entry["categories"]):
+            return None
+        results = ranges_covering(entry["ranges"], level, category)
+        return json_body({"name": canonical_skill_name(name), "level": level, "results": results})
+
+    def search(self, query: str, limit: int = 20) -> list[dict]:
+        limit = max(1, min(limit, MAX_RESULTS))
+        hits = self.search_index.ranked(query, limit)
+        if not hits:
+            return []
+        if self._skills is None:
+            self._skills = SkillLookup(SkillRow(*row) for row in self._json("skills"))
+        return self._skills.attach(hits)
+
+    def respond(self, request: Request, key: str, build=None) -> Response:
+        """Answer like ``ResponseCache.respond``: a stored body, or ``build(self)`` encoded once."""
+        bodies = self.bodies(key) or self._built.get(key)
+        if bodies is None and build is not None:
+            body = build(self)
+            if body is not None:
+                bodies = self._built[key] = encode_body(body)
+                if len(self._built) > BUILT_CACHE_SIZE:
+                    self._built.popitem(last=False)
+        if bodies is None:
+            raise HTTPException(status_code=404, detail=f"Not found: {key}")
+        if etag_matches(request.headers.get("if-none-match"), f'"{self.version}"'):
+            return Response(status_code=304, headers=cache_headers(self.version))
+        return encoded_response(request, self.version, bodies)
+
+
+# The bundle this process serves from, when started with SERVE_SNAPSHOT
+served: Snapshot | None = None
+_served_root: str | None = None
+_checked_at = 0.0
+
+
+def serve_snapshot(root: str = SERVE_SNAPSHOT) -> Snapshot:
+    """Map the bundle ``root/CURRENT`` points at, and follow it as new bundles are published."""
+    global served, _served_root, _checked_at
+    served, _served_root, _checked_at = Snapshot.current(root), root, time.monotonic()
+    return served
+
+
+def serving() -> Snapshot | None:
+    """
+    The snapshot reads come from, or None when they come from the database. CURRENT is
+    re-read at most every SNAPSHOT_RELOAD_SECONDS; when a publish has swapped it, the new
+    pack is mapped and requests already holding the old one finish on it.
+    """
+    global served, _checked_at
+    if served is None or _served_root is None:
+        return served
+    now = time.monotonic()
+    if now - _checked_at >= SNAPSHOT_RELOAD_SECONDS:
+        _checked_at = now
+        version = current_version(_served_root)
+        if version is not None and version != served.version:
+            try:
+                served = Snapshot(os.path.join(_served_root, version))
+                print(f"📦 Now serving snapshot {version}")
+            except (OSError, ValueError) as e:
+                print(f"❌ Could not load snapshot {version}: {e}")
+    return served
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Publish the dataset as a static snapshot bundle.")
+    parser.add_argument("--out", default=SNAPSHOT_DIR, help="bundle root (default: SNAPSHOT_DIR)")
+    args = parser.parse_args()
+    db: Session = next(get_db())
+    bundle = write_snapshot(db, args.out)
+    db.commit()
+    print(f"📦 Snapshot written to {bundle}")
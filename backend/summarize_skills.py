@@ -1,14 +1,54 @@
+import argparse
+import asyncio
+import hashlib
 import os
-from openai import OpenAI
-from sqlalchemy.orm import Session
-from database import get_db
+import time
+from dataclasses import dataclass
+import openai
+from openai import AsyncOpenAI
+from database import SessionLocal
 from models import Skill
+from cache import bump_dataset_version
+from entities import extract_entities
+from levels import extract_summaries
+from search import index_summaries
+from metrics import counter, histogram
+from throttle import MinuteRateLimiter, backoff_delay
+from guide_text import chunk_guide, html_to_text
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+_openai_client = None
 
-def summarize_content(content: str, skill_name: str, mode: str) -> str:
-    """Send wiki HTML to OpenAI and return a concise Markdown-formatted summary."""
-    prompt = f"""
+
+def get_openai_client() -> AsyncOpenAI:
+    """The shared OpenAI client, created on first use so snapshot-only replicas need no API key."""
+    global _openai_client
+    if _openai_client is None:
+        # Retries are handled by SummaryPool so they share its rate limits
+        _openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0)
+    return _openai_client
+
+MODEL = os.getenv("OPENAI_MODEL", "gpt-5-mini")
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", "4"))
+OPENAI_REQUESTS_PER_MINUTE = float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "60"))
+OPENAI_TOKENS_PER_MINUTE = float(os.getenv("OPENAI_TOKENS_PER_MINUTE", "200000"))
+SUMMARY_MAX_RETRIES = int(os.getenv("SUMMARY_MAX_RETRIES", "5"))
+
+# Rough budget for the completion itself when estimating a request's token cost
+OUTPUT_TOKEN_ESTIMATE = 2000
+
+# USD per million tokens, for the cost metrics (defaults are gpt-5-mini list prices)
+OPENAI_INPUT_COST_PER_MTOK = float(os.getenv("OPENAI_INPUT_COST_PER_MTOK", "0.25"))
+OPENAI_OUTPUT_COST_PER_MTOK = float(os.getenv("OPENAI_OUTPUT_COST_PER_MTOK", "2.00"))
+
+LLM_REQUEST_SECONDS = histogram("osrs_llm_request_seconds", "Chat completion latency", ("model", "outcome"))
+LLM_TOKENS = counter("osrs_llm_tokens_total", "Tokens used by chat completions", ("model", "kind"))
+LLM_RETRIES = counter("osrs_llm_retries_total", "Chat completions retried", ("model",))
+SUMMARY_COST = histogram(
+    "osrs_summary_cost_usd", "Estimated API cost of one summary", ("model",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25),
+)
+
+PROMPT_TEMPLATE = """
     You are summarizing the Old School RuneScape wiki training guide for the skill: {skill_name} ({mode}).
 
     **Goal:**
@@ -27,6 +67,8 @@ def summarize_content(content: str, skill_name: str, mode: str) -> str:
         • Notable equipment or items  
         • Key unlocks or transitions  
     - Bold all important **training methods**, **locations**, or **items** for clarity.  
+    - The guide may cover several skills (e.g. one melee guide for Attack, Strength, Defence and Hitpoints);
+      only include what applies to training {skill_name}.
     - Keep the tone clear, factual, and efficient — like a simplified wiki guide.
     - Do NOT include any meta text, AI references, or helper language (e.g., “If you want, I can…”).
     - Do NOT add a conclusion or final paragraph — end naturally after the last level range.
@@ -43,28 +85,268 @@ def summarize_content(content: str, skill_name: str, mode: str) -> str:
     ### Level 40+
     Use **Sand Crabs** or **Ammonite Crabs** for AFK training and consistent XP.
 
-    Now summarize the following wiki content accordingly:
+    Now summarize the following wiki content accordingly.
+    It is one part of a longer guide (covering: {scope}); other parts are summarized separately,
+    so only cover the level ranges present here.
 
-    {content[:50000]}
+    {content}
     """
-    response = client.chat.completions.create(
-        model="gpt-5-mini",
-        messages=[{"role": "user", "content": prompt}],
-    )
-    return response.choices[0].message.content.strip()
 
-def main():
-    db: Session = next(get_db())
-    skills = db.query(Skill).all()
+# Changes whenever the prompt text is edited, so stored summaries know which prompt made them
+PROMPT_VERSION = hashlib.sha256(PROMPT_TEMPLATE.encode("utf-8")).hexdigest()[:12]
+
+def estimate_tokens(prompt: str) -> int:
+    """Cheap token estimate (~4 characters per token) for rate limiting."""
+    return len(prompt) // 4 + OUTPUT_TOKEN_ESTIMATE
+
+
+def completion_cost(prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimated USD cost of a completion at the configured per-token prices."""
+    return (prompt_tokens * OPENAI_INPUT_COST_PER_MTOK + completion_tokens * OPENAI_OUTPUT_COST_PER_MTOK) / 1_000_000
+
+
+def record_usage(response, usage: dict | None):
+    """Count a response's tokens, and add them to ``usage`` when the caller tracks one summary."""
+    reported = getattr(response, "usage", None)
+    for kind in ("prompt_tokens", "completion_tokens"):
+        tokens = getattr(reported, kind, None)
+        if not isinstance(tokens, int):
+            continue  # Fake clients in tests report no usage
+        LLM_TOKENS.inc(tokens, model=MODEL, kind=kind.removesuffix("_tokens"))
+        if usage is not None:
+            usage[kind] = usage.get(kind, 0) + tokens
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, server errors and dropped connections are worth another try."""
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429 or error.status_code >= 500
+    return isinstance(error, openai.APIConnectionError)
+
+
+class SummaryPool:
+    """Bounded, rate-limited access to the chat completions API.
+
+    ``client`` is anything with an async ``chat.completions.create``, so tests can
+    pass a local fake instead of the OpenAI client.
+    """
+
+    def __init__(
+        self,
+        client=None,
+        concurrency: int = SUMMARY_CONCURRENCY,
+        requests_per_minute: float = OPENAI_REQUESTS_PER_MINUTE,
+        tokens_per_minute: float = OPENAI_TOKENS_PER_MINUTE,
+        max_retries: int = SUMMARY_MAX_RETRIES,
+        backoff_base: float = 1.0,
+    ):
+        self.client = client or get_openai_client()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.retries = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._limiter = MinuteRateLimiter(requests_per_minute, tokens_per_minute)
+
+    async def complete(self, prompt: str, usage: dict = None) -> str:
+        """Completion text for ``prompt``; its token counts are added to ``usage`` if given."""
+        for attempt in range(self.max_retries + 1):
+            await self._limiter.acquire(estimate_tokens(prompt))
+            try:
+                async with self._semaphore:
+                    started = time.perf_counter()
+                    try:
+                        response = await self.client.chat.completions.create(
+                            model=MODEL,
+                            messages=[{"role": "user", "content": prompt}],
+                        )
+                    except Exception:
+                        LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, model=MODEL, outcome="error")
+                        raise
+                    LLM_REQUEST_SECONDS.observe(time.perf_counter() - started, model=MODEL, outcome="ok")
+                record_usage(response, usage)
+                return response.choices[0].message.content.strip()
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                self.retries += 1
+                LLM_RETRIES.inc(model=MODEL)
+                await asyncio.sleep(backoff_delay(attempt, self.backoff_base, cap=60.0))
+
+
+async def summarize_content(content: str, skill_name: str, mode: str, pool: SummaryPool = None, usage: dict = None) -> str:
+    """
+    Summarize a guide's compact text (see guide_text.clean_page): split it at its "Levels X–Y"
+    sections, summarize the chunks in parallel and join the results in level order.
+    """
+    pool = pool or SummaryPool()
+    chunks = chunk_guide(content)
+    parts = await asyncio.gather(*(
+        pool.complete(PROMPT_TEMPLATE.format(
+            skill_name=skill_name, mode=mode, scope=chunk.scope, content=chunk.text,
+        ), usage=usage)
+        for chunk in chunks
+    ))
+    return "\n\n".join(part for part in parts if part)
+
+def group_by_page(skills) -> dict:
+    """Group skill rows that share a wiki page and category, so the page is read once for all of them."""
+    groups = {}
     for skill in skills:
-        try:
-            summary = summarize_content(skill.content, skill.name, skill.category)
-            skill.summary = summary
-            db.commit()
-            print(f"✅ Summarized {skill.name} ({skill.category})")
-        except Exception as e:
-            print(f"❌ Failed to summarize {skill.name} ({getattr(skill, 'category', 'unknown')}): {e}")
+        key = (skill.page_id, skill.category) if skill.page_id is not None else ("skill", skill.id)
+        groups.setdefault(key, []).append(skill)
+    return groups
+
+
+def group_ids(skills) -> list[list[int]]:
+    """``group_by_page`` as lists of skill ids, which outlive the session that loaded the rows."""
+    return [[skill.id for skill in group] for group in group_by_page(skills).values()]
+
+
+def is_current(skill: Skill) -> bool:
+    """True if the stored summary was made from this content with this prompt and model."""
+    return (
+        skill.summary is not None
+        and skill.summary_hash == skill.hash
+        and skill.summary_prompt == PROMPT_VERSION
+        and skill.summary_model == MODEL
+    )
+
+
+@dataclass
+class GroupPlan:
+    """What one page's rows need, read in their own session before any completion is requested."""
+    names: str
+    category: str
+    labels: dict            # Skill id -> "Name (category)" for progress reports
+    stale: dict             # Skill id -> (skill name, content hash the new summary is made from)
+    text: str = None        # The page's guide text, shared by every stale skill's prompt
+
+
+def plan_group(skill_ids: list, force: bool = False) -> GroupPlan | None:
+    """Read a group's rows and decide what to summarize; None if they are gone."""
+    with SessionLocal() as db:
+        by_id = {skill.id: skill for skill in db.query(Skill).filter(Skill.id.in_(skill_ids))}
+        group = [by_id[skill_id] for skill_id in skill_ids if skill_id in by_id]
+        if not group:
+            return None
+        first = group[0]
+        plan = GroupPlan(
+            names=", ".join(skill.name for skill in group),
+            category=first.category,
+            labels={skill.id: f"{skill.name} ({skill.category})" for skill in group},
+            stale={skill.id: (skill.name, skill.hash) for skill in group if force or not is_current(skill)},
+        )
+        if plan.stale:
+            # Rows fetched before the text column existed still need one HTML pass
+            plan.text = first.page_text or html_to_text(first.page_content)
+        return plan
+
+
+def store_summaries(summaries: dict, publish: bool = True):
+    """Write {skill id: (content hash, summary)} and everything derived from it in a session of its own."""
+    with SessionLocal() as db:
+        skills = db.query(Skill).filter(Skill.id.in_(summaries)).all()
+        for skill in skills:
+            skill.summary_hash, skill.summary = summaries[skill.id]
+            skill.summary_prompt = PROMPT_VERSION
+            skill.summary_model = MODEL
+        index_summaries(db, skills)
+        extract_summaries(db, skills)
+        extract_entities(db, skills)
+        if publish:
+            bump_dataset_version(db)
+        db.commit()
+
+
+async def summarize_skill(text: str, name: str, category: str, pool: SummaryPool) -> str:
+    """One skill's summary of its page; shared pages (e.g. melee) are summarized once per skill."""
+    usage = {}
+    summary = await summarize_content(text, name, category, pool=pool, usage=usage)
+    if usage:
+        SUMMARY_COST.observe(
+            completion_cost(usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)), model=MODEL
+        )
+    return summary
+
+
+def publish_dataset():
+    """Bump the dataset version once after a run that summarized with ``publish=False``."""
+    with SessionLocal() as db:
+        bump_dataset_version(db)
+        db.commit()
+
+
+async def summarize_group(skill_ids: list, pool: SummaryPool, force: bool = False, progress=None, publish: bool = True) -> str:
+    """
+    Summarize each stale skill of one page/category group (skill ids, see ``group_ids``)
+    from the page's text, read once, and commit them together in their own session.
+    Returns unchanged, summarized or failed. Only the completions run on the event loop;
+    reads and writes go through a thread, so a failing group rolls back nothing but itself.
+    With ``publish=False`` the dataset version is left for the caller to bump.
+    """
+    started = time.perf_counter()
+    plan = None
+    try:
+        plan = await asyncio.to_thread(plan_group, skill_ids, force)
+        if plan is None:
+            return "unchanged"
+        if not plan.stale:
+            print(f"↔️ Summary up to date for {plan.names} ({plan.category})")
+            if progress:
+                for label in plan.labels.values():
+                    progress("summarize", label, "unchanged")
+            return "unchanged"
+
+        stale = list(plan.stale)
+        summaries = await asyncio.gather(*(
+            summarize_skill(plan.text, plan.stale[skill_id][0], plan.category, pool) for skill_id in stale
+        ))
+        await asyncio.to_thread(
+            store_summaries,
+            {skill_id: (plan.stale[skill_id][1], summary) for skill_id, summary in zip(stale, summaries)},
+            publish,
+        )
+        print(f"✅ Summarized {', '.join(name for name, _ in plan.stale.values())} ({plan.category})")
+        if progress:
+            seconds = round(time.perf_counter() - started, 3)
+            for skill_id, label in plan.labels.items():
+                if skill_id in plan.stale:
+                    progress("summarize", label, "summarized", seconds=seconds)
+                else:
+                    progress("summarize", label, "unchanged")
+        return "summarized"
+    except Exception as e:
+        names = plan.names if plan else ", ".join(map(str, skill_ids))
+        print(f"❌ Failed to summarize {names} ({getattr(plan, 'category', 'unknown')}): {e}")
+        if progress and plan:
+            seconds = round(time.perf_counter() - started, 3)
+            for skill_id in plan.stale:
+                progress("summarize", plan.labels[skill_id], "failed", seconds=seconds, error=str(e))
+        return "failed"
+
+
+async def summarize_all(force: bool = False, pool: SummaryPool = None, progress=None):
+    pool = pool or SummaryPool()
+
+    def load():
+        with SessionLocal() as db:
+            return group_ids(db.query(Skill).all())
+
+    groups = await asyncio.to_thread(load)
+    statuses = await asyncio.gather(*(
+        summarize_group(skill_ids, pool, force, progress, publish=False) for skill_ids in groups
+    ))
+    # One version bump for the whole run; each one rewrites every cached payload
+    if "summarized" in statuses:
+        await asyncio.to_thread(publish_dataset)
+
+
+def main(force: bool = False, pool: SummaryPool = None, progress=None):
+    asyncio.run(summarize_all(force, pool, progress))
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Summarize skill training guides with OpenAI.")
+    parser.add_argument("--force", action="store_true", help="re-summarize rows even if their inputs are unchanged")
+    args = parser.parse_args()
+    main(force=args.force)
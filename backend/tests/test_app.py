@@ -1,40 +1,60 @@
+import asyncio
+import threading
+
 import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
+import app as app_module
+import artifacts
 from app import app
-from database import Base, get_db
-from models import Skill
+from database import Base, async_database_url, get_async_db
+from models import ResponseArtifact, Skill
+from cache import response_cache, bump_dataset_version
+from health import HealthMonitor
+from jobs import JobQueue
+from snapshot import Snapshot, write_snapshot
+from search import index_summaries
+from levels import extract_summaries
+from entities import extract_entities
+import scripts
+import search as search_module
+import snapshot
 
 # -------------------- TEST DATABASE SETUP -------------------- #
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+# One shared in-memory database: tests write through the sync engine, routes read
+# through the async one, so both open the same named in-memory SQLite database.
+SQLALCHEMY_DATABASE_URL = "sqlite:///file:osrs_test?mode=memory&cache=shared&uri=true"
 
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},
     poolclass=StaticPool,
 )
+async_engine = create_async_engine(async_database_url(SQLALCHEMY_DATABASE_URL), poolclass=StaticPool)
 
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncTestingSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
 
 # Override FastAPI dependency to use the test DB
-def override_get_db():
-    db = TestingSessionLocal()
-    try:
+async def override_get_async_db():
+    async with AsyncTestingSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
-app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_async_db] = override_get_async_db
 
 # Create all tables in the test DB
 Base.metadata.create_all(bind=engine)
 
 client = TestClient(app)
 
+# Tests write straight to the DB, so re-read the dataset version on every request
+response_cache.revalidate_seconds = 0
+
 
 # -------------------- TESTS -------------------- #
 
@@ -47,6 +67,31 @@ def test_ping_route():
     assert "Database connected" in data["message"]
 
 
+def test_ping_serves_cached_health(monkeypatch):
+    """/ping answers from the last background probe instead of connecting per request."""
+    monitor = HealthMonitor(engine=async_engine)
+    probes = []
+
+    async def probe():
+        probes.append(1)
+
+    monkeypatch.setattr(monitor, "_probe", probe)
+    monkeypatch.setattr(app_module, "health", monitor)
+
+    assert client.get("/ping").status_code == 200
+    assert client.get("/ping").status_code == 200
+    assert probes == [1]
+
+    async def down():
+        raise ConnectionError("db down")
+
+    monkeypatch.setattr(monitor, "_probe", down)
+    asyncio.run(monitor.check())
+    response = client.get("/ping")
+    assert response.status_code == 500
+    assert "db down" in response.json()["detail"]
+
+
 def test_about_route():
     """Verify the /about endpoint returns expected keys."""
     response = client.get("/about")
@@ -71,7 +116,6 @@ def test_get_skills_with_data():
     skill = Skill(
         name="Attack",
         category="f2p",
-        content="Full wiki content",
         hash="fakehash123",
         summary="Basic Attack guide",
     )
@@ -86,3 +130,326 @@ def test_get_skills_with_data():
     assert isinstance(data, list)
     assert data[0]["name"] == "Attack"
     assert data[0]["summary"] == "Basic Attack guide"
+
+
+def test_skill_payload_rebuilt_when_summary_changes():
+    """The stored payload follows summary updates and never includes content."""
+    db = TestingSessionLocal()
+    skill = Skill(name="Mining", category="p2p", hash="h1")
+    db.add(skill)
+    db.commit()
+    assert '"summary":null' in skill.payload
+
+    skill.summary = "Mine iron"
+    db.commit()
+    db.refresh(skill)
+    skill_id = skill.id
+    db.close()
+
+    response = client.get("/skills")
+    entry = next(s for s in response.json() if s["id"] == skill_id)
+    assert entry == {
+        "id": skill_id,
+        "name": "Mining",
+        "category": "p2p",
+        "summary": "Mine iron",
+    }
+    html = next(s for s in client.get("/skills?format=html").json() if s["id"] == skill_id)
+    assert html == {"id": skill_id, "name": "Mining", "category": "p2p", "summary_html": "<p>Mine iron</p>"}
+
+
+def test_get_skills_etag_and_not_modified():
+    """A matching If-None-Match is answered with 304 and no body."""
+    response = client.get("/skills")
+    etag = response.headers["etag"]
+    assert etag.startswith('"')
+    assert response.headers["cache-control"] == "no-cache"
+
+    cached = client.get("/skills", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+
+def test_unknown_resource_is_404_even_with_the_current_etag():
+    """The ETag only vouches for resources that exist."""
+    etag = client.get("/skills").headers["etag"]
+
+    assert client.get("/skills/sailing", headers={"If-None-Match": etag}).status_code == 404
+    assert client.get("/entities/Nowhere", headers={"If-None-Match": etag}).status_code == 404
+
+
+def test_bump_dataset_version_invalidates_etag():
+    """Committing a summary change through the pipeline helper changes the ETag."""
+    etag = client.get("/skills").headers["etag"]
+
+    db = TestingSessionLocal()
+    skill = db.query(Skill).filter(Skill.name == "Attack").first()
+    skill.summary = "Updated Attack guide"
+    version = bump_dataset_version(db)
+    db.commit()
+    db.close()
+
+    response = client.get("/skills", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] == f'"{version}"'
+    assert any(s["summary"] == "Updated Attack guide" for s in response.json())
+
+
+def test_get_skill_by_name_and_category():
+    """Per-skill routes return only that skill's rows."""
+    db = TestingSessionLocal()
+    db.add(Skill(name="Attack", category="p2p", hash="h2", summary="P2P Attack"))
+    # Writers bump the version, which replaces the pre-built bodies
+    bump_dataset_version(db)
+    db.commit()
+    db.close()
+
+    response = client.get("/skills/attack")
+    assert response.status_code == 200
+    data = response.json()
+    assert [s["category"] for s in data] == ["f2p", "p2p"]
+    assert all(s["name"] == "Attack" for s in data)
+
+    response = client.get("/skills/Attack/p2p")
+    assert response.status_code == 200
+    assert response.json()["summary"] == "P2P Attack"
+
+    assert client.get("/skills/Attack/members").status_code == 404
+    assert client.get("/skills/Sailing").status_code == 404
+
+
+def test_get_skills_index_has_no_summaries():
+    """The index route lists names and categories only."""
+    response = client.get("/skills/index")
+    assert response.status_code == 200
+    data = response.json()
+    assert {"name", "category"} <= set(data[0])
+    assert "summary" not in data[0]
+
+
+def test_refresh_status_route():
+    """The background refresh status is exposed without touching the pipeline."""
+    response = client.get("/refresh/status")
+    assert response.status_code == 200
+    assert response.json()["state"] in ("idle", "running")
+
+
+def test_run_skill_scripts_queues_a_job(monkeypatch):
+    """The pipeline runs as a background job; duplicate submissions return the same job."""
+    queue = JobQueue()
+    release = threading.Event()
+    monkeypatch.setattr(scripts, "job_queue", queue)
+    monkeypatch.setattr(
+        scripts, "submit_refresh",
+        lambda force_summaries=False: queue.submit("refresh", lambda record: release.wait(5)),
+    )
+
+    first = client.post("/run-skill-scripts")
+    second = client.post("/run-skill-scripts")
+    assert first.status_code == 202
+    assert first.json()["status"] == "queued"
+    assert second.json() == {**first.json(), "status": "already_running"}
+
+    job_id = first.json()["job_id"]
+    assert client.get(f"/jobs/{job_id}").json()["status"] in ("queued", "running")
+    release.set()
+    assert queue.get(job_id).wait(5)
+    assert client.get(f"/jobs/{job_id}").json()["status"] == "succeeded"
+    assert client.get("/jobs/unknown").status_code == 404
+
+
+def test_search_route():
+    """/search ranks guide and summary sections and names the skills behind them."""
+    db = TestingSessionLocal()
+    db.query(Skill).delete()
+    skill = Skill(name="Agility", category="p2p", hash="h9", summary="### Levels 20–47\nRun laps in **Brimhaven Agility Arena**.")
+    db.add(skill)
+    db.flush()
+    index_summaries(db, [skill])
+    bump_dataset_version(db)
+    db.commit()
+    db.close()
+
+    response = client.get("/search", params={"q": "brimhaven arena"})
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["skills"] == [{"name": "Agility", "category": "p2p"}]
+    assert results[0]["heading"] == "Levels 20–47"
+    assert "**Brimhaven**" in results[0]["snippet"]
+
+    assert client.get("/search", params={"q": "nothing here"}).json()["results"] == []
+    assert client.get("/search", params={"q": " "}).status_code == 400
+    assert client.get("/search").status_code == 422
+
+
+def test_search_reads_skills_once_per_dataset_version(monkeypatch):
+    """Queries reuse the skill lookup until a write bumps the dataset version."""
+    reads = []
+    skill_rows = search_module.skill_rows
+    monkeypatch.setattr(search_module, "skill_rows", lambda db: reads.append(1) or skill_rows(db))
+    query = {"q": "brimhaven arena"}
+
+    first = client.get("/search", params=query).json()["results"]
+    client.get("/search", params=query)
+    assert len(reads) <= 1
+    assert first[0]["skills"] == [{"name": "Agility", "category": "p2p"}]
+
+    db = TestingSessionLocal()
+    db.query(Skill).filter(Skill.name == "Agility").one().category = "f2p"
+    bump_dataset_version(db)
+    db.commit()
+    db.close()
+    assert client.get("/search", params=query).json()["results"][0]["skills"] == [{"name": "Agility", "category": "f2p"}]
+
+
+def test_recommend_route():
+    """/skills/{name}/recommend returns the sections covering one level."""
+    db = TestingSessionLocal()
+    db.query(Skill).delete()
+    skill = Skill(name="Fishing", category="f2p", hash="h10", summary="### Levels 20–40\nFly fish **trout** at **Barbarian Village**.")
+    db.add(skill)
+    db.flush()
+    extract_summaries(db, [skill])
+    bump_dataset_version(db)
+    db.commit()
+    db.close()
+
+    response = client.get("/skills/fishing/recommend", params={"level": 30, "category": "F2P"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["name"] == "Fishing" and body["level"] == 30
+    assert [(r["min_level"], r["max_level"], r["method"]) for r in body["results"]] == [(20, 40, "trout")]
+
+    assert client.get("/skills/fishing/recommend", params={"level": 50}).json()["results"] == []
+    assert client.get("/skills/fishing/recommend", params={"level": 100}).status_code == 422
+    assert client.get("/skills/sailing/recommend", params={"level": 5}).status_code == 404
+
+
+def test_entity_route():
+    """/entities/{name} lists the skills that mention an entity, without scanning summaries."""
+    db = TestingSessionLocal()
+    db.query(Skill).delete()
+    skill = Skill(name="Thieving", category="p2p", hash="h11", summary="### Levels 1–5\nPickpocket **Men** in **Lumbridge**.")
+    db.add(skill)
+    db.flush()
+    extract_entities(db, [skill])
+    bump_dataset_version(db)
+    db.commit()
+    db.close()
+
+    response = client.get("/entities/Lumbridge")
+    assert response.status_code == 200
+    assert response.json() == {
+        "entity": "lumbridge",
+        "results": [{"name": "Thieving", "category": "p2p", "label": "Lumbridge", "min_level": 1, "max_level": 5}],
+    }
+    assert client.get("/entities/Zanaris").status_code == 404
+
+
+def test_skill_bodies_are_stored_pre_compressed():
+    """Writers store encoded bodies; routes pick one by Accept-Encoding without compressing."""
+    db = TestingSessionLocal()
+    db.query(Skill).delete()
+    summary = "### Level 1–20\n" + "- Kill **cows** in Lumbridge for hides and bones.\n" * 40
+    db.add(Skill(name="Ranged", category="f2p", hash="h12", summary=summary))
+    bump_dataset_version(db)
+    db.commit()
+    stored = {row.encoding for row in db.query(ResponseArtifact).filter(ResponseArtifact.key == "skills/Ranged/f2p.html")}
+    db.close()
+    assert {"identity", "gzip"} <= stored
+
+    response = client.get("/skills/ranged/f2p?format=html", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.headers["etag"].startswith('W/"')
+    assert response.json()["summary_html"].startswith("<h3>Level 1–20</h3><ul><li>Kill <strong>cows</strong>")
+    assert "summary" not in response.json()
+    assert "summary_html" not in client.get("/skills/ranged/f2p").json()
+    assert client.get("/skills/ranged/f2p?format=pdf").status_code == 422
+
+    plain = client.get("/skills/ranged/f2p?format=html", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.json() == response.json()
+
+    cached = client.get("/skills/ranged/f2p?format=html", headers={"If-None-Match": response.headers["etag"]})
+    assert cached.status_code == 304
+
+
+def test_bump_re_encodes_only_changed_bodies(monkeypatch):
+    """Unchanged bodies keep their encoded bytes and are re-stamped with the new version."""
+    db = TestingSessionLocal()
+    db.query(Skill).delete()
+    db.add_all([
+        Skill(name="Magic", category="f2p", hash="h13", summary="Cast wind strike"),
+        Skill(name="Prayer", category="f2p", hash="h14", summary="Bury bones"),
+    ])
+    bump_dataset_version(db)
+    db.commit()
+    before = {(row.key, row.encoding): row.data for row in db.query(ResponseArtifact)}
+
+    encoded = []
+    encode_body = artifacts.encode_body
+    monkeypatch.setattr(artifacts, "encode_body", lambda body: encoded.append(body) or encode_body(body))
+    db.query(Skill).filter(Skill.name == "Prayer").one().summary = "Bury big bones"
+    version = bump_dataset_version(db)
+    db.commit()
+    after = {(row.key, row.encoding): (row.version, row.data) for row in db.query(ResponseArtifact)}
+    db.close()
+
+    assert {stored_version for stored_version, _ in after.values()} == {version}
+    assert after[("skills/Magic/f2p", "identity")][1] == before[("skills/Magic/f2p", "identity")]
+    assert after[("skills/Prayer/f2p", "identity")][1] != before[("skills/Prayer/f2p", "identity")]
+    assert before[("skills/Magic/f2p", "identity")] not in encoded
+    assert after[("skills/Prayer/f2p", "identity")][1] in encoded
+    assert len(encoded) < len({key for key, _ in after})
+    assert client.get("/skills/prayer/f2p").json()["summary"] == "Bury big bones"
+
+
+def test_metrics_route():
+    """Requests are timed by route template and exposed in the Prometheus text format."""
+    client.get("/skills/ranged")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'osrs_http_request_seconds_count{method="GET",route="/skills/{name}",status="200"}' in response.text
+    assert "# TYPE osrs_response_cache_hit_ratio gauge" in response.text
+    assert client.get("/metrics/slow").json()["requests"] == []
+
+
+def test_snapshot_serves_what_the_database_does(tmp_path, monkeypatch):
+    """A replica serving a bundle answers the read routes exactly as the database does."""
+    db = TestingSessionLocal()
+    db.query(Skill).delete()
+    skills = [
+        Skill(name="Mining", category="f2p", hash="h13", summary="### Levels 1–15\nMine **copper** in **Lumbridge**.\n" * 20),
+        Skill(name="Mining", category="p2p", hash="h14", summary="### Levels 15–99\nMine **iron** at the **Mining Guild**."),
+    ]
+    db.add_all(skills)
+    db.flush()
+    index_summaries(db, skills)
+    extract_summaries(db, skills)
+    extract_entities(db, skills)
+    bump_dataset_version(db)
+    db.commit()
+    bundle = write_snapshot(db, str(tmp_path))
+    db.close()
+
+    paths = [
+        "/skills", "/skills/index", "/skills/mining", "/skills/Mining/P2P", "/skills/mining?format=html",
+        "/skills/mining/recommend?level=10", "/skills/mining/recommend?level=20&category=p2p",
+        "/entities/Lumbridge", "/search?q=iron", "/skills/sailing", "/entities/zanaris",
+    ]
+    headers = {"Accept-Encoding": "gzip"}
+    from_db = [client.get(path, headers=headers) for path in paths]
+
+    monkeypatch.setattr(snapshot, "served", Snapshot(bundle))
+    for path, expected in zip(paths, from_db):
+        response = client.get(path, headers=headers)
+        assert response.status_code == expected.status_code, path
+        assert response.content == expected.content, path
+        assert response.headers.get("etag") == expected.headers.get("etag"), path
+    assert client.get("/skills/mining", headers=headers).headers["content-encoding"] == "gzip"
+    assert client.get("/skills", headers={"If-None-Match": from_db[0].headers["etag"]}).status_code == 304
+    assert client.get("/skills/sailing", headers={"If-None-Match": from_db[0].headers["etag"]}).status_code == 404
+    assert client.get("/ping").json()["snapshot"] == snapshot.served.version
+    assert client.post("/run-skill-scripts").status_code == 503
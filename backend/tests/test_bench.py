@@ -0,0 +1,29 @@
+from bench import compare_results, corpus_html, flatten, percentile
+from guide_text import clean_page
+
+
+def test_compare_results_flags_slower_timings_and_lower_throughput():
+    baseline = {"api": {"skills": {"p95_ms": 10.0, "rps": 1000.0}, "requests": 400}, "fetch": {"stream_refresh_seconds": 2.0}}
+    current = {"api": {"skills": {"p95_ms": 14.0, "rps": 700.0}, "requests": 100}, "fetch": {"stream_refresh_seconds": 2.2}}
+
+    regressions = compare_results(baseline, current, threshold=0.25)
+
+    assert len(regressions) == 2
+    assert regressions[0].startswith("api.skills.p95_ms: 10.0 → 14.0")
+    assert regressions[1].startswith("api.skills.rps: 1000.0 → 700.0")
+
+
+def test_compare_results_ignores_sub_millisecond_noise():
+    assert compare_results({"clean": {"export_skill_text_ms": 0.2}}, {"clean": {"export_skill_text_ms": 0.6}}) == []
+
+
+def test_flatten_and_percentile():
+    assert flatten({"a": {"b": 1, "c": "x"}, "d": 2.5}) == {"a.b": 1, "d": 2.5}
+    assert percentile([5, 1, 3, 2, 4], 50) == 3
+    assert percentile([5, 1, 3, 2, 4], 99) == 5
+
+
+def test_corpus_html_is_stripped_back_to_the_corpus_text():
+    page = clean_page(corpus_html("## Levels 1–20\n- Kill cows\nTrain at Lumbridge"))
+    assert "edit source" not in page.text and "navigation" not in page.text
+    assert "Kill cows" in page.text and "Train at Lumbridge" in page.text
@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import blobs
+from database import Base
+from models import PageBlob, Skill, WikiPage, prune_blobs, put_blobs
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+
+@pytest.mark.parametrize("encoding", ["zlib", "zstd"])
+def test_compress_round_trip(encoding):
+    if encoding == "zstd" and blobs.zstandard is None:
+        pytest.skip("zstandard not installed")
+    body = "<p>Train on cows until level 20.</p>" * 200
+    stored_as, data = blobs.compress(body, encoding)
+    assert stored_as == encoding
+    assert len(data) < len(body) // 10
+    assert blobs.decompress(stored_as, data) == body
+
+
+def test_identical_bodies_are_stored_once_and_pruned():
+    db = TestingSessionLocal()
+    melee = "<p>melee</p>" * 50
+    keys = put_blobs(db, [melee, melee])
+    put_blobs(db, [melee])  # already stored: no conflict, no rewrite
+    key = keys.pop()
+    db.add(WikiPage(title="Free-to-play_melee_training", text="melee", hash=key))
+    db.add(PageBlob.from_text("orphan"))
+    db.commit()
+
+    assert db.query(PageBlob).count() == 2
+    page = db.query(WikiPage).one()
+    assert page.content == melee
+    assert page.blob.size == len(melee)
+
+    assert prune_blobs(db) == 1
+    db.commit()
+    assert [blob.hash for blob in db.query(PageBlob)] == [key]
+
+    # Legacy rows without a page read their body by hash too
+    legacy = Skill(name="Mining", category="f2p", hash=key)
+    db.add(legacy)
+    db.commit()
+    assert legacy.page_content == melee
+    db.close()
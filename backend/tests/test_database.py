@@ -0,0 +1,19 @@
+from database import async_database_url, pool_options
+
+
+def test_async_database_url_picks_async_drivers():
+    assert async_database_url("postgresql://u:p@db:5432/osrs").drivername == "postgresql+asyncpg"
+    assert async_database_url("postgresql+psycopg2://u:p@db/osrs").drivername == "postgresql+asyncpg"
+    assert async_database_url("sqlite://").drivername == "sqlite+aiosqlite"
+
+
+def test_async_database_url_translates_sslmode():
+    url = async_database_url("postgresql://u:p@db/osrs?sslmode=require")
+    assert dict(url.query) == {"ssl": "require"}
+
+
+def test_pool_options_only_for_server_databases():
+    assert pool_options("sqlite://") == {}
+    options = pool_options("postgresql://u:p@db/osrs")
+    assert options["pool_pre_ping"] is True
+    assert options["pool_size"] > 0
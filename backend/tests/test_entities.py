@@ -0,0 +1,46 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from entities import entity_skills, extract_entities, normalize_entity, summary_entities
+from models import Entity, Skill
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+
+def test_normalize_entity_folds_case_punctuation_and_plurals():
+    assert normalize_entity("Sand Crabs") == normalize_entity("sand-crab") == "sand crab"
+    assert normalize_entity("Ardougne's Market") == "ardougne market"
+    assert normalize_entity("Moss Giants") == "moss giant"
+
+
+def test_summary_entities_keep_their_level_range():
+    summary = "### Levels 1–20\nKill **Chickens** at **Level 5**.\n### Levels 40–70\nFight **Hill Giants** in **Edgeville Dungeon**."
+    assert [(e["name"], e["min_level"], e["max_level"]) for e in summary_entities(summary)] == [
+        ("chicken", 1, 20), ("hill giant", 40, 70), ("edgeville dungeon", 40, 70),
+    ]
+
+
+def test_entities_are_rebuilt_only_for_changed_rows():
+    db = TestingSessionLocal()
+    attack = Skill(name="Attack", category="p2p", hash="h1", summary="### Levels 40–70\nFight **Hill Giants** in **Edgeville Dungeon**.")
+    prayer = Skill(name="Prayer", category="f2p", hash="h2", summary="### Levels 1–43\nBury **Big bones** from **Edgeville Dungeon**.")
+    db.add_all([attack, prayer])
+    db.flush()
+    extract_entities(db, [attack, prayer])
+    db.commit()
+
+    assert [(r["name"], r["category"], r["min_level"]) for r in entity_skills(db, "edgeville dungeon")] == [
+        ("Attack", "p2p", 40), ("Prayer", "f2p", 1),
+    ]
+
+    attack.summary = "### Levels 40–70\nFight **Moss Giants** in **Varrock Sewers**."
+    extract_entities(db, [attack])
+    db.commit()
+    assert [r["name"] for r in entity_skills(db, "Edgeville-Dungeon")] == ["Prayer"]
+    assert entity_skills(db, "moss giant")[0]["label"] == "Moss Giants"
+    assert db.query(Entity).filter(Entity.skill_id == prayer.id).count() == 2
+    db.close()
@@ -0,0 +1,85 @@
+from guide_text import chunk_guide, clean_page, html_to_text, level_method, split_sections
+
+
+def test_html_to_text_keeps_structure_compactly():
+    """Headings, list items and table rows survive; edit links and markup do not."""
+    html = (
+        '<div class="mw-parser-output"><p>Train <b>Agility</b> here.</p>'
+        '<h2>Levels 1–20<span class="mw-editsection">[edit]</span></h2>'
+        "<ul><li>Draynor rooftop</li></ul>"
+        "<table><tr><th>Course</th><td>Draynor</td></tr></table></div>"
+    )
+
+    assert html_to_text(html) == (
+        "Train Agility here.\n"
+        "## Levels 1–20\n"
+        "- Draynor rooftop\n"
+        "Course | Draynor"
+    )
+
+
+def test_split_sections_reads_level_ranges():
+    """Each "Levels X–Y" heading starts a section with its parsed range."""
+    text = "Intro\n## Levels 1–20: Chickens\nA\n### Levels 30 to 50: Crabs\nB\n### Notes\nC"
+
+    sections = split_sections(text)
+
+    assert [s.levels for s in sections] == [None, (1, 20), (30, 50)]
+    assert sections[2].text.endswith("### Notes\nC")
+
+
+def test_chunk_guide_orders_by_level_and_respects_size():
+    """Chunks come out in level order, never exceed the budget and cover all text."""
+    text = "\n".join([
+        "Intro",
+        "## Levels 50–99: Late",
+        "late " * 30,
+        "## Levels 1–50: Early",
+        "early " * 30,
+    ])
+
+    chunks = chunk_guide(text, max_chars=200)
+
+    starts = [c.levels[0] if c.levels else 0 for c in chunks]
+    assert starts == sorted(starts)
+    assert chunks[0].text.startswith("Intro")
+    assert all(len(c.text) <= 200 for c in chunks)
+    assert "late" in chunks[-1].text
+
+
+def test_chunk_guide_keeps_every_word_of_an_over_long_line():
+    """A single line longer than the budget is cut into chunks instead of being truncated."""
+    row = " | ".join(f"cell{i}" for i in range(120))
+    words = ["## Levels 1–99: Table", "short line", row, "tail line"]
+    chunks = chunk_guide("\n".join(words), max_chars=100)
+
+    assert all(len(c.text) <= 100 for c in chunks)
+    joined = " ".join(c.text for c in chunks).split()
+    assert joined.count("cell119") == 1
+    assert [w for w in joined if w.startswith("cell")] == [f"cell{i}" for i in range(120)]
+    assert "tail" in joined
+
+
+def test_clean_page_strips_wiki_chrome_in_one_pass():
+    """Navboxes, footnotes and the TOC are removed from both the HTML and the text."""
+    html = (
+        '<div class="mw-parser-output">'
+        '<div id="toc" class="toc"><ul><li>1 Levels 1–20</li></ul></div>'
+        '<p>Mine ore<sup class="reference">[1]</sup></p>'
+        '<table class="navbox"><tr><td>Skills</td></tr></table>'
+        '<ol class="references"><li>Footnote</li></ol></div>'
+    )
+
+    page = clean_page(html)
+
+    assert page.html == '<div class="mw-parser-output"><p>Mine ore</p></div>'
+    assert page.text == "Mine ore"
+    assert page.redirect is None
+    assert clean_page('<div class="redirectMsg"><a>Target_Page</a></div>').redirect == "Target_Page"
+
+
+def test_level_method_names_the_training_method():
+    assert level_method("1.2 Levels 20–47: Brimhaven Agility Arena") == "Brimhaven Agility Arena"
+    assert level_method("Levels 1–32/36: Questing[edit|edit source]") == "Questing"
+    assert level_method("Level 1–20", "Kill **Chickens** in Lumbridge") == "Chickens"
+    assert level_method("Levels 30 to 50+") is None
@@ -0,0 +1,86 @@
+import threading
+
+from jobs import JobQueue, JobSkipped
+
+
+def test_job_records_progress_and_timings():
+    """Progress reported by the pipeline ends up on the job, with failures listed."""
+    queue = JobQueue()
+
+    def run(record):
+        record("fetch", "Attack (f2p)", "updated", seconds=0.25)
+        record("summarize", "Attack (f2p)", "summarized", seconds=1.5)
+        record("fetch", "Mining (p2p)", "failed", error="timeout")
+
+    job, created = queue.submit("refresh", run)
+    assert created
+    assert job.wait(5)
+
+    data = job.to_dict()
+    assert data["status"] == "succeeded"
+    assert data["duration_seconds"] is not None
+    assert data["progress"]["Attack (f2p)"]["summarize"] == {"status": "summarized", "seconds": 1.5, "error": None}
+    assert data["failed_items"] == ["Mining (p2p)"]
+
+
+def test_duplicate_submissions_are_coalesced():
+    """A second submit while a job of the same kind is active returns that job."""
+    queue = JobQueue()
+    release = threading.Event()
+    calls = []
+
+    def run(record):
+        calls.append(1)
+        release.wait(5)
+
+    first, created = queue.submit("refresh", run)
+    second, created_again = queue.submit("refresh", run)
+    release.set()
+    assert first.wait(5)
+
+    assert created and not created_again
+    assert second is first
+    assert calls == [1]
+
+    third, created = queue.submit("refresh", run)
+    assert created and third is not first
+    assert third.wait(5)
+
+
+def test_forced_submission_is_not_coalesced_into_a_normal_job():
+    """force queues its own job behind a normal one; a normal submit joins a forced job."""
+    queue = JobQueue()
+    release = threading.Event()
+
+    def run(record):
+        release.wait(5)
+
+    normal, _ = queue.submit("refresh", run, {"force": False})
+    forced, created = queue.submit("refresh", run, {"force": True})
+    assert created and forced is not normal
+    assert forced.to_dict()["options"] == {"force": True}
+
+    joined, created = queue.submit("refresh", run, {"force": False})
+    assert not created and joined in (normal, forced)
+    release.set()
+    assert normal.wait(5) and forced.wait(5)
+    assert queue.submit("refresh", run, {"force": True})[0].wait(5)
+
+
+def test_failed_and_skipped_jobs():
+    queue = JobQueue()
+
+    def broken(record):
+        raise RuntimeError("wiki down")
+
+    def skipped(record):
+        raise JobSkipped("locked")
+
+    failed, _ = queue.submit("a", broken)
+    skip, _ = queue.submit("b", skipped)
+    assert failed.wait(5) and skip.wait(5)
+
+    assert (failed.status, failed.error) == ("failed", "wiki down")
+    assert skip.status == "skipped"
+    assert queue.get(failed.id) is failed
+    assert queue.get("missing") is None
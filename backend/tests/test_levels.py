@@ -0,0 +1,59 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from levels import extract_pages, extract_summaries, level_sections, recommend
+from models import LevelRange, PageBlob, Skill, WikiPage
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+GUIDE = """## Overview
+General advice.
+## 1.1 Levels 1–20: Gnome Stronghold Agility Course[edit|edit source]
+Start at the gnome course.
+## 1.2 Levels 20–47: Brimhaven Agility Arena
+Tag the ticket dispensers.
+## 1.3 Levels 40–60: Wilderness Agility Course
+Dangerous but fast."""
+
+
+def test_level_sections_parse_ranges_and_methods():
+    sections = level_sections(GUIDE)
+    assert [(s["min_level"], s["max_level"], s["method"]) for s in sections] == [
+        (1, 20, "Gnome Stronghold Agility Course"),
+        (20, 47, "Brimhaven Agility Arena"),
+        (40, 60, "Wilderness Agility Course"),
+    ]
+    assert "ticket dispensers" in sections[1]["text"]
+    assert level_sections("No ranges here") == []
+
+
+def test_recommend_answers_with_a_range_lookup():
+    db = TestingSessionLocal()
+    blob = PageBlob.from_text("<p>agility</p>")
+    page = WikiPage(title="Agility_training", text=GUIDE, blob=blob)
+    skill = Skill(name="Agility", category="p2p", page=page, hash=blob.hash,
+                  summary="### Levels 40–50\nUse the **Wilderness Agility Course**.")
+    db.add_all([page, skill])
+    db.flush()
+    extract_pages(db, [page.id])
+    extract_summaries(db, [skill])
+    db.commit()
+
+    results = recommend(db, "Agility", 45)
+    assert [(r["source"], r["min_level"], r["max_level"]) for r in results] == [
+        ("summary", 40, 50), ("guide", 40, 60), ("guide", 20, 47),
+    ]
+    assert all(r["category"] == "p2p" for r in results)
+    assert recommend(db, "Agility", 99) == []
+    assert recommend(db, "Agility", 10, category="f2p") is None
+    assert recommend(db, "Sailing", 10) is None
+
+    # Re-extracting a page replaces its rows instead of adding to them
+    extract_pages(db, [page.id])
+    db.commit()
+    assert db.query(LevelRange).filter(LevelRange.kind == "guide").count() == 3
+    db.close()
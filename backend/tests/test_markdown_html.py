@@ -0,0 +1,39 @@
+from markdown_html import render_markdown
+
+
+def test_renders_summary_markdown():
+    html = render_markdown(
+        "### Level 1–20\n"
+        "Train on **chickens**, then *cows*.\n"
+        "\n"
+        "- Wield a `bronze sword`\n"
+        "  - Buy it in [Varrock](https://oldschool.runescape.wiki/w/Varrock)\n"
+        "- Bank the bones\n"
+    )
+    assert html == (
+        "<h3>Level 1–20</h3>"
+        "<p>Train on <strong>chickens</strong>, then <em>cows</em>.</p>"
+        "<ul><li>Wield a <code>bronze sword</code>"
+        '<ul><li>Buy it in <a href="https://oldschool.runescape.wiki/w/Varrock" rel="noopener noreferrer">Varrock</a></li></ul>'
+        "</li><li>Bank the bones</li></ul>"
+    )
+
+
+def test_renders_tables():
+    html = render_markdown("| Level | Method |\n|---|:---:|\n| 1 | Cows |\n| 20 | Hill Giants |")
+    assert html == (
+        "<table><thead><tr><th>Level</th><th>Method</th></tr></thead>"
+        "<tbody><tr><td>1</td><td>Cows</td></tr><tr><td>20</td><td>Hill Giants</td></tr></tbody></table>"
+    )
+
+
+def test_escapes_raw_html_and_unsafe_links():
+    html = render_markdown('<img src=x onerror="alert(1)">\n\n[click](javascript:alert) `<b>`')
+    assert "<img" not in html and "&lt;img" in html
+    assert "javascript:" not in html
+    assert "href" not in html
+    assert "<code>&lt;b&gt;</code>" in html
+
+
+def test_no_summary():
+    assert render_markdown(None) is None
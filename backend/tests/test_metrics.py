@@ -0,0 +1,113 @@
+import asyncio
+
+from sqlalchemy import create_engine, text
+
+import metrics
+from metrics import Counter, Histogram, RequestProfiler, RequestStats, Registry, current_request, instrument_engine
+from summarize_skills import completion_cost, record_usage
+
+
+def test_render_counters_and_histograms():
+    """Label values are escaped and histogram buckets are cumulative, ending at +Inf."""
+    registry = Registry()
+    hits = registry.register(Counter("hits_total", "Hits", ("path",)))
+    latency = registry.register(Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0)))
+    hits.inc(path='/a"b')
+    hits.inc(2, path='/a"b')
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE hits_total counter" in lines
+    assert 'hits_total{path="/a\\"b"} 3' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert "latency_seconds_count 2" in lines
+    assert registry.register(Counter("hits_total", "Again")) is hits
+
+
+def test_queries_are_counted_per_request():
+    """Queries run while a request's stats are current are added to them."""
+    engine = create_engine("sqlite://")
+    instrument_engine(engine, "test")
+    stats = RequestStats()
+    token = current_request.set(stats)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+    finally:
+        current_request.reset(token)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 3"))
+
+    assert stats.queries == 2
+    assert stats.db_seconds > 0
+    assert metrics.DB_QUERY_SECONDS.count(engine="test") == 3
+
+
+def test_slow_requests_keep_their_profile(monkeypatch):
+    """Requests over the threshold are kept with the profile taken while they ran."""
+    monkeypatch.setattr(metrics, "SLOW_REQUEST_MS", 10)
+    monkeypatch.setattr(metrics, "slow_requests", metrics.deque(maxlen=2))
+    profiler = RequestProfiler(enabled=True)
+    assert RequestProfiler(enabled=True).profile is None  # one profile at a time
+
+    async def handler():
+        return sorted(range(1000))
+
+    async def run():
+        return await profiler.run(handler())
+
+    asyncio.run(run())
+    profile = profiler.finish()
+
+    metrics.record_slow_request("GET", "/fast", 200, 0.005, RequestStats(), None)
+    metrics.record_slow_request("GET", "/skills", 200, 0.25, RequestStats(queries=3), profile)
+    assert [entry["path"] for entry in metrics.slow_requests] == ["/skills"]
+    assert metrics.slow_requests[0]["db_queries"] == 3
+    assert "cumulative" in metrics.slow_requests[0]["profile"]
+
+
+def test_profile_leaves_out_other_requests_on_the_loop():
+    """Only the profiled request's own steps are counted, not coroutines interleaved with it."""
+    def own_work():
+        return sum(range(1000))
+
+    def other_work():
+        return sum(range(1000))
+
+    async def request(work):
+        for _ in range(5):
+            work()
+            await asyncio.sleep(0)
+
+    profiler = RequestProfiler(enabled=True)
+
+    async def run():
+        await asyncio.gather(profiler.run(request(own_work)), request(other_work))
+
+    asyncio.run(run())
+    profile = profiler.finish()
+    assert "own_work" in profile
+    assert "other_work" not in profile
+    next_request = RequestProfiler(enabled=True)
+    assert next_request.profile is not None  # the lock was released
+    assert next_request.finish() is None  # it never ran a step
+
+
+def test_summary_usage_and_cost():
+    """Token usage from each completion adds up to a summary's cost."""
+    class Usage:
+        prompt_tokens = 1_000_000
+        completion_tokens = 500_000
+
+    class Response:
+        usage = Usage()
+
+    usage = {}
+    record_usage(Response(), usage)
+    record_usage(object(), usage)  # fakes without usage are skipped
+    assert usage == {"prompt_tokens": 1_000_000, "completion_tokens": 500_000}
+    assert completion_cost(**usage) == 0.25 + 1.0
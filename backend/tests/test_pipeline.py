@@ -0,0 +1,169 @@
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+from unittest.mock import MagicMock
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import pipeline
+import skill_fetcher
+import summarize_skills
+from database import Base
+from models import DatasetVersion, Skill, WikiPage
+from pipeline import Stage, run_stages
+from summarize_skills import SummaryPool
+
+# A file, not one shared connection: summaries are written from worker threads in sessions of their own
+DB_PATH = os.path.join(tempfile.mkdtemp(), "pipeline.db")
+engine = create_engine(f"sqlite:///{DB_PATH}", connect_args={"check_same_thread": False})
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+
+def test_stages_overlap_and_apply_backpressure():
+    """Each item moves on as soon as a stage is done with it; queues never grow past their bound."""
+    seen = []
+
+    def sleeper(delay, record=False):
+        async def handle(item):
+            await asyncio.sleep(delay)
+            if record:
+                seen.append(item)
+            return [item]
+        return handle
+
+    stages = [
+        Stage("fetch", sleeper(0.01), workers=4, queue_size=2),
+        Stage("summarize", sleeper(0.02), workers=2, queue_size=2),
+        Stage("export", sleeper(0.0, record=True), workers=1, queue_size=2),
+    ]
+    started = time.perf_counter()
+    stats = asyncio.run(run_stages(range(20), stages))
+    elapsed = time.perf_counter() - started
+
+    assert sorted(seen) == list(range(20))
+    assert all(stage["peak_queue"] <= 2 for stage in stats.values())
+    # Serial batches would take 20 * 0.01 / 4 + 20 * 0.02 / 2 = 0.25s; streamed, the slowest stage dominates
+    assert elapsed < 0.25
+    assert stats["summarize"]["processed"] == 20
+
+
+def test_failing_item_does_not_stop_the_stream():
+    async def handle(item):
+        if item == 2:
+            raise ValueError("bad page")
+        return [item]
+
+    out = []
+
+    async def collect(item):
+        out.append(item)
+
+    stats = asyncio.run(run_stages(range(5), [Stage("clean", handle), Stage("export", collect)]))
+
+    assert sorted(out) == [0, 1, 3, 4]
+    assert stats["clean"]["failed"] == 1
+
+
+def test_stream_refresh_fetches_summarizes_and_exports(monkeypatch, tmp_path):
+    """One pass stores changed pages, summarizes their rows, exports them and publishes once."""
+    parsed = []
+
+    def handler(request):
+        params = request.url.params
+        if params["action"] == "query":
+            titles = params["titles"].split("|")
+            return httpx.Response(200, json={"query": {"pages": [
+                {"title": title, "revisions": [{"revid": 7, "timestamp": "t"}]} for title in titles
+            ]}})
+        parsed.append(params["page"])
+        if params["page"] == "Old_melee_page":
+            return httpx.Response(200, json={"parse": {"text": {"*": '<div class="redirectMsg"><a>Melee_page</a></div>'}}})
+        return httpx.Response(200, json={"parse": {"text": {"*": f"<p>Guide for {params['page']}</p>"}}})
+
+    class Completions:
+        async def create(self, model, messages):
+            guide = messages[0]["content"].strip().splitlines()[-1].strip()
+            return MagicMock(choices=[MagicMock(message=MagicMock(content=f"### Level 1–99\nSummary of {guide}"))])
+
+    monkeypatch.setattr(pipeline, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(summarize_skills, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(skill_fetcher, "SKILLS", {
+        "Attack": {"f2p": "Old_melee_page"},
+        "Strength": {"f2p": "Old_melee_page"},
+        "Mining": {"p2p": "Mining_page"},
+    })
+    monkeypatch.chdir(tmp_path)
+    client = skill_fetcher.WikiClient(transport=httpx.MockTransport(handler), requests_per_second=0, backoff_base=0)
+    pool = SummaryPool(client=MagicMock(chat=MagicMock(completions=Completions())), requests_per_minute=0, tokens_per_minute=0)
+    progress = []
+
+    stats = asyncio.run(pipeline.stream_refresh(
+        progress=lambda *args, **kwargs: progress.append(args), export=True, client=client, pool=pool,
+    ))
+
+    db = TestingSessionLocal()
+    skills = {skill.name: skill for skill in db.query(Skill)}
+    assert db.query(WikiPage).count() == 2
+    assert skills["Attack"].page_id == skills["Strength"].page_id
+    assert skills["Attack"].summary == "### Level 1–99\nSummary of Guide for Melee_page"
+    assert skills["Mining"].summary_html == "<h3>Level 1–99</h3><p>Summary of Guide for Mining_page</p>"
+    assert db.get(DatasetVersion, 1) is not None
+    db.close()
+
+    assert stats["fetch"]["processed"] == 2
+    assert stats["summarize"]["processed"] == 2
+    assert ("export", "Mining (p2p)", "exported") in progress
+    assert (tmp_path / "ai_summary" / "Strength_f2p.txt").read_text(encoding="utf-8").endswith("Guide for Melee_page")
+    assert (tmp_path / "output" / "mining_p2p.txt").exists()
+
+    assert sorted(parsed) == ["Melee_page", "Mining_page", "Old_melee_page"]
+
+    # Nothing moved: no page is parsed again and no summary is redone
+    progress.clear()
+    asyncio.run(pipeline.stream_refresh(progress=lambda *args, **kwargs: progress.append(args), client=client, pool=pool))
+    assert len(parsed) == 3
+    assert {status for stage, _, status in progress if stage == "summarize"} == {"unchanged"}
+
+
+def test_stream_refresh_failure_rolls_back_only_its_own_group(monkeypatch):
+    """Stages write in sessions of their own: a group whose write fails leaves the others committed."""
+
+    def handler(request):
+        params = request.url.params
+        if params["action"] == "query":
+            return httpx.Response(200, json={"query": {"pages": [
+                {"title": title, "revisions": [{"revid": 3, "timestamp": "t"}]} for title in params["titles"].split("|")
+            ]}})
+        return httpx.Response(200, json={"parse": {"text": {"*": f"<p>Guide for {params['page']}</p>"}}})
+
+    class Completions:
+        async def create(self, model, messages):
+            return MagicMock(choices=[MagicMock(message=MagicMock(content="### Level 1–99\nFish and cook."))])
+
+    extract_entities = summarize_skills.extract_entities
+
+    def failing_extract(db, skills):
+        if any(skill.name == "Fishing" for skill in skills):
+            raise RuntimeError("entity table locked")
+        return extract_entities(db, skills)
+
+    monkeypatch.setattr(pipeline, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(summarize_skills, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(summarize_skills, "extract_entities", failing_extract)
+    monkeypatch.setattr(skill_fetcher, "SKILLS", {"Fishing": {"p2p": "Fishing_page"}, "Cooking": {"p2p": "Cooking_page"}})
+    client = skill_fetcher.WikiClient(transport=httpx.MockTransport(handler), requests_per_second=0, backoff_base=0)
+    pool = SummaryPool(client=MagicMock(chat=MagicMock(completions=Completions())), requests_per_minute=0, tokens_per_minute=0)
+
+    stats = asyncio.run(pipeline.stream_refresh(client=client, pool=pool, export=False))
+
+    db = TestingSessionLocal()
+    skills = {skill.name: skill for skill in db.query(Skill).filter(Skill.name.in_(["Fishing", "Cooking"]))}
+    assert skills["Cooking"].summary == "### Level 1–99\nFish and cook."
+    assert skills["Fishing"].summary is None
+    assert skills["Fishing"].page.text == "Guide for Fishing_page"
+    db.close()
+    assert stats["store"]["processed"] == 2
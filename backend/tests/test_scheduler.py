@@ -0,0 +1,56 @@
+import asyncio
+
+import pipeline
+from jobs import JobQueue
+from pipeline import refresh_lock
+from scheduler import RefreshScheduler
+
+
+def make_scheduler(monkeypatch, store):
+    """Scheduler whose jobs run the real pipeline wrapper around a stubbed streaming run."""
+    async def stream(force_summaries=False, progress=None):
+        store(progress=progress)
+
+    monkeypatch.setattr(pipeline, "stream_refresh", stream)
+    queue = JobQueue()
+    submit = lambda: queue.submit("refresh", lambda record: pipeline.run_refresh(False, record))
+    return RefreshScheduler(submit=submit, interval=0, run_on_startup=False), queue
+
+
+def test_run_once_records_status(monkeypatch):
+    """A background run updates the status exposed by /refresh/status."""
+    calls = []
+    scheduler, queue = make_scheduler(monkeypatch, lambda progress=None: calls.append(1))
+
+    asyncio.run(scheduler.run_once())
+
+    assert calls == [1]
+    assert scheduler.status["state"] == "idle"
+    assert scheduler.status["last_result"] == "ok"
+    assert scheduler.status["last_duration_seconds"] is not None
+    assert queue.get(scheduler.status["last_job"]).status == "succeeded"
+
+
+def test_run_once_skips_while_lock_is_held(monkeypatch):
+    """Only one refresh runs at a time; others are skipped, not queued."""
+    calls = []
+    scheduler, _ = make_scheduler(monkeypatch, lambda progress=None: calls.append(1))
+
+    with refresh_lock() as acquired:
+        assert acquired
+        asyncio.run(scheduler.run_once())
+
+    assert calls == []
+    assert scheduler.status["last_result"] == "skipped"
+
+
+def test_failed_refresh_is_reported(monkeypatch):
+    """Errors are kept in the status instead of killing the scheduler."""
+    def broken(progress=None):
+        raise RuntimeError("wiki down")
+
+    scheduler, _ = make_scheduler(monkeypatch, broken)
+    asyncio.run(scheduler.run_once())
+
+    assert scheduler.status["last_result"] == "failed"
+    assert scheduler.status["last_error"] == "wiki down"
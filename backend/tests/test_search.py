@@ -0,0 +1,74 @@
+from collections import namedtuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from database import Base
+from models import PageBlob, SearchSection, Skill, WikiPage
+from search import SearchIndex, index_pages, index_summaries, snippet, tokenize
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+GUIDE = """## Overview
+Melee training for free players.
+### Levels 1–20: Chickens
+Kill chickens in Lumbridge.
+### Levels 20–40: Cows
+Fight cows east of Lumbridge, then move on to Sand Crabs on Crandor.
+### Levels 40–99: Hill Giants
+Hill Giants in the Edgeville Dungeon."""
+
+
+def test_tokenize_and_snippet():
+    assert tokenize("The Sand Crabs of Crandor") == ["sand", "crab", "crandor"]
+    assert snippet("Fight cows east of Lumbridge.", {"lumbridge"}) == "Fight cows east of **Lumbridge**."
+
+
+def test_sections_are_indexed_incrementally_and_ranked():
+    db = TestingSessionLocal()
+    blob = PageBlob.from_text("<p>melee</p>")
+    page = WikiPage(title="Free-to-play_melee_training", text=GUIDE, blob=blob)
+    attack = Skill(name="Attack", category="f2p", page=page, hash=blob.hash, summary="### Level 1–20\nTrain on **Chickens** near Lumbridge.")
+    db.add_all([page, attack])
+    db.flush()
+    index_pages(db, [page.id])
+    index_summaries(db, [attack])
+    db.commit()
+
+    index = SearchIndex()
+    hits = index.search(db, "v1", "lumbridge", 10)
+    assert {hit["kind"] for hit in hits} == {"guide", "summary"}
+    assert all("**Lumbridge**" in hit["snippet"] for hit in hits)
+
+    hits = index.search(db, "v1", "sand crabs", 10)
+    assert [hit["heading"] for hit in hits] == ["Levels 20–40: Cows"]
+    assert index.search(db, "v1", "sand dragons", 10) == []
+
+    # A changed summary replaces only that row's sections; the new version rebuilds the index
+    attack.summary = "### Level 1–20\nTrain on **Goblins**."
+    index_summaries(db, [attack])
+    db.commit()
+    assert db.query(SearchSection).filter(SearchSection.kind == "summary").count() == 1
+    assert index.search(db, "v1", "goblins", 10) == []
+    assert [hit["kind"] for hit in index.search(db, "v2", "goblins", 10)] == ["summary"]
+    db.close()
+
+
+def test_index_from_rows_exports_sections_in_id_order():
+    """from_rows builds without a database; export hands back what a pack needs."""
+    Row = namedtuple("Row", "id kind page_id skill_id heading body")
+    index = SearchIndex.from_rows([
+        Row(2, "guide", 1, None, "Levels 20–40", "Fight cows near Lumbridge cows"),
+        Row(1, "summary", None, 5, "Level 1–20", "Chickens in Lumbridge"),
+    ], "v1")
+
+    exported = index.export()
+    assert exported["version"] == "v1"
+    assert [section.id for section in exported["sections"]] == [1, 2]
+    assert exported["postings"]["cow"] == {2: 2}
+    assert exported["postings"]["lumbridge"] == {1: 1, 2: 1}
+    assert exported["average_length"] == sum(exported["lengths"].values()) / 2
+    assert [hit["heading"] for hit in index.ranked("cows", 5)] == ["Levels 20–40"]
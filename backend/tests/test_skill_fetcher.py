@@ -1,12 +1,15 @@
+import asyncio
+import json
+
+import httpx
 import pytest
 from unittest.mock import patch, MagicMock
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
-from bs4 import BeautifulSoup
 
 from database import Base, get_db
-from models import Skill
+from models import PageBlob, Skill, WikiPage
 import skill_fetcher
 
 
@@ -35,59 +38,92 @@ Base.metadata.create_all(bind=engine)
 
 # -------------------- TESTS -------------------- #
 
-def test_fetch_html_content_basic(monkeypatch):
-    """Ensure fetch_html_content returns cleaned HTML."""
-    mock_response = MagicMock()
-    mock_response.json.return_value = {
-        "parse": {"text": {"*": "<div><p>Test HTML</p></div>"}}
-    }
+def make_client(handler):
+    """WikiClient backed by an in-process stub of the MediaWiki API."""
+    return skill_fetcher.WikiClient(
+        transport=httpx.MockTransport(handler), requests_per_second=0, backoff_base=0
+    )
 
-    monkeypatch.setattr(skill_fetcher.requests, "get", lambda *a, **k: mock_response)
 
-    html = skill_fetcher.fetch_html_content("Test_Page")
-    assert "<p>Test HTML</p>" in html
-    assert isinstance(html, str)
+def parse_response(html):
+    return httpx.Response(200, json={"parse": {"text": {"*": html}}})
 
 
-def test_fetch_html_content_redirect(monkeypatch):
-    """Ensure redirect is followed recursively."""
-    def mock_get(url, params):
-        if params["page"] == "Redirect_Page":
-            return MagicMock(json=lambda: {
-                "parse": {"text": {"*": '<div class="redirectMsg"><a>Target_Page</a></div>'}}
-            })
-        else:
-            return MagicMock(json=lambda: {
-                "parse": {"text": {"*": "<p>Target Content</p>"}}
-            })
+async def mock_fetch_revisions(client, titles):
+    """Every page at revision 1."""
+    return {title: 1 for title in titles}
+
 
-    monkeypatch.setattr(skill_fetcher.requests, "get", mock_get)
+def test_fetch_html_content_basic():
+    """Ensure fetch_html_content returns cleaned HTML."""
+    client = make_client(lambda request: parse_response("<div><p>Test HTML</p></div>"))
 
-    html = skill_fetcher.fetch_html_content("Redirect_Page")
-    assert "Target Content" in html
+    page = asyncio.run(skill_fetcher.fetch_html_content(client, "Test_Page"))
+    assert "<p>Test HTML</p>" in page.html
+    assert page.text == "Test HTML"
+
+
+def test_fetch_html_content_redirect():
+    """Ensure redirect is followed recursively."""
+    def handler(request):
+        if request.url.params["page"] == "Redirect_Page":
+            return parse_response('<div class="redirectMsg"><a>Target_Page</a></div>')
+        return parse_response("<p>Target Content</p>")
+
+    page = asyncio.run(skill_fetcher.fetch_html_content(make_client(handler), "Redirect_Page"))
+    assert "Target Content" in page.html
 
 
 def test_fetch_with_fallback(monkeypatch):
     """Ensure fallback triggers when an error is raised."""
-    def mock_fetch_html_content(page_title, _depth=0):
+    async def mock_fetch_html_content(client, page_title, _depth=0):
         if page_title == "Bad_Page":
             raise Exception("missingtitle")
-        return "<p>Good content</p>"
+        return skill_fetcher.clean_page("<p>Good content</p>")
 
     monkeypatch.setattr(skill_fetcher, "fetch_html_content", mock_fetch_html_content)
 
-    result = skill_fetcher.fetch_with_fallback("Attack", "f2p", "Bad_Page")
-    assert "Good content" in result
+    title, result = asyncio.run(skill_fetcher.fetch_with_fallback(None, "Attack", "f2p", "Bad_Page"))
+    assert title == "Attack_training"
+    assert "Good content" in result.html
+
+
+def test_fetch_all_runs_pages_concurrently():
+    """Pages are fetched in parallel over one client, not one after another."""
+    in_flight = 0
+    peak = 0
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return parse_response(f"<p>{request.url.params['page']}</p>")
+
+    skills = {f"Skill{i}": {"p2p": f"Page_{i}"} for i in range(6)}
+    client = skill_fetcher.WikiClient(
+        transport=httpx.MockTransport(handler), concurrency=3, requests_per_second=0
+    )
+    results = asyncio.run(skill_fetcher.fetch_all(skills, client))
+
+    assert peak == 3
+    assert results["Page_5"][1].text == "Page_5"
 
 
 def test_store_skills_inserts(monkeypatch):
     """Test that store_skills adds new skills into the database."""
     # Mock the HTML fetcher to return dummy content
-    monkeypatch.setattr(skill_fetcher, "fetch_with_fallback", lambda s, m, p: "<p>Dummy content</p>")
+    async def mock_fetch_with_fallback(client, s, m, p):
+        return p, skill_fetcher.clean_page("<p>Dummy content</p>")
+
+    monkeypatch.setattr(skill_fetcher, "fetch_with_fallback", mock_fetch_with_fallback)
+    monkeypatch.setattr(skill_fetcher, "fetch_revisions", mock_fetch_revisions)
 
     # Clear any existing records
     db = TestingSessionLocal()
     db.query(Skill).delete()
+    db.query(WikiPage).delete()
     db.commit()
     db.close()
 
@@ -97,9 +133,222 @@ def test_store_skills_inserts(monkeypatch):
 
     db = TestingSessionLocal()
     skills = db.query(Skill).all()
-    db.close()
 
     assert len(skills) == 1
     assert skills[0].name == "Attack"
     assert skills[0].category == "f2p"
-    assert "Dummy content" in skills[0].content
+    assert "Dummy content" in skills[0].page.content
+    assert skills[0].page.text == "Dummy content"
+    db.close()
+
+
+def test_store_skills_fetches_shared_pages_once(monkeypatch):
+    """Skills sharing a wiki page trigger one fetch and reference one stored page."""
+    fetched = []
+
+    async def mock_fetch_with_fallback(client, s, m, p):
+        fetched.append(p)
+        return p, skill_fetcher.clean_page(f"<p>{p}</p>")
+
+    monkeypatch.setattr(skill_fetcher, "fetch_with_fallback", mock_fetch_with_fallback)
+    monkeypatch.setattr(skill_fetcher, "fetch_revisions", mock_fetch_revisions)
+
+    db = TestingSessionLocal()
+    db.query(Skill).delete()
+    db.query(WikiPage).delete()
+    db.commit()
+    db.close()
+
+    skill_fetcher.SKILLS = {
+        "Attack": {"f2p": "Free-to-play_melee_training"},
+        "Strength": {"f2p": "Free-to-play_melee_training"},
+        "Mining": {"f2p": "Free-to-play_Mining_training"},
+    }
+    skill_fetcher.store_skills()
+
+    db = TestingSessionLocal()
+    pages = db.query(WikiPage).all()
+    skills = {s.name: s for s in db.query(Skill).all()}
+    blobs = db.query(PageBlob).count()
+    db.close()
+
+    assert sorted(fetched) == ["Free-to-play_Mining_training", "Free-to-play_melee_training"]
+    assert len(pages) == 2
+    assert skills["Attack"].page_id == skills["Strength"].page_id != skills["Mining"].page_id
+    assert blobs == 2
+
+
+def test_fetch_revisions_resolves_batch():
+    """One query returns revisions mapped back through normalisation and redirects."""
+    requests_seen = []
+
+    def handler(request):
+        requests_seen.append(request)
+        return httpx.Response(200, json={"query": {
+            "normalized": [{"from": "Agility_training", "to": "Agility training"}],
+            "redirects": [{"from": "Old title", "to": "New title"}],
+            "pages": [
+                {"title": "Agility training", "revisions": [{"revid": 11, "timestamp": "t"}]},
+                {"title": "New title", "revisions": [{"revid": 22, "timestamp": "t"}]},
+                {"title": "Gone", "missing": True},
+            ],
+        }})
+
+    revisions = asyncio.run(skill_fetcher.fetch_revisions(
+        make_client(handler), ["Agility_training", "Old title", "Gone"]
+    ))
+
+    assert len(requests_seen) == 1
+    assert requests_seen[0].url.params["titles"] == "Agility_training|Old title|Gone"
+    assert revisions == {"Agility_training": 11, "Old title": 22, "Gone": None}
+
+
+def test_store_skills_skips_unchanged_revisions(monkeypatch):
+    """A refresh where no revision moved fetches and parses nothing."""
+    fetched = []
+
+    async def mock_fetch_with_fallback(client, s, m, p):
+        fetched.append(p)
+        return p, skill_fetcher.clean_page("<p>Mining</p>")
+
+    monkeypatch.setattr(skill_fetcher, "fetch_with_fallback", mock_fetch_with_fallback)
+    monkeypatch.setattr(skill_fetcher, "fetch_revisions", mock_fetch_revisions)
+
+    skill_fetcher.SKILLS = {"Mining": {"f2p": "Free-to-play_Mining_training"}}
+    skill_fetcher.store_skills()
+    fetched.clear()
+    skill_fetcher.store_skills()
+
+    assert fetched == []
+    db = TestingSessionLocal()
+    page = db.query(WikiPage).filter(WikiPage.title == "Free-to-play_Mining_training").one()
+    assert page.revision_id == 1
+    db.close()
+
+
+def test_store_skills_reports_progress(monkeypatch):
+    """Each skill row reports its fetch outcome and timing to the progress callback."""
+    async def mock_fetch_with_fallback(client, s, m, p):
+        if s == "Fishing":
+            raise RuntimeError("timeout")
+        return p, skill_fetcher.clean_page(f"<p>{s}</p>")
+
+    monkeypatch.setattr(skill_fetcher, "fetch_with_fallback", mock_fetch_with_fallback)
+    monkeypatch.setattr(skill_fetcher, "fetch_revisions", mock_fetch_revisions)
+
+    events = []
+    skill_fetcher.SKILLS = {
+        "Cooking": {"f2p": "Free-to-play_Cooking_training"},
+        "Fishing": {"f2p": "Free-to-play_Fishing_training"},
+    }
+    skill_fetcher.store_skills(progress=lambda stage, item, status, seconds=None, error=None:
+                               events.append((stage, item, status, seconds is not None, error)))
+
+    assert ("fetch", "Cooking (f2p)", "added", True, None) in events
+    assert ("fetch", "Fishing (f2p)", "failed", True, "timeout") in events
+
+
+def test_store_skills_writes_in_one_transaction_and_skips_unchanged_rows(monkeypatch):
+    """Results are upserted in bulk; a refetch with identical content writes nothing."""
+    async def mock_fetch_with_fallback(client, s, m, p):
+        return p, skill_fetcher.clean_page(f"<p>{p}</p>")
+
+    revision = {"value": 1}
+
+    async def moving_revisions(client, titles):
+        return {title: revision["value"] for title in titles}
+
+    monkeypatch.setattr(skill_fetcher, "fetch_with_fallback", mock_fetch_with_fallback)
+    monkeypatch.setattr(skill_fetcher, "fetch_revisions", moving_revisions)
+
+    db = TestingSessionLocal()
+    db.query(Skill).delete()
+    db.query(WikiPage).delete()
+    db.commit()
+    db.close()
+
+    statements, commits = [], []
+
+    def record_statement(conn, cursor, sql, *args):
+        statements.append(sql)
+
+    def record_commit(conn):
+        commits.append(1)
+
+    event.listen(engine, "before_cursor_execute", record_statement)
+    event.listen(engine, "commit", record_commit)
+    try:
+        skill_fetcher.SKILLS = {
+            "Woodcutting": {"f2p": "Woodcutting_training", "p2p": "Woodcutting_training"},
+            "Firemaking": {"f2p": "Firemaking_training"},
+        }
+        skill_fetcher.store_skills()
+        writes = [sql for sql in statements if sql.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE"))]
+        assert commits == [1]
+        assert sum(sql.lstrip().upper().startswith("INSERT INTO SKILLS") for sql in writes) == 1
+
+        # New revision, same content: only the revision bookkeeping is written
+        revision["value"] = 2
+        statements.clear()
+        skill_fetcher.store_skills()
+        writes = [sql for sql in statements if sql.lstrip().upper().startswith(("INSERT", "UPDATE", "DELETE"))]
+        assert len(writes) == 1
+        assert "revision_id" in writes[0] and "content" not in writes[0]
+    finally:
+        event.remove(engine, "before_cursor_execute", record_statement)
+        event.remove(engine, "commit", record_commit)
+
+
+def test_ingest_corpus_loads_local_pages(tmp_path):
+    """The checked-in corpus map (Windows paths, empty and repeated entries) seeds the DB offline."""
+    corpus = tmp_path / "skill_pages"
+    (corpus / "p2p").mkdir(parents=True)
+    (corpus / "p2p" / "Agility_training.txt").write_text("## Levels 1–10\nGnome course", encoding="utf-8")
+    (corpus / "p2p" / "Hitpoints_training.txt").write_text("Hitpoints part one", encoding="utf-8")
+    (corpus / "p2p" / "Extra.txt").write_text("part two", encoding="utf-8")
+    (corpus / "skill_file_map.json").write_text(json.dumps({
+        "Agility": {
+            "p2p": ["skill_pages\\p2p\\Agility_training.txt", "skill_pages\\p2p\\Agility_training.txt"],
+            "f2p": [],
+        },
+        "Runecrafting": {"p2p": ["skill_pages/p2p/Hitpoints_training.txt", "skill_pages\\p2p\\Extra.txt"]},
+    }), encoding="utf-8")
+
+    db = TestingSessionLocal()
+    db.query(Skill).delete()
+    db.query(WikiPage).delete()
+    db.commit()
+    db.close()
+
+    skill_fetcher.SKILLS = {"Agility": {"p2p": "Agility_training"}}
+    skill_fetcher.ingest_corpus(corpus / "skill_file_map.json")
+
+    db = TestingSessionLocal()
+    rows = {(skill.name, skill.category): skill for skill in db.query(Skill)}
+    assert set(rows) == {("Agility", "p2p"), ("Runecraft", "p2p")}
+    agility = rows[("Agility", "p2p")].page
+    assert agility.title == "Agility_training"
+    assert agility.text == "## Levels 1–10\nGnome course"
+    assert agility.hash == skill_fetcher.page_row("x", skill_fetcher.CleanPage(agility.text, agility.text, None))["hash"]
+    assert rows[("Runecraft", "p2p")].page.text == "Hitpoints part one\n\npart two"
+    assert rows[("Runecraft", "p2p")].payload is not None
+    db.close()
+
+
+def test_corpus_pages_keeps_a_skills_own_files_on_a_shared_page(tmp_path, monkeypatch):
+    """Hitpoints shares the melee page in SKILLS but has its own corpus files; both are read."""
+    corpus = tmp_path / "skill_pages"
+    corpus.mkdir()
+    (corpus / "skill_file_map.json").write_text(json.dumps({
+        "Hitpoints": {"p2p": ["skill_pages\\p2p\\Hitpoints_training.txt", "skill_pages\\p2p\\Pay-to-play_Hitpoints_training.txt"]},
+        "Attack": {"p2p": ["skill_pages\\p2p\\Pay-to-play_melee_training.txt"]},
+        "Strength": {"p2p": ["skill_pages\\p2p\\Pay-to-play_melee_training.txt"]},
+    }), encoding="utf-8")
+    melee = "Pay-to-play_melee_training"
+    monkeypatch.setattr(skill_fetcher, "SKILLS", {skill: {"p2p": melee} for skill in ("Attack", "Strength", "Hitpoints")})
+
+    pages, files = skill_fetcher.corpus_pages(corpus / "skill_file_map.json")
+
+    assert pages == {melee: [("Attack", "p2p"), ("Strength", "p2p")], "Hitpoints_training": [("Hitpoints", "p2p")]}
+    assert [path.name for path in files["Hitpoints_training"]] == ["Hitpoints_training.txt", "Pay-to-play_Hitpoints_training.txt"]
+    assert [path.name for path in files[melee]] == ["Pay-to-play_melee_training.txt"]
@@ -0,0 +1,131 @@
+import gzip
+import hashlib
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from cache import bump_dataset_version
+from database import Base
+from levels import extract_summaries
+from models import Skill
+from search import index_summaries
+import snapshot
+from snapshot import Snapshot, current_version, prune_snapshots, write_snapshot
+
+engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+Base.metadata.create_all(bind=engine)
+
+SUMMARY = "### Levels 1–40\nCut **oak trees** in **Draynor**.\n" * 30
+
+
+def publish(db, summary: str):
+    skill = db.query(Skill).filter_by(name="Woodcutting").one_or_none()
+    if skill is None:
+        skill = Skill(name="Woodcutting", category="f2p", hash="w1")
+        db.add(skill)
+    skill.summary = summary
+    db.flush()
+    extract_summaries(db, [skill])
+    index_summaries(db, [skill])
+    bump_dataset_version(db)
+    db.commit()
+
+
+def test_bundle_is_content_hashed_with_a_manifest(tmp_path):
+    """Every body is stored under its hash with compressed variants, listed in the manifest."""
+    db = TestingSessionLocal()
+    publish(db, SUMMARY)
+    bundle = write_snapshot(db, str(tmp_path))
+
+    with open(os.path.join(bundle, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    assert os.path.basename(bundle) == manifest["version"] == current_version(str(tmp_path))
+    assert set(manifest["indexes"]) == {"levels", "search"}
+
+    entry = manifest["responses"]["skills/Woodcutting/f2p"]
+    with open(os.path.join(bundle, entry["files"]["identity"]), "rb") as f:
+        body = f.read()
+    assert hashlib.sha256(body).hexdigest() == entry["sha256"]
+    assert entry["files"]["identity"] == f"files/{entry['sha256'][:20]}.json"
+    with open(os.path.join(bundle, entry["files"]["gzip"]), "rb") as f:
+        assert gzip.decompress(f.read()) == body
+
+    served = Snapshot.current(str(tmp_path))
+    assert json.loads(served.recommend_body("woodcutting", 12))["results"][0]["method"] == "oak trees"
+    assert served.recommend_body("woodcutting", 12, "p2p") is None
+    assert served.search("draynor")[0]["skills"] == [{"name": "Woodcutting", "category": "f2p"}]
+    db.close()
+
+
+def test_new_versions_swap_current_and_old_bundles_are_pruned(tmp_path):
+    """Re-publishing a version reuses its bundle; new versions move CURRENT and prune old ones."""
+    db = TestingSessionLocal()
+    publish(db, SUMMARY)
+    first = write_snapshot(db, str(tmp_path))
+    mtime = os.path.getmtime(os.path.join(first, "manifest.json"))
+    assert write_snapshot(db, str(tmp_path)) == first
+    assert os.path.getmtime(os.path.join(first, "manifest.json")) == mtime
+
+    publish(db, SUMMARY.replace("oak", "willow"))
+    second = write_snapshot(db, str(tmp_path))
+    assert second != first
+    assert current_version(str(tmp_path)) == os.path.basename(second)
+    assert Snapshot.current(str(tmp_path)).version == os.path.basename(second)
+
+    assert prune_snapshots(str(tmp_path), keep=0) == [os.path.basename(first)]
+    assert set(os.listdir(tmp_path)) == {"CURRENT", os.path.basename(second)}
+    db.close()
+
+
+def test_workers_follow_a_swapped_snapshot(tmp_path, monkeypatch):
+    """Serving maps the pack read-only and moves to a new bundle once CURRENT is swapped."""
+    db = TestingSessionLocal()
+    publish(db, SUMMARY)
+    write_snapshot(db, str(tmp_path))
+    monkeypatch.setattr(snapshot, "SNAPSHOT_RELOAD_SECONDS", 0)
+    old = snapshot.serve_snapshot(str(tmp_path))
+    body = old.bodies("skills/Woodcutting/f2p")["identity"]
+    assert isinstance(body, memoryview)
+    assert b"oak trees" in bytes(body)
+
+    publish(db, SUMMARY.replace("oak", "yew"))
+    write_snapshot(db, str(tmp_path))
+    new = snapshot.serving()
+    assert new is not old and new.version == current_version(str(tmp_path))
+    assert b"yew trees" in bytes(new.bodies("skills/Woodcutting/f2p")["identity"])
+    assert b"oak trees" in bytes(body)  # requests still holding the old mapping finish on it
+    assert new.bodies("skills/Sailing") is None
+    monkeypatch.setattr(snapshot, "served", None)
+    db.close()
+
+
+def test_failed_build_leaves_no_temp_directory(tmp_path, monkeypatch):
+    """A build that fails part-way is removed, so hidden temp dirs don't pile up in the root."""
+    db = TestingSessionLocal()
+    publish(db, SUMMARY.replace("oak", "teak"))
+
+    def broken(db, path, version):
+        open(os.path.join(path, "manifest.json"), "w").close()
+        raise OSError("disk full")
+
+    monkeypatch.setattr(snapshot, "build_bundle", broken)
+    with pytest.raises(OSError, match="disk full"):
+        write_snapshot(db, str(tmp_path))
+    assert os.listdir(tmp_path) == []
+    db.close()
+
+
+def test_snapshot_replica_imports_without_database_or_openai_key(tmp_path):
+    """A SERVE_SNAPSHOT replica loads the app with neither DATABASE_URL nor OPENAI_API_KEY set."""
+    env = {k: v for k, v in os.environ.items() if k not in ("DATABASE_URL", "OPENAI_API_KEY")}
+    env["SERVE_SNAPSHOT"] = str(tmp_path)
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-c", "import app"], cwd=backend, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
@@ -1,19 +1,60 @@
 # tests/test_summarize_skills.py
+import asyncio
+
+import httpx
+import openai
 import pytest
-from unittest.mock import patch, MagicMock
-from summarize_skills import summarize_content, main
-from models import Skill
+from unittest.mock import patch, MagicMock, AsyncMock
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import summarize_skills
+from database import Base
+from summarize_skills import summarize_content, main, MODEL, PROMPT_VERSION, SummaryPool
+from models import DatasetVersion, PageBlob, Skill, WikiPage
+
+@pytest.fixture
+def sessions(tmp_path, monkeypatch):
+    """A file-backed database, since each group reads and writes from its own thread and session."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'summaries.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(summarize_skills, "SessionLocal", factory)
+    yield factory
+    engine.dispose()
+
+
+def add_rows(sessions, *rows):
+    """Store rows; a skill's blob is stored too, since Skill.blob is view-only."""
+    with sessions() as db:
+        for row in rows:
+            if isinstance(row, Skill) and row.blob is not None:
+                db.merge(row.blob)
+        db.add_all(rows)
+        db.commit()
+
+
+def skill_row(name: str, category: str, text: str, **fields) -> Skill:
+    blob = PageBlob.from_text(text)
+    return Skill(name=name, category=category, blob=blob, hash=blob.hash, **fields)
+
+
+def summaries(sessions) -> dict:
+    with sessions() as db:
+        return {skill.name: skill.summary for skill in db.query(Skill)}
+
 
 # ---- UNIT TESTS ----
 
-@patch("summarize_skills.client.chat.completions.create")
-def test_summarize_content_returns_clean_text(mock_create):
+@patch("summarize_skills.get_openai_client")
+def test_summarize_content_returns_clean_text(mock_get_client):
     """Ensure summarize_content returns the stripped text from OpenAI."""
+    mock_create = mock_get_client.return_value.chat.completions.create = AsyncMock()
     mock_create.return_value = MagicMock(
         choices=[MagicMock(message=MagicMock(content="  ### Level 1–20\nTrain chickens  "))]
     )
 
-    result = summarize_content("some wiki content", "Attack", "f2p")
+    result = asyncio.run(summarize_content("some wiki content", "Attack", "f2p"))
 
     mock_create.assert_called_once()
     assert result == "### Level 1–20\nTrain chickens"
@@ -21,25 +62,148 @@ def test_summarize_content_returns_clean_text(mock_create):
     assert "f2p" in mock_create.call_args[1]["messages"][0]["content"]
 
 
+class FakeCompletions:
+    """Local stand-in for the async chat completions API."""
+
+    def __init__(self, delay=0.0, failures=None):
+        self.delay = delay
+        self.failures = failures or {}
+        self.calls = 0
+        self.in_flight = 0
+        self.peak = 0
+
+    async def create(self, model, messages):
+        self.calls += 1
+        prompt = messages[0]["content"]
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            for marker, errors in self.failures.items():
+                if marker in prompt and errors:
+                    raise errors.pop(0)
+        finally:
+            self.in_flight -= 1
+        return MagicMock(choices=[MagicMock(message=MagicMock(content=f"summary of {prompt.strip().splitlines()[-1].strip()}"))])
+
+
+def fake_client(**kwargs):
+    return MagicMock(chat=MagicMock(completions=FakeCompletions(**kwargs)))
+
+
+def fake_pool(**kwargs):
+    """An unthrottled pool on a fake client, so no test needs OpenAI credentials."""
+    return SummaryPool(client=fake_client(**kwargs), requests_per_minute=0, tokens_per_minute=0)
+
+
+def api_error(status):
+    response = httpx.Response(status, request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+    cls = openai.RateLimitError if status == 429 else openai.InternalServerError
+    return cls("error", response=response, body=None)
+
+
+def test_summary_pool_bounds_concurrency_and_retries_rate_limits():
+    """The pool never exceeds its concurrency and retries 429/5xx responses."""
+    client = fake_client(delay=0.02, failures={"page-3": [api_error(429), api_error(503)]})
+    pool = SummaryPool(client=client, concurrency=2, requests_per_minute=0, tokens_per_minute=0, backoff_base=0)
+
+    async def run():
+        return await asyncio.gather(*(pool.complete(f"content page-{i}") for i in range(6)))
+
+    results = asyncio.run(run())
+
+    assert client.chat.completions.peak == 2
+    assert pool.retries == 2
+    assert results[3] == "summary of content page-3"
+
+
+def test_main_commits_each_group_and_survives_failures(sessions, monkeypatch):
+    """A failing group is rolled back alone; the other groups still commit and are published once."""
+    add_rows(sessions, *(skill_row(name, "p2p", f"wiki-{name}") for name in ["Mining", "Fishing", "Cooking"]))
+    bumps = []
+    monkeypatch.setattr(summarize_skills, "bump_dataset_version", lambda db: bumps.append(db))
+    client = fake_client(failures={"wiki-Fishing": [ValueError("bad response")]})
+
+    main(pool=SummaryPool(client=client, requests_per_minute=0, tokens_per_minute=0))
+
+    assert summaries(sessions) == {
+        "Mining": "summary of wiki-Mining",
+        "Fishing": None,
+        "Cooking": "summary of wiki-Cooking",
+    }
+    assert len(bumps) == 1
+
+
+def test_summarize_content_covers_every_level_section_in_order():
+    """Long guides are split by level range, summarized in parallel and merged in order."""
+    text = "\n".join(
+        f"## Levels {low}–{low + 10}\n{'xp ' * 3000}\nSection {low}"
+        for low in (40, 1, 20)
+    )
+    client = fake_client()
+    pool = SummaryPool(client=client, requests_per_minute=0, tokens_per_minute=0)
+
+    summary = asyncio.run(summarize_content(text, "Agility", "p2p", pool=pool))
+
+    assert client.chat.completions.calls == 3
+    assert summary.index("Section 1") < summary.index("Section 20") < summary.index("Section 40")
+
+
 # ---- INTEGRATION-STYLE TEST ----
 
 @patch("summarize_skills.summarize_content")
-@patch("summarize_skills.get_db")
-def test_main_updates_skill_summaries(mock_get_db, mock_summarize_content):
-    """Simulate summarizing skills and committing results."""
-    # Mock DB session and skill objects
-    mock_db = MagicMock()
-    mock_skill = Skill(id=1, name="Mining", category="f2p", content="rocks", summary=None)
-    mock_db.query.return_value.all.return_value = [mock_skill]
-    mock_get_db.return_value = iter([mock_db])
-
-    # Mock summarization output
+def test_main_updates_skill_summaries(mock_summarize_content, sessions):
+    """Summaries are written back and the dataset version is published."""
+    add_rows(sessions, skill_row("Mining", "f2p", "rocks"))
     mock_summarize_content.return_value = "### Level 1–20\nMine copper and tin."
 
-    # Run the main function
-    main()
+    main(pool=fake_pool())
+
+    mock_summarize_content.assert_called_once()
+    assert mock_summarize_content.call_args.args == ("rocks", "Mining", "f2p")
+    assert summaries(sessions) == {"Mining": "### Level 1–20\nMine copper and tin."}
+    with sessions() as db:
+        assert db.get(DatasetVersion, 1) is not None
+
+
+@patch("summarize_skills.summarize_content")
+def test_main_summarizes_each_skill_on_a_shared_page(mock_summarize_content, sessions):
+    """Skills that share a page and category each get their own summary of the same text."""
+    blob = PageBlob.from_text("melee")
+    page = WikiPage(id=7, title="Free-to-play_melee_training", blob=blob, hash=blob.hash)
+    add_rows(
+        sessions,
+        page,
+        Skill(name="Attack", category="f2p", page_id=7, hash="h"),
+        Skill(name="Strength", category="f2p", page_id=7, hash="h"),
+    )
+    mock_summarize_content.side_effect = lambda text, name, mode, **kwargs: f"### Level 1–40\nTrain {name} on cows."
+
+    main(pool=fake_pool())
+
+    assert sorted(call.args for call in mock_summarize_content.call_args_list) == [
+        ("melee", "Attack", "f2p"), ("melee", "Strength", "f2p"),
+    ]
+    assert summaries(sessions) == {
+        "Attack": "### Level 1–40\nTrain Attack on cows.",
+        "Strength": "### Level 1–40\nTrain Strength on cows.",
+    }
+
+
+@patch("summarize_skills.summarize_content")
+def test_main_skips_unchanged_rows_unless_forced(mock_summarize_content, sessions):
+    """Rows summarized from the same hash, prompt and model are left alone."""
+    skill = skill_row("Mining", "f2p", "rocks", summary="old", summary_prompt=PROMPT_VERSION, summary_model=MODEL)
+    skill.summary_hash = skill.hash
+    add_rows(sessions, skill)
+    mock_summarize_content.return_value = "new"
+
+    main(pool=fake_pool())
+    mock_summarize_content.assert_not_called()
+    assert summaries(sessions) == {"Mining": "old"}
+    with sessions() as db:
+        assert db.get(DatasetVersion, 1) is None  # nothing changed, so nothing to publish
 
-    # Assertions
-    mock_summarize_content.assert_called_once_with("rocks", "Mining", "f2p")
-    assert mock_skill.summary == "### Level 1–20\nMine copper and tin."
-    mock_db.commit.assert_called_once()
+    main(force=True, pool=fake_pool())
+    mock_summarize_content.assert_called_once()
+    assert summaries(sessions) == {"Mining": "new"}
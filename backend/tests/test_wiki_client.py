@@ -0,0 +1,74 @@
+import asyncio
+
+import httpx
+import pytest
+
+from throttle import MAX_RETRY_AFTER, retry_after_seconds
+from wiki_client import WikiClient
+
+
+def test_get_json_retries_server_errors():
+    """Transient 503s are retried with backoff until the API answers."""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"ok": True})
+
+    async def run():
+        async with WikiClient(
+            transport=httpx.MockTransport(handler), requests_per_second=0, backoff_base=0
+        ) as client:
+            return await client.get_json({"action": "parse"}), client.retries
+
+    data, retries = asyncio.run(run())
+    assert data == {"ok": True}
+    assert retries == 2
+    assert calls[0].headers["user-agent"].startswith("OSRSSimplified")
+
+
+def test_get_json_gives_up_after_max_retries():
+    """A persistent 429 surfaces as an HTTP error once retries are exhausted."""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(429, headers={"Retry-After": "0"})
+
+    async def run():
+        async with WikiClient(
+            transport=httpx.MockTransport(handler), requests_per_second=0, max_retries=2
+        ) as client:
+            await client.get_json({"action": "parse"})
+
+    with pytest.raises(httpx.HTTPStatusError) as exc_info:
+        asyncio.run(run())
+    assert exc_info.value.response.status_code == 429
+    assert len(calls) == 3
+
+
+def test_retry_after_is_capped():
+    """A huge or infinite Retry-After never stalls the refresh for longer than the cap."""
+    assert retry_after_seconds({"retry-after": "86400"}) == MAX_RETRY_AFTER
+    assert retry_after_seconds({"retry-after": "inf"}) == MAX_RETRY_AFTER
+    assert retry_after_seconds({"retry-after": "nan"}) is None
+    assert retry_after_seconds({"retry-after": "-5"}) == 0.0
+    assert retry_after_seconds({"retry-after": "2"}) == 2.0
+
+
+def test_get_json_follows_redirects():
+    """HTTP redirects are followed, as requests did."""
+    def handler(request):
+        if request.url.host == "old.example":
+            return httpx.Response(301, headers={"Location": "https://new.example/api.php"})
+        return httpx.Response(200, json={"host": request.url.host})
+
+    async def run():
+        async with WikiClient(
+            api_url="https://old.example/api.php", transport=httpx.MockTransport(handler), requests_per_second=0
+        ) as client:
+            return await client.get_json({"action": "parse"})
+
+    assert asyncio.run(run()) == {"host": "new.example"}
@@ -0,0 +1,88 @@
+import asyncio
+import math
+import random
+
+# Statuses worth retrying: rate limited or a transient server-side failure.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Longest Retry-After we honour; refreshes hold a lock that blocks every other replica.
+MAX_RETRY_AFTER = 60.0
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Exponential backoff with full jitter for the given (0-based) retry attempt."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def retry_after_seconds(headers, cap: float = MAX_RETRY_AFTER) -> float | None:
+    """Seconds requested by a Retry-After header, if it holds a number, at most ``cap``."""
+    value = headers.get("retry-after")
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(seconds):
+        return None
+    return min(cap, max(0.0, seconds))
+
+
+class HostRateLimiter:
+    """Spaces requests to the same host at least ``1 / requests_per_second`` apart."""
+
+    def __init__(self, requests_per_second: float):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._next_slot = {}
+        self._lock = asyncio.Lock()
+
+    async def wait(self, host: str):
+        if not self.interval:
+            return
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            now = loop.time()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+class MinuteRateLimiter:
+    """Token buckets for requests-per-minute and tokens-per-minute quotas (0 disables one)."""
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = None
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    async def acquire(self, tokens: int = 0):
+        """Wait until one request and ``tokens`` tokens fit in the budget, then spend them."""
+        loop = asyncio.get_running_loop()
+        # A single oversized request may use the whole bucket, but never more
+        tokens = min(tokens, self.tokens_per_minute) if self.tokens_per_minute else 0
+        async with self._lock:
+            while True:
+                now = loop.time()
+                if self._updated is None:
+                    self._updated = now
+                self._refill(now)
+
+                wait = 0.0
+                if self.requests_per_minute and self._requests < 1:
+                    wait = (1 - self._requests) * 60 / self.requests_per_minute
+                if self.tokens_per_minute and self._tokens < tokens:
+                    wait = max(wait, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+                if wait <= 0:
+                    if self.requests_per_minute:
+                        self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep(wait)
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import time
+
+import httpx
+
+from metrics import counter, histogram
+from throttle import RETRY_STATUSES, HostRateLimiter, backoff_delay, retry_after_seconds
+
+API_URL = "https://oldschool.runescape.wiki/api.php"
+USER_AGENT = "OSRSSimplified/1.0 (https://osrssimplified.com)"
+
+FETCH_CONCURRENCY = int(os.getenv("WIKI_FETCH_CONCURRENCY", "4"))
+REQUESTS_PER_SECOND = float(os.getenv("WIKI_REQUESTS_PER_SECOND", "5"))
+MAX_RETRIES = int(os.getenv("WIKI_MAX_RETRIES", "3"))
+REQUEST_TIMEOUT = float(os.getenv("WIKI_REQUEST_TIMEOUT", "30"))
+
+WIKI_REQUEST_SECONDS = histogram("osrs_wiki_request_seconds", "Wiki API request latency", ("action",))
+WIKI_RESPONSE_BYTES = counter("osrs_wiki_response_bytes_total", "Bytes read from the wiki API", ("action",))
+WIKI_RETRIES = counter("osrs_wiki_retries_total", "Wiki API requests retried", ("reason",))
+
+
+class WikiClient:
+    """Pooled async client for the MediaWiki API with bounded concurrency and retries.
+
+    Use as ``async with WikiClient() as client``. Pass an ``httpx`` transport
+    (e.g. ``httpx.MockTransport``) to run against a stub instead of the live wiki.
+    """
+
+    def __init__(
+        self,
+        api_url: str = API_URL,
+        concurrency: int = FETCH_CONCURRENCY,
+        requests_per_second: float = REQUESTS_PER_SECOND,
+        max_retries: int = MAX_RETRIES,
+        backoff_base: float = 0.5,
+        timeout: float = REQUEST_TIMEOUT,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.api_url = api_url
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.retries = 0
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._rate_limiter = HostRateLimiter(requests_per_second)
+        self._client = httpx.AsyncClient(
+            transport=transport,
+            timeout=timeout,
+            headers={"User-Agent": USER_AGENT},
+            # requests followed redirects by default; keep doing so
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    async def get_json(self, params: dict) -> dict:
+        """GET the API with ``params``; retry transport errors, 429 and 5xx with backoff."""
+        host = httpx.URL(self.api_url).host
+        action = params.get("action", "")
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                await self._rate_limiter.wait(host)
+                async with self._semaphore:
+                    started = time.perf_counter()
+                    response = await self._client.get(self.api_url, params=params)
+                    WIKI_REQUEST_SECONDS.observe(time.perf_counter() - started, action=action)
+            except httpx.TransportError:
+                if last_attempt:
+                    raise
+                reason = "transport"
+                delay = backoff_delay(attempt, self.backoff_base)
+            else:
+                WIKI_RESPONSE_BYTES.inc(len(response.content), action=action)
+                reason = str(response.status_code)
+                if response.status_code not in RETRY_STATUSES or last_attempt:
+                    response.raise_for_status()
+                    return response.json()
+                delay = retry_after_seconds(response.headers)
+                if delay is None:
+                    delay = backoff_delay(attempt, self.backoff_base)
+
+            self.retries += 1
+            WIKI_RETRIES.inc(reason=reason)
+            await asyncio.sleep(delay)
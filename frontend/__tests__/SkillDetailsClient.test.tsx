@@ -34,6 +34,7 @@ const mockSkillVersions = [
 beforeEach(() => {
   global.fetch = jest.fn(() =>
     Promise.resolve({
+      ok: true,
       json: () => Promise.resolve(mockSkillVersions),
     } as any)
   );
@@ -54,6 +55,15 @@ describe("SkillDetailsClient", () => {
     expect(await screen.findByText("Attack")).toBeInTheDocument();
   });
 
+  test("fetches only the requested skill", async () => {
+    render(<SkillDetailsClient skill="Attack" />);
+
+    await screen.findByText("F2P");
+    expect(global.fetch).toHaveBeenCalledWith(
+      expect.stringMatching(/\/skills\/Attack\?format=html$/)
+    );
+  });
+
   test("renders F2P and P2P tabs and switches active tab", async () => {
     render(<SkillDetailsClient skill="Attack" />);
 
@@ -81,10 +91,31 @@ describe("SkillDetailsClient", () => {
     expect(screen.getByText("chickens")).toBeInTheDocument();
   });
 
+  test("renders the pre-rendered summary HTML when the API sends it", async () => {
+    (global.fetch as jest.Mock).mockResolvedValueOnce({
+      ok: true,
+      json: () =>
+        Promise.resolve([
+          {
+            id: 3,
+            name: "Mining",
+            category: "f2p",
+            summary_html: "<p>Mine <strong>copper</strong>.</p>",
+          },
+        ]),
+    } as any);
+
+    render(<SkillDetailsClient skill="Mining" />);
+
+    const strong = await screen.findByText("copper");
+    expect(strong.tagName).toBe("STRONG");
+  });
+
   test("shows fallback text if no summary is available", async () => {
-    // Mock fetch returning empty array
+    // Mock fetch returning 404 for an unknown skill
     (global.fetch as jest.Mock).mockResolvedValueOnce({
-      json: () => Promise.resolve([]),
+      ok: false,
+      json: () => Promise.resolve({ detail: "Not found" }),
     } as any);
 
     render(<SkillDetailsClient skill="Nonexistent" />);
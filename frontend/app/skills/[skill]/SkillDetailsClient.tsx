@@ -10,9 +10,22 @@ interface SkillVersion {
   id: number;
   name: string;
   category: string;
-  summary: string;
+  // Markdown, only sent by APIs without ?format=html
+  summary?: string | null;
+  // Rendered and sanitized by the backend when the summary was written
+  summary_html?: string | null;
 }
 
+// Same styling as the ReactMarkdown components below, for pre-rendered summaries
+const summaryHtmlClasses = [
+  "[&_h3]:text-[#ffcb05] [&_h3]:text-lg sm:[&_h3]:text-xl [&_h3]:font-semibold [&_h3]:mt-5 [&_h3]:mb-3 [&_h3]:border-b [&_h3]:border-[#3b2f1c] [&_h3]:pb-1",
+  "[&_p]:mb-3 sm:[&_p]:mb-4",
+  "[&_ul]:list-disc [&_ul]:list-inside [&_ul]:mb-3 sm:[&_ul]:mb-4 [&_ul]:space-y-1 [&_li]:marker:text-[#ffcb05]",
+  "[&_strong]:text-[#ffcb05] [&_strong]:font-semibold",
+  "[&_em]:text-[#d6cfa1] [&_em]:italic",
+  "[&_code]:bg-[#22201b] [&_code]:text-[#ffcb05] [&_code]:px-1 [&_code]:py-0.5 [&_code]:rounded-sm [&_code]:text-sm [&_code]:font-mono",
+].join(" ");
+
 // Optional children and inline fix for ReactMarkdown
 interface CodeProps extends React.HTMLAttributes<HTMLElement> {
   inline?: boolean;
@@ -27,14 +40,13 @@ export default function SkillDetailsClient({ skill }: { skill: string }) {
   useEffect(() => {
     async function fetchSkillVersions() {
       try {
-        const res = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/skills`);
-        const data: SkillVersion[] = await res.json();
-
-        const filtered = data.filter(
-          (s) => s.name.toLowerCase() === skill.toLowerCase()
+        const res = await fetch(
+          `${process.env.NEXT_PUBLIC_API_URL}/skills/${encodeURIComponent(skill)}?format=html`
         );
+        // 404 means the skill has no rows yet
+        const data: SkillVersion[] = res.ok ? await res.json() : [];
 
-        const ordered = filtered.sort((a, b) => {
+        const ordered = data.sort((a, b) => {
           const order = ["f2p", "p2p"];
           const aIndex = order.indexOf(a.category?.toLowerCase() || "");
           const bIndex = order.indexOf(b.category?.toLowerCase() || "");
@@ -135,47 +147,54 @@ export default function SkillDetailsClient({ skill }: { skill: string }) {
               {activeVersion.category || "General"}
             </h2>
 
-            <div className="prose prose-invert max-w-none leading-relaxed text-[#d6cfa1]">
-              <ReactMarkdown
-                components={{
-                  h3: ({ ...props }) => (
-                    <h3
-                      className="text-[#ffcb05] text-lg sm:text-xl font-semibold mt-5 mb-3 border-b border-[#3b2f1c] pb-1"
-                      {...props}
-                    />
-                  ),
-                  p: ({ ...props }) => <p className="mb-3 sm:mb-4" {...props} />,
-                  ul: ({ ...props }) => (
-                    <ul
-                      className="list-disc list-inside mb-3 sm:mb-4 space-y-1 marker:text-[#ffcb05]"
-                      {...props}
-                    />
-                  ),
-                  strong: ({ ...props }) => (
-                    <strong className="text-[#ffcb05] font-semibold" {...props} />
-                  ),
-                  em: ({ ...props }) => <em className="text-[#d6cfa1] italic" {...props} />,
-                  code: ({ inline, children, ...props }: CodeProps) =>
-                    inline ? (
-                      <code
-                        className="bg-[#22201b] text-[#ffcb05] px-1 py-0.5 rounded-sm text-sm font-mono"
+            {activeVersion.summary_html ? (
+              <div
+                className={`prose prose-invert max-w-none leading-relaxed text-[#d6cfa1] ${summaryHtmlClasses}`}
+                dangerouslySetInnerHTML={{ __html: activeVersion.summary_html }}
+              />
+            ) : (
+              <div className="prose prose-invert max-w-none leading-relaxed text-[#d6cfa1]">
+                <ReactMarkdown
+                  components={{
+                    h3: ({ ...props }) => (
+                      <h3
+                        className="text-[#ffcb05] text-lg sm:text-xl font-semibold mt-5 mb-3 border-b border-[#3b2f1c] pb-1"
                         {...props}
-                      >
-                        {children}
-                      </code>
-                    ) : (
-                      <code
-                        className="block bg-[#1b1a17] border border-[#3b2f1c] text-[#ffcb05] p-3 rounded-lg text-sm font-mono my-4 whitespace-pre-wrap overflow-x-auto"
+                      />
+                    ),
+                    p: ({ ...props }) => <p className="mb-3 sm:mb-4" {...props} />,
+                    ul: ({ ...props }) => (
+                      <ul
+                        className="list-disc list-inside mb-3 sm:mb-4 space-y-1 marker:text-[#ffcb05]"
                         {...props}
-                      >
-                        {children}
-                      </code>
+                      />
                     ),
-                }}
-              >
-                {activeVersion.summary}
-              </ReactMarkdown>
-            </div>
+                    strong: ({ ...props }) => (
+                      <strong className="text-[#ffcb05] font-semibold" {...props} />
+                    ),
+                    em: ({ ...props }) => <em className="text-[#d6cfa1] italic" {...props} />,
+                    code: ({ inline, children, ...props }: CodeProps) =>
+                      inline ? (
+                        <code
+                          className="bg-[#22201b] text-[#ffcb05] px-1 py-0.5 rounded-sm text-sm font-mono"
+                          {...props}
+                        >
+                          {children}
+                        </code>
+                      ) : (
+                        <code
+                          className="block bg-[#1b1a17] border border-[#3b2f1c] text-[#ffcb05] p-3 rounded-lg text-sm font-mono my-4 whitespace-pre-wrap overflow-x-auto"
+                          {...props}
+                        >
+                          {children}
+                        </code>
+                      ),
+                  }}
+                >
+                  {activeVersion.summary}
+                </ReactMarkdown>
+              </div>
+            )}
           </motion.div>
         ) : (
           <p className="text-center text-[#a68f59]">No summary available for this skill.</p>
@@ -18,7 +18,7 @@ export default function SkillsPage() {
   useEffect(() => {
     async function fetchSkills() {
       try {
-        const res = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/skills`);
+        const res = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/skills/index`);
         const data: Skill[] = await res.json();
 
         // Remove duplicates (f2p/p2p)